@@ -0,0 +1,342 @@
+"""
+Benchmarks for the chart processing and the page views (manage.py benchmark).
+
+Processing cases decode a synthetic EIA payload of a given size and run it
+through the same process_* steps the views use. They record the median
+wall time, rows per second and the peak memory (tracemalloc) of decoding
+plus processing. The payloads look like EIA's (string values, every
+descriptive column), so decode cost scales as it does in production.
+
+View cases request pages through the Django test client against a
+throwaway test database and a local-memory cache. The upstream API is
+stubbed with generated payloads, so nothing leaves the process. The first
+request of a page pays for the fetch and the store writes; the repeats
+measure the steady state. The Server-Timing stages split each one into
+upstream (eia_request), processing and render time.
+
+Results are plain dicts keyed by case, so a run can be saved as a JSON
+baseline and later runs compared against it with compare().
+
+This is tooling for manage.py benchmark, kept outside the dashboard app:
+the test-client scaffolding below (django.test, unittest.mock) is never
+imported by the running site.
+"""
+import gc
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+import django
+import numpy as np
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from dashboard import capacity, cube, eia, replay, scheduler, views
+from dashboard.regions import ALL_STATES, STATE_FUEL_TYPES
+from dashboard.timerange import TimeRange
+
+SIZES = [48, 10_000, 1_000_000]
+VIEW_URLS = [
+    '/',
+    '/state/?state=CA',
+    '/net-load/?region=CISO',
+    '/congestion/?region=ERCO',
+    '/net-load/?region=CISO&range=90d',
+    '/congestion/?region=ERCO&range=1y',
+]
+# Metrics compared against a baseline (lower is better), with the smallest
+# difference that counts, so timer noise on tiny cases never fails a run
+COMPARED = {'seconds': 0.001, 'peak_mb': 1.0, 'p50_seconds': 0.002}
+# Offset of the synthetic local-hourly periods
+UTC_OFFSET = -5
+# Synthetic annual rows span at most MAX_YEARS years from BASE_YEAR; larger
+# sizes add states (cycling through the state codes) instead of years
+BASE_YEAR = 2001
+MAX_YEARS = 24
+
+
+# --- Synthetic EIA payloads ---
+
+def _payload(rows):
+    return json.dumps({'response': {'total': str(len(rows)), 'data': rows}}).encode()
+
+
+def _values(n, low, high, seed):
+    return np.round(np.random.default_rng(seed).uniform(low, high, n), 1).astype(str).tolist()
+
+
+def _local_periods(end, hours):
+    # Newest first, as the views ask EIA for them
+    utc = np.datetime64(end.replace(tzinfo=None), 'h') - np.arange(1, hours + 1) * np.timedelta64(1, 'h')
+    local = np.datetime_as_string(utc + UTC_OFFSET * np.timedelta64(1, 'h'), unit='h').tolist()
+    return [f"{p}{UTC_OFFSET:+03d}" for p in local]
+
+
+def demand_rows(respondent, hours, end=None):
+    end = end or datetime.now(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    values = _values(hours, 20000, 45000, seed=hours)
+    return [{
+        'period': period, 'respondent': respondent, 'respondent-name': respondent,
+        'type': 'D', 'type-name': 'Demand', 'value': value, 'value-units': 'megawatthours',
+    } for period, value in zip(_local_periods(end, hours), values)]
+
+
+def fuel_rows(respondent, fueltypes, hours, end=None):
+    end = end or datetime.now(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    periods = _local_periods(end, hours)
+    rows = []
+    for i, fueltype in enumerate(fueltypes):
+        values = _values(hours, 0, 8000, seed=hours + i)
+        rows += [{
+            'period': period, 'respondent': respondent, 'respondent-name': respondent,
+            'fueltype': fueltype, 'type-name': fueltype, 'value': value, 'value-units': 'megawatthours',
+        } for period, value in zip(periods, values)]
+    return rows
+
+
+def operational_rows(locations, fueltypes, years, column):
+    rows = []
+    values = iter(_values(len(locations) * len(fueltypes) * len(years), 100, 90000, seed=len(years)))
+    for year in years:
+        for location in locations:
+            for fueltype in fueltypes:
+                rows.append({
+                    'period': str(year), 'location': location, 'stateDescription': location,
+                    'sectorid': '99', 'sectorDescription': 'All Sectors', 'fueltypeid': fueltype,
+                    'fuelTypeDescription': fueltype, column: next(values), f'{column}-units': 'megawatts',
+                })
+    return rows
+
+
+# --- Processing ---
+
+def _parse(body):
+    return eia._rows(json.loads(body))
+
+
+def state_generation_rows(n):
+    """About ``n`` annual generation rows: every fuel for each state and year."""
+    fuels = list(STATE_FUEL_TYPES)
+    years = range(BASE_YEAR, BASE_YEAR + min(MAX_YEARS, max(1, n // len(fuels))))
+    states = max(1, n // (len(fuels) * len(years)))
+    return operational_rows([ALL_STATES[i % len(ALL_STATES)] for i in range(states)], fuels, years, 'generation')
+
+
+def _state_generation_case(n):
+    body = _payload(state_generation_rows(n))
+    return lambda: views.process_state_generation(_parse(body))
+
+
+def _net_load_case(n):
+    # A third of the rows are demand, the rest wind and solar for the same hours
+    hours = max(1, n // 3)
+    demand, fuel = _payload(demand_rows('CISO', hours)), _payload(fuel_rows('CISO', ['WND', 'SUN'], hours))
+
+    def run():
+        chart = views.process_net_load(_parse(demand), _parse(fuel))
+        # Beyond the default window the view downsamples, as for a range
+        return views.downsample_net_load(chart) if hours > 48 else chart
+    return run
+
+
+def _congestion_case(n):
+    body = _payload(demand_rows('ERCO', n))
+    now = datetime.now(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    time_range = TimeRange(now - timedelta(hours=n), now) if n > 48 else None
+    return lambda: views.process_congestion('TX', 140000, _parse(body), time_range)
+
+
+PROCESSING = {
+    'state_generation': _state_generation_case,
+    'net_load': _net_load_case,
+    'congestion': _congestion_case,
+}
+
+
+def _repeats(n):
+    return max(1, min(50, 200_000 // n))
+
+
+def run_processing(sizes=SIZES, report=print):
+    results = {}
+    for name, case in PROCESSING.items():
+        for n in sizes:
+            run = case(n)
+            times = []
+            for _ in range(_repeats(n)):
+                gc.collect()
+                started = time.perf_counter()
+                run()
+                times.append(time.perf_counter() - started)
+
+            gc.collect()
+            tracemalloc.start()
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            seconds = statistics.median(times)
+            results[f'processing:{name}:{n}'] = result = {
+                'rows': n,
+                'seconds': round(seconds, 6),
+                'rows_per_second': round(n / seconds),
+                'peak_mb': round(peak / 2 ** 20, 2),
+            }
+            report(f"{name:>18} {n:>9} rows  {seconds * 1000:10.2f} ms  "
+                   f"{result['rows_per_second']:>12,} rows/s  {result['peak_mb']:8.2f} MB")
+    return results
+
+
+# --- Views ---
+
+class _Response:
+    def __init__(self, body):
+        self.status_code = 200
+        self.headers = {}
+        self.content = body
+        self.text = ''
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        pass
+
+
+class StubUpstream:
+    """Stands in for the EIA session, answering every query with generated rows."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, url, params=None, **kwargs):
+        self.calls += 1
+        params = params or {}
+        name = replay.route(url)
+        now = datetime.now(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+        if name.endswith('operational-data/data'):
+            locations = params.get('facets[location][]', [])
+            fuels = params.get('facets[fueltypeid][]', [])
+            column = params.get('data[0]', 'generation')
+            rows = operational_rows(_as_list(locations), _as_list(fuels), range(2001, now.year), column)
+        else:
+            respondents = _as_list(params.get('facets[respondent][]', []))
+            if params.get('start'):
+                start = datetime.strptime(params['start'][:13], '%Y-%m-%dT%H').replace(tzinfo=dt_timezone.utc)
+                hours = max(1, int((now - start) / timedelta(hours=1)))
+            else:
+                hours = max(1, int(params.get('length', 48)) // max(1, len(respondents)))
+            rows = []
+            for respondent in respondents:
+                if name.endswith('fuel-type-data/data'):
+                    rows += fuel_rows(respondent, _as_list(params.get('facets[fueltype][]', [])), hours)
+                else:
+                    rows += demand_rows(respondent, hours)
+
+        offset = int(params.get('offset', 0))
+        return _Response(_payload(rows[offset:offset + int(params.get('length', 5000))]))
+
+
+def _as_list(value):
+    return value if isinstance(value, (list, tuple)) else [value]
+
+
+@contextmanager
+def isolated_site():
+    """A test database, an empty local-memory cache and a stubbed upstream, for the test client."""
+    setup_test_environment()
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == 'sqlite':
+            # A file rather than shared-cache memory, so worker threads wait on locks
+            connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        upstream = StubUpstream()
+        caches = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        try:
+            # No rate limit on the stub, and a scheduler built for the overrides
+            with override_settings(CACHES=caches, EIA_KEY_RATE=1e9, EIA_KEY_BURST=10 ** 9), \
+                    mock.patch.object(scheduler, '_scheduler', None), \
+                    mock.patch.object(eia, 'get_session', return_value=upstream), \
+                    mock.patch.dict(os.environ, {'EIA_API_KEY': 'benchmark'}):
+                yield upstream
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+
+def _stages(response):
+    stages = {}
+    for part in response.get('Server-Timing', '').split(','):
+        name, _, duration = part.strip().partition(';dur=')
+        if duration:
+            stages[name] = float(duration) / 1000
+    return stages
+
+
+def run_views(urls=VIEW_URLS, repeat=20, report=print):
+    results = {}
+    with isolated_site() as upstream:
+        # The snapshots the state and congestion pages read, as the warm-up builds them
+        capacity.refresh('benchmark')
+        cube.refresh_if_changed('benchmark')
+        client = Client()
+        for url in urls:
+            calls = upstream.calls
+            first = _stages(client.get(url))
+            fetched = upstream.calls - calls
+            runs = [_stages(client.get(url)) for _ in range(repeat)]
+            totals = sorted(r['total'] for r in runs)
+            results[f'view:{url}'] = result = {
+                'first_seconds': round(first['total'], 6),
+                'first_upstream_calls': fetched,
+                'p50_seconds': round(statistics.median(totals), 6),
+                'p95_seconds': round(totals[min(len(totals) - 1, int(0.95 * len(totals)))], 6),
+                'stages': {stage: round(statistics.median(r.get(stage, 0.0) for r in runs), 6)
+                           for stage in ['eia_request', 'processing', 'render']},
+            }
+            report(f"{url:<36} first {result['first_seconds'] * 1000:8.1f} ms ({fetched} fetches)  "
+                   f"p50 {result['p50_seconds'] * 1000:7.1f} ms  p95 {result['p95_seconds'] * 1000:7.1f} ms  "
+                   + '  '.join(f"{s} {v * 1000:.1f}" for s, v in result['stages'].items()))
+    return results
+
+
+# --- Baselines ---
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(baseline, results, threshold):
+    """Regressions of ``results`` beyond ``threshold`` (a fraction) against ``baseline``.
+
+    Only cases and metrics present in both are compared.
+    """
+    regressions = []
+    for case, result in results.items():
+        base = baseline.get(case)
+        if base is None:
+            continue
+        for metric, floor in COMPARED.items():
+            if metric not in result or metric not in base:
+                continue
+            old, new = base[metric], result[metric]
+            if new > old * (1 + threshold) and new - old > floor:
+                regressions.append(f"{case} {metric}: {old} -> {new} (+{(new / old - 1) * 100 if old else 0:.0f}%)")
+    return regressions
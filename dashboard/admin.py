@@ -1,3 +1,27 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import FuelTypeOutput, RegionDemand, StateCapacity, StateGeneration
+
+
+@admin.register(RegionDemand)
+class RegionDemandAdmin(admin.ModelAdmin):
+    list_display = ('respondent', 'period', 'timestamp', 'value')
+    list_filter = ('respondent',)
+
+
+@admin.register(FuelTypeOutput)
+class FuelTypeOutputAdmin(admin.ModelAdmin):
+    list_display = ('respondent', 'fueltype', 'period', 'timestamp', 'value')
+    list_filter = ('respondent', 'fueltype')
+
+
+@admin.register(StateGeneration)
+class StateGenerationAdmin(admin.ModelAdmin):
+    list_display = ('location', 'period', 'fueltypeid', 'sectorid', 'generation')
+    list_filter = ('location', 'fueltypeid')
+
+
+@admin.register(StateCapacity)
+class StateCapacityAdmin(admin.ModelAdmin):
+    list_display = ('location', 'period', 'fueltypeid', 'sectorid', 'capacity_mw')
+    list_filter = ('location', 'fueltypeid')
@@ -0,0 +1,416 @@
+"""
+Versioned JSON API (/api/v1/...) serving the same chart data as the pages.
+
+Payloads are compact and columnar, serialized and compressed once per
+distinct body (see payloads.py). Every response carries a strong ETag
+built from the newest period it contains plus a digest of the body, so
+pollers get a 304 until a new point lands. The ETag last sent for each
+request is remembered against the newest stored data behind it, so a
+poll that still matches gets its 304 before anything is fetched or
+processed. ``since=<period>`` trims the series to points newer than the
+one the client already has. The hourly
+endpoints also take ``range=``/``start=``/``end=`` (see timerange.py) and
+downsample long ranges to the chart point budget.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags
+from django.views.decorators.http import require_GET
+
+from . import breaker, freshness, metrics, payloads, profiles, scheduler, singleflight, store, timerange, views, warmup
+from .regions import ALL_STATES, CONGESTION_REGIONS, DEMAND_RESPONDENTS, NET_LOAD_REGIONS, STATE_FUEL_TYPES
+
+logger = logging.getLogger(__name__)
+
+API_VERSION = 'v1'
+
+_PERIOD = re.compile(r'^\d{4}(-\d{2}(-\d{2}(T\d{2}([+-]\d{2})?)?)?)?$')
+
+
+def _error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _period_key(period):
+    # Hourly periods compare as UTC instants so local-hourly offsets sort right
+    try:
+        return (0, store.parse_period(period).isoformat())
+    except ValueError:
+        return (1, period)
+
+
+def _since(request):
+    since = request.GET.get('since')
+    if since and not _PERIOD.match(since):
+        raise ValueError(f"Invalid since: {since!r}")
+    return since
+
+
+def _range(request):
+    # (since, time range) or ValueError for a malformed parameter
+    return _since(request), timerange.from_query(request.GET)
+
+
+def _filter_since(payload, period_column, columns, since):
+    """Drop the points at or before ``since`` from every column of ``payload``."""
+    if not since:
+        return payload
+    cutoff = _period_key(since)
+    keep = [i for i, p in enumerate(payload[period_column]) if _period_key(p) > cutoff]
+    for column in [period_column, *columns]:
+        payload[column] = [payload[column][i] for i in keep]
+    return payload
+
+
+def _validators_key(request, version):
+    # The request (path and query) plus a cheap marker of the stored data behind it
+    query = sorted((name, sorted(values)) for name, values in request.GET.lists())
+    digest = hashlib.sha1(json.dumps([request.path, query, version]).encode()).hexdigest()
+    return f'api:validators:{digest}'
+
+
+def _not_modified(request, version):
+    """A 304 when If-None-Match still matches what this request last produced
+    at the same data ``version``, before anything is fetched or processed."""
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return None
+    validators = cache.get(_validators_key(request, version))
+    if validators is None or 'size' not in validators:
+        return None
+    # Only the tag of the representation this client would be sent now
+    encoding = payloads.encoding_for(request.headers.get('Accept-Encoding', ''), validators['size'])
+    etag = _etag(validators['etag'], encoding)
+    if etag not in parse_etags(if_none_match):
+        return None
+    metrics.count('api_not_modified')
+    response = HttpResponseNotModified()
+    response['ETag'] = etag
+    if validators['last_modified'] is not None:
+        response['Last-Modified'] = http_date(validators['last_modified'])
+    patch_vary_headers(response, ['Accept-Encoding'])
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def _etag(base, encoding):
+    # Each encoding is a different representation, so it gets its own tag
+    return f'{base[:-1]}-{encoding}"' if encoding else base
+
+
+def _json_response(request, payload, latest_period, version=None):
+    # ``version`` returns the marker _not_modified() is checked against. It is
+    # read after the build, which may have stored what it fetched; revised
+    # values don't move it, so what is keyed on it is short-lived.
+    key = _validators_key(request, version()) if version is not None else None
+    stale = freshness.current()
+    if stale is not None:
+        # Served from last-known-good data while EIA is failing
+        payload = {**payload, 'stale': True, 'stale_since': stale.since.isoformat() if stale.since else None}
+    with metrics.timed('render', template='json'):
+        # An unchanged dataset reuses its bytes without being serialized again
+        serialized = payloads.payload(payload, key if stale is None else None, settings.EIA_CACHE_TTLS['hourly'])
+        body, encoding = serialized.encoded(request.headers.get('Accept-Encoding', ''))
+    base = f'"{API_VERSION}-{latest_period or "empty"}-{serialized.digest}"'
+    etag = _etag(base, encoding)
+
+    last_modified = None
+    if latest_period:
+        try:
+            last_modified = int(store.parse_period(latest_period).timestamp())
+        except ValueError:
+            pass
+    if key is not None:
+        # Lets _not_modified() answer the next poll without rebuilding this
+        cache.set(
+            key,
+            {'etag': base, 'size': len(serialized.body), 'last_modified': last_modified},
+            settings.EIA_CACHE_TTLS['hourly'],
+        )
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+        if encoding:
+            response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ['Accept-Encoding'])
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Let browsers keep the body but revalidate on every poll
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@require_GET
+def demand(request):
+    api_key = os.getenv('EIA_API_KEY')
+    respondent = request.GET.get('respondent', 'US48')
+    if respondent not in DEMAND_RESPONDENTS:
+        return _error(f"Unknown respondent: {respondent}", 400)
+    try:
+        since, time_range = _range(request)
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    version = lambda: store.hourly_version([respondent])
+    response = _not_modified(request, version())
+    if response is not None:
+        return response
+
+    try:
+        demand_context = views.demand_context_for(api_key, respondent, time_range)
+    except Exception as e:
+        logger.error("API Demand Error: %s", e)
+        return _error("US Demand Data unavailable", 502)
+
+    latest = demand_context['periods'][-1] if demand_context['periods'] else None
+    payload = {
+        'respondent': respondent,
+        'periods': demand_context['periods'],
+        'labels': demand_context['labels'],
+        'values': demand_context['data'],
+    }
+    if 'grain' in demand_context:
+        payload['grain'] = demand_context['grain']
+    return _json_response(request, _filter_since(payload, 'periods', ['labels', 'values'], since), latest, version)
+
+
+@require_GET
+def state_generation(request):
+    api_key = os.getenv('EIA_API_KEY')
+    state = request.GET.get('state', 'TX')
+    if state not in ALL_STATES:
+        return _error(f"Unknown state: {state}", 400)
+    try:
+        since = _since(request)
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    version = store.generation_fingerprint
+    response = _not_modified(request, version())
+    if response is not None:
+        return response
+
+    chart_data = views.get_state_generation(api_key, state)
+    if chart_data is None:
+        return _error(f"No data available for {state}", 502)
+
+    latest = chart_data['years'][-1] if chart_data['years'] else None
+    payload = {
+        'state': state,
+        'years': chart_data['years'],
+        'fuels': [ds['label'] for ds in chart_data['datasets']],
+    }
+    for ds in chart_data['datasets']:
+        payload[ds['label']] = ds['data']
+    payload = _filter_since(payload, 'years', payload['fuels'], since)
+    return _json_response(request, payload, latest, version)
+
+
+@require_GET
+def national_generation(request):
+    api_key = os.getenv('EIA_API_KEY')
+    sort = request.GET.get('sort', 'renewable_share')
+    if sort not in views.NATIONAL_SORTS:
+        return _error(f"Unknown sort: {sort}", 400)
+    year = request.GET.get('year')
+    if year and not year.isdigit():
+        return _error(f"Invalid year: {year!r}", 400)
+
+    version = store.generation_fingerprint
+    response = _not_modified(request, version())
+    if response is not None:
+        return response
+
+    national = views.get_national_generation(api_key, year, sort)
+    if national is None:
+        return _error("National generation data is not built yet", 503)
+    if not national['rankings']:
+        return _error(f"No data available for {national['year']}", 404)
+
+    ranked = national['rankings']
+    payload = {
+        'year': national['year'],
+        'sort': sort,
+        'states': [r['state'] for r in ranked],
+        'total': [r['total'] for r in ranked],
+        'renewable_share': [r['renewable_share'] for r in ranked],
+        'renewable_growth': [r['renewable_growth'] for r in ranked],
+        'yoy': [r['yoy'] for r in ranked],
+        'shares': {fuel: [r['shares'][code] for r in ranked] for code, fuel in STATE_FUEL_TYPES.items()},
+    }
+    return _json_response(request, payload, national['year'], version)
+
+
+@require_GET
+def net_load(request):
+    api_key = os.getenv('EIA_API_KEY')
+    region = request.GET.get('region', 'CISO')
+    if region not in NET_LOAD_REGIONS:
+        return _error(f"Unknown region: {region}", 400)
+    try:
+        since, time_range = _range(request)
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    version = lambda: store.hourly_version([region])
+    response = _not_modified(request, version())
+    if response is not None:
+        return response
+
+    chart_data = views.get_net_load_data(api_key, region, time_range)
+    if chart_data is None:
+        return _error(f"No data available for {region}", 502)
+
+    latest = chart_data['periods'][-1] if chart_data['periods'] else None
+    payload = {'region': region, **chart_data}
+    columns = ['labels', 'gross_demand', 'net_load', 'solar', 'wind']
+    return _json_response(request, _filter_since(payload, 'periods', columns, since), latest, version)
+
+
+@require_GET
+def net_load_overview(request):
+    api_key = os.getenv('EIA_API_KEY')
+    try:
+        since = _since(request)
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    version = lambda: store.hourly_version(list(NET_LOAD_REGIONS))
+    response = _not_modified(request, version())
+    if response is not None:
+        return response
+
+    overview = views.get_net_load_overview(api_key)
+    if overview is None:
+        return _error("Net load data unavailable", 502)
+
+    columns = ['labels', 'gross_demand', 'net_load', 'solar', 'wind']
+    regions = {}
+    latest = None
+    for region in overview:
+        chart = region['chart']
+        if chart is None:
+            regions[region['code']] = None
+            continue
+        if chart['periods'] and (latest is None or _period_key(chart['periods'][-1]) > _period_key(latest)):
+            latest = chart['periods'][-1]
+        payload = {'name': region['name'], 'summary': region['summary'], **chart}
+        regions[region['code']] = _filter_since(payload, 'periods', columns, since)
+    return _json_response(request, {'regions': regions}, latest, version)
+
+
+@require_GET
+def congestion(request):
+    api_key = os.getenv('EIA_API_KEY')
+    region = request.GET.get('region', 'ERCO')
+    if region not in CONGESTION_REGIONS:
+        return _error(f"Unknown region: {region}", 400)
+    try:
+        since, time_range = _range(request)
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    version = lambda: store.hourly_version([region])
+    response = _not_modified(request, version())
+    if response is not None:
+        return response
+
+    data = views.get_congestion_data(api_key, region, time_range)
+    if data is None:
+        return _error(f"No data available for {region}", 502)
+
+    hourly = data['hourly_data']
+    latest = hourly[-1]['period'] if hourly else None
+    payload = {
+        'region': region,
+        'state': data['state_name'],
+        'capacity_mw': data['capacity_mw'],
+        'periods': [h['period'] for h in hourly],
+        'days': [h['day'] for h in hourly],
+        'hours': [h['hour'] for h in hourly],
+        'demand': [h['demand'] for h in hourly],
+        'utilization': [h['utilization'] for h in hourly],
+        'is_high': [h['is_high'] for h in hourly],
+    }
+    if 'grain' in data:
+        payload['grain'] = data['grain']
+    columns = ['days', 'hours', 'demand', 'utilization', 'is_high']
+    return _json_response(request, _filter_since(payload, 'periods', columns, since), latest, version)
+
+
+@require_GET
+def congestion_profile(request):
+    api_key = os.getenv('EIA_API_KEY')
+    region = request.GET.get('region', 'ERCO')
+    layout = request.GET.get('layout', 'weekday')
+    if region not in CONGESTION_REGIONS:
+        return _error(f"Unknown region: {region}", 400)
+    if layout not in profiles.LAYOUTS:
+        return _error(f"Unknown layout: {layout}", 400)
+
+    version = lambda: store.hourly_version([region])
+    response = _not_modified(request, version())
+    if response is not None:
+        return response
+
+    profile = views.get_congestion_profile(api_key, region, layout)
+    if profile is None:
+        return _error(f"No stored demand history for {region}", 404)
+
+    # One row per weekday or month, one column per hour of day
+    payload = {
+        'region': region,
+        'layout': layout,
+        'capacity_mw': profile['capacity_mw'],
+        'stored_hours': profile['hours'],
+        'rows': profile['rows'],
+        'hours': list(range(24)),
+    }
+    for column in ['mean', 'p95', 'high_hours']:
+        payload[column] = [[c[column] for c in row['cells']] for row in profile['grid']]
+    payload['counts'] = [[c['hours'] for c in row['cells']] for row in profile['grid']]
+    return _json_response(request, payload, None, version)
+
+
+@require_GET
+def ready(request):
+    # Readiness for load balancers: the database answers and no boot
+    # warm-up (see warmup.py) is still running. A manual warm_cache run
+    # doesn't count, so it can't take a serving fleet out of rotation.
+    try:
+        connection.ensure_connection()
+        database = 'ok'
+    except Exception as e:
+        logger.error("Readiness Database Error: %s", e)
+        database = 'unavailable'
+    warm = warmup.status()
+    is_ready = database == 'ok' and not warmup.is_blocking(warm)
+    response = JsonResponse({'ready': is_ready, 'database': database, 'warmup': warm}, status=200 if is_ready else 503)
+    patch_cache_control(response, no_store=True)
+    return response
+
+
+@require_GET
+def stats(request):
+    # How this worker's upstream fetches were resolved: led, coalesced
+    # in-process or across workers, answered stale, or fetched after the
+    # cross-worker wait ran out; its circuit breaker for each EIA endpoint; and its API keys'
+    # current rates and tokens, with the requests queued for them
+    response = JsonResponse({
+        'singleflight': singleflight.stats(),
+        'circuits': breaker.states(),
+        'scheduler': scheduler.get_scheduler().stats(),
+    })
+    patch_cache_control(response, no_store=True)
+    return response
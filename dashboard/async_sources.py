@@ -0,0 +1,59 @@
+"""
+Async counterparts of the functions in sources.py, for the ASGI views.
+
+Store lookups run in a worker thread; upstream calls use the httpx client.
+"""
+from asgiref.sync import sync_to_async
+
+from . import eia, store
+from .sources import capacity_params, demand_params, fuel_params, generation_params, last_known_good
+
+
+async def _fetch(url, params, on_fetch, stored):
+    try:
+        return await eia.afetch_rows(url, params, on_fetch=on_fetch)
+    except eia.UPSTREAM_ERRORS:
+        rows = await sync_to_async(last_known_good)(url, params, stored)
+        if rows is None:
+            raise
+        return rows
+
+
+async def demand_rows(api_key, respondent, length):
+    rows = await sync_to_async(store.demand_rows)(respondent, length)
+    if rows is not None:
+        return rows
+    return await _fetch(
+        eia.REGION_DATA_URL, demand_params(api_key, respondent, length), store.upsert_demand,
+        lambda: store.demand_rows(respondent, length, current=False),
+    )
+
+
+async def fuel_rows(api_key, respondent, fueltypes, length):
+    rows = await sync_to_async(store.fuel_rows)(respondent, fueltypes, length)
+    if rows is not None:
+        return rows
+    return await _fetch(
+        eia.FUEL_TYPE_DATA_URL, fuel_params(api_key, respondent, fueltypes, length), store.upsert_fuel_output,
+        lambda: store.fuel_rows(respondent, fueltypes, length, current=False),
+    )
+
+
+async def generation_rows(api_key, location, fueltypes):
+    rows = await sync_to_async(store.generation_rows)(location, fueltypes)
+    if rows is not None:
+        return rows
+    return await _fetch(
+        eia.OPERATIONAL_DATA_URL, generation_params(api_key, location, fueltypes), store.upsert_generation,
+        lambda: store.generation_rows(location, fueltypes, current=False),
+    )
+
+
+async def capacity_rows(api_key, location, length=500):
+    rows = await sync_to_async(store.capacity_rows)(location, length)
+    if rows is not None:
+        return rows
+    return await _fetch(
+        eia.OPERATIONAL_DATA_URL, capacity_params(api_key, location, length), store.upsert_capacity,
+        lambda: store.capacity_rows(location, length, current=False),
+    )
@@ -0,0 +1,135 @@
+"""
+Async versions of the dashboard pages for ASGI deployments.
+
+They render the same templates from the same processing functions as the
+sync views in views.py, but fetch through async_sources so a worker keeps
+serving other requests while EIA round-trips are in flight. Enabled with
+DASHBOARD_ASYNC_VIEWS=True (see dashboard/urls.py).
+"""
+import logging
+import os
+
+from asgiref.sync import sync_to_async
+
+from . import async_sources, timerange, views
+from .concurrency import arun_concurrently
+from .metrics import render
+from .regions import STATE_FUEL_TYPES
+
+logger = logging.getLogger(__name__)
+
+
+async def index(request):
+    api_key = os.getenv('EIA_API_KEY')
+    demand_context = {'labels': [], 'data': []}
+    error_msg = None
+
+    time_range = timerange.from_request(request)
+    try:
+        if time_range is None:
+            data_rto = await async_sources.demand_rows(api_key, 'US48', 24)
+            demand_context = views.process_demand(data_rto)
+        else:
+            # Long ranges page through the sync planner
+            demand_context = await sync_to_async(views.demand_context_for, thread_sensitive=False)(
+                api_key, 'US48', time_range,
+            )
+    except Exception as e:
+        error_msg = f"US Demand Data unavailable: {str(e)}"
+
+    context = views.index_context(demand_context, error_msg)
+    context.update(views.range_context(request, time_range, 'Last 24 Hours'))
+    return render(request, 'dashboard/index.html', context)
+
+
+async def get_state_generation(api_key, state_code):
+    if not api_key:
+        return None
+
+    try:
+        chart_data = await sync_to_async(views.cube_state_generation, thread_sensitive=False)(api_key, state_code)
+        if chart_data is not None:
+            return chart_data
+        raw_data = await async_sources.generation_rows(api_key, state_code, list(STATE_FUEL_TYPES.keys()))
+        return views.process_state_generation(raw_data)
+    except Exception as e:
+        logger.error("State Data Error: %s", e)
+        return None
+
+
+async def state_analysis(request):
+    api_key = os.getenv('EIA_API_KEY')
+    selected_state = request.GET.get('state', 'TX')
+    state_chart_data = await get_state_generation(api_key, selected_state)
+    return render(
+        request, 'dashboard/state_analysis.html', views.state_analysis_context(selected_state, state_chart_data),
+    )
+
+
+async def national_generation(request):
+    api_key = os.getenv('EIA_API_KEY')
+    sort = request.GET.get('sort', 'renewable_share')
+    if sort not in views.NATIONAL_SORTS:
+        sort = 'renewable_share'
+    national = await sync_to_async(views.get_national_generation, thread_sensitive=False)(
+        api_key, request.GET.get('year'), sort,
+    )
+    return render(
+        request, 'dashboard/national_generation.html', views.national_generation_context(national, sort),
+    )
+
+
+async def get_net_load_data(api_key, region_code, time_range=None):
+    if not api_key:
+        return None
+    if time_range is not None:
+        return await sync_to_async(views.get_net_load_data, thread_sensitive=False)(api_key, region_code, time_range)
+    results = await arun_concurrently(views.net_load_calls(api_key, region_code, fetch=async_sources))
+    return views.net_load_from_results(results)
+
+
+async def net_load_analysis(request):
+    api_key = os.getenv('EIA_API_KEY')
+    selected_region = request.GET.get('region', 'CISO')
+    time_range = timerange.from_request(request)
+    chart_data = await get_net_load_data(api_key, selected_region, time_range)
+    context = views.net_load_context(selected_region, chart_data)
+    context.update(views.range_context(request, time_range, 'Last 48 Hours'))
+    return render(request, 'dashboard/net_load.html', context)
+
+
+async def net_load_overview(request):
+    api_key = os.getenv('EIA_API_KEY')
+    # The merged multi-region fetch goes through the sync planner
+    overview = await sync_to_async(views.get_net_load_overview, thread_sensitive=False)(api_key)
+    return render(request, 'dashboard/net_load_overview.html', {'overview': overview})
+
+
+async def get_congestion_data(api_key, region_code, time_range=None):
+    if not api_key:
+        return None
+    if time_range is not None:
+        # Long ranges read rollups or page through the sync planner
+        return await sync_to_async(views.get_congestion_data, thread_sensitive=False)(api_key, region_code, time_range)
+    total_capacity = await sync_to_async(views.congestion_capacity, thread_sensitive=False)(api_key, region_code)
+    try:
+        demand_data = await async_sources.demand_rows(api_key, region_code, 48)
+    except Exception as e:
+        demand_data = e
+    return views.congestion_from_results(region_code, total_capacity, demand_data)
+
+
+async def congestion_proxy(request):
+    api_key = os.getenv('EIA_API_KEY')
+    selected_region = views.congestion_region(request)
+    time_range = timerange.from_request(request)
+    data = await get_congestion_data(api_key, selected_region, time_range)
+    context = views.congestion_context(selected_region, data)
+    context.update(views.range_context(request, time_range, 'Last 48 Hours'))
+    context['heatmap_mode'] = mode = views.heatmap_mode(request)
+    context['heatmap_modes'] = views.HEATMAP_MODES
+    if mode != 'recent':
+        context['profile'] = await sync_to_async(views.get_congestion_profile, thread_sensitive=False)(
+            api_key, selected_region, mode,
+        )
+    return render(request, 'dashboard/congestion.html', context)
@@ -0,0 +1,93 @@
+"""
+Circuit breakers for the EIA endpoints.
+
+Each endpoint ('rto/region-data', 'rto/fuel-type-data', ...) has one breaker
+per process. It opens after EIA_BREAKER_FAILURES consecutive failed calls:
+dropped connections, 429/5xx, invalid payloads, and calls that ran out of
+their latency budget. While it is open, calls fail at once instead of
+waiting on EIA, and the views fall back to the last-known-good data (see
+freshness.py). After EIA_BREAKER_COOLDOWN seconds it goes half-open and lets
+one probe through. A successful probe closes it; a failed one opens it for
+another cooldown. Errors that show EIA is answering (400, 403, 404) don't
+count as failures.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+# dashboard_breaker_state values
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class Breaker:
+    def __init__(self, name):
+        self.name = name
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go upstream now; at most one probe at a time while half-open."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= settings.EIA_BREAKER_COOLDOWN:
+                self._move(HALF_OPEN)
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.probing = False
+            if self.state != CLOSED:
+                self._move(CLOSED)
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probing = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= settings.EIA_BREAKER_FAILURES):
+                self.opened_at = time.monotonic()
+                self._move(OPEN)
+
+    def release(self):
+        # A call that ended without a verdict (cancelled, or a bug on our side)
+        with self._lock:
+            self.probing = False
+
+    def _move(self, state):
+        logger.warning("EIA Circuit (%s): %s -> %s", self.name, self.state, state)
+        self.state = state
+        metrics.count('breaker_transitions', endpoint=self.name, state=state)
+        metrics.gauge('breaker_state', STATE_VALUES[state], endpoint=self.name)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get(name):
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = Breaker(name)
+        return breaker
+
+
+def states():
+    """``{endpoint: {'state', 'failures'}}`` for every endpoint called so far in this process."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: {'state': b.state, 'failures': b.failures} for b in breakers}
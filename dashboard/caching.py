@@ -0,0 +1,272 @@
+"""
+Two-tier response cache for EIA queries.
+
+Entries live in Django's cache framework (shared by every worker on the
+host) with a small in-process LRU in front of it. Each entry carries a fresh
+deadline derived from the query's ``frequency`` and a longer stale deadline;
+between the two the stale value is served immediately while a single caller
+refreshes it in the background. Misses go through singleflight so identical
+queries fetch once across threads and workers. Past the stale deadline an
+entry is kept for EIA_LAST_KNOWN_GOOD_SECONDS more, but only served through
+last_known_good(), when a refetch has failed.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from . import metrics, scheduler, singleflight
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_front = LRUCache(settings.EIA_CACHE_FRONT_SIZE)
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def make_key(url, params):
+    # api_key never takes part in the key so rotating keys keeps the cache warm
+    normalized = []
+    for name, value in params.items():
+        if name == 'api_key':
+            continue
+        if isinstance(value, (list, tuple)):
+            value = sorted(str(v) for v in value)
+        else:
+            value = str(value)
+        normalized.append((name, value))
+    normalized.sort()
+    digest = hashlib.sha1(json.dumps([url, normalized]).encode()).hexdigest()
+    return f"eia:{digest}"
+
+
+def ttl_for(params):
+    return settings.EIA_CACHE_TTLS.get(params.get('frequency'), settings.EIA_CACHE_TTLS['hourly'])
+
+
+def _entry(value, ttl):
+    now = time.time()
+    entry = {
+        'value': value,
+        'fetched_at': now,
+        'fresh_until': now + ttl,
+        'stale_until': now + ttl * (1 + settings.EIA_CACHE_STALE_FACTOR),
+    }
+    # Kept past its stale deadline as the last-known-good copy for outages
+    return entry, math.ceil(entry['stale_until'] - now + settings.EIA_LAST_KNOWN_GOOD_SECONDS)
+
+
+def _store(key, value, ttl):
+    entry, timeout = _entry(value, ttl)
+    _front.set(key, entry)
+    cache.set(key, entry, timeout=timeout)
+    return entry
+
+
+def _lookup(key, now):
+    entry = _front.get(key)
+    if entry is None or now >= entry['fresh_until']:
+        # Another worker may already have refreshed the shared tier
+        shared = cache.get(key)
+        if shared is not None and (entry is None or shared['fresh_until'] > entry['fresh_until']):
+            entry = shared
+            _front.set(key, entry)
+    return entry
+
+
+def _shared_fresh(key):
+    entry = cache.get(key)
+    if entry is not None and time.time() < entry['fresh_until']:
+        _front.set(key, entry)
+        return True, entry['value']
+    return False, None
+
+
+def _refresh_in_background(key, ttl, fetch):
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+    lock_key = f"{key}:refresh"
+    if not cache.add(lock_key, 1, timeout=int(settings.EIA_REQUEST_BUDGET) + 5):
+        # Some other worker owns this refresh
+        with _refreshing_lock:
+            _refreshing.discard(key)
+        return
+
+    def run():
+        try:
+            with scheduler.priority('warmup'):
+                _store(key, fetch(), ttl)
+        except Exception as e:
+            logger.error("Cache Refresh Error (%s): %s", key, e)
+            metrics.count('refresh_errors', kind='response_cache')
+        finally:
+            cache.delete(lock_key)
+            with _refreshing_lock:
+                _refreshing.discard(key)
+            connections.close_all()
+
+    threading.Thread(target=run, name=f"refresh-{key}", daemon=True).start()
+
+
+def get_or_fetch(key, ttl, fetch):
+    """Return the cached value for ``key``, calling ``fetch()`` on a miss."""
+    now = time.time()
+    entry = _lookup(key, now)
+    if entry is not None:
+        if now >= entry['fresh_until'] and now < entry['stale_until']:
+            _refresh_in_background(key, ttl, fetch)
+        if now < entry['stale_until']:
+            metrics.count('eia_cache', result='fresh' if now < entry['fresh_until'] else 'stale')
+            return entry['value']
+
+    metrics.count('eia_cache', result='miss')
+    # An expired entry still beats a stampede while another worker refetches
+    stale = entry['value'] if entry is not None else None
+    return singleflight.do(
+        key, lambda: _store(key, fetch(), ttl)['value'], lambda: _shared_fresh(key), stale=stale,
+    )
+
+
+def peek(key):
+    """The fresh cached value for ``key``, or None; never fetches."""
+    now = time.time()
+    entry = _lookup(key, now)
+    if entry is not None and now < entry['fresh_until']:
+        metrics.count('eia_cache', result='fresh')
+        return entry['value']
+    metrics.count('eia_cache', result='miss')
+    return None
+
+
+def last_known_good(key):
+    """``(value, fetched_at)`` of the newest copy held for ``key``, however old; None if none.
+
+    For when a refetch failed. ``fetched_at`` is an aware datetime, or None
+    for entries cached before it was recorded.
+    """
+    entry = _front.get(key) or cache.get(key)
+    if entry is None:
+        return None
+    fetched_at = entry.get('fetched_at')
+    return entry['value'], datetime.fromtimestamp(fetched_at, dt_timezone.utc) if fetched_at else None
+
+
+def put(key, value, ttl):
+    """Store a value fetched outside get_or_fetch() (e.g. by a merged request)."""
+    return _store(key, value, ttl)['value']
+
+
+# --- Async variants, used by the ASGI views ---
+
+_refresh_tasks = set()
+
+
+async def _astore(key, value, ttl):
+    entry, timeout = _entry(value, ttl)
+    _front.set(key, entry)
+    await cache.aset(key, entry, timeout=timeout)
+    return entry
+
+
+async def _alookup(key, now):
+    entry = _front.get(key)
+    if entry is None or now >= entry['fresh_until']:
+        shared = await cache.aget(key)
+        if shared is not None and (entry is None or shared['fresh_until'] > entry['fresh_until']):
+            entry = shared
+            _front.set(key, entry)
+    return entry
+
+
+async def _ashared_fresh(key):
+    entry = await cache.aget(key)
+    if entry is not None and time.time() < entry['fresh_until']:
+        _front.set(key, entry)
+        return True, entry['value']
+    return False, None
+
+
+def _arefresh_in_background(key, ttl, fetch):
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+    lock_key = f"{key}:refresh"
+
+    async def run():
+        try:
+            if not await cache.aadd(lock_key, 1, timeout=int(settings.EIA_REQUEST_BUDGET) + 5):
+                return
+            try:
+                with scheduler.priority('warmup'):
+                    await _astore(key, await fetch(), ttl)
+            except Exception as e:
+                logger.error("Cache Refresh Error (%s): %s", key, e)
+                metrics.count('refresh_errors', kind='response_cache')
+            finally:
+                await cache.adelete(lock_key)
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    # Hold a reference so the task isn't garbage collected mid-flight
+    task = asyncio.create_task(run())
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
+
+
+async def aget_or_fetch(key, ttl, fetch):
+    """Async counterpart of get_or_fetch(); ``fetch`` is a coroutine function."""
+    now = time.time()
+    entry = await _alookup(key, now)
+    if entry is not None:
+        if now >= entry['fresh_until'] and now < entry['stale_until']:
+            _arefresh_in_background(key, ttl, fetch)
+        if now < entry['stale_until']:
+            metrics.count('eia_cache', result='fresh' if now < entry['fresh_until'] else 'stale')
+            return entry['value']
+
+    metrics.count('eia_cache', result='miss')
+
+    async def fill():
+        return (await _astore(key, await fetch(), ttl))['value']
+
+    stale = entry['value'] if entry is not None else None
+    return await singleflight.ado(key, fill, lambda: _ashared_fresh(key), stale=stale)
@@ -0,0 +1,100 @@
+"""
+Nameplate-capacity index for every state.
+
+Summarizing a state's annual capacity rows (find the all-fuel total, or sum
+the major fuels when EIA omits it) used to happen on every congestion page
+hit. The index does it once per refresh for all states and keeps, per
+state, the latest year's total, its per-fuel breakdown and the yearly
+history. It is a Snapshot (see snapshots.py): ingest_eia rebuilds it after
+each pass, a miss schedules a rebuild in the background, and a lookup is a
+dict access.
+"""
+import logging
+import time
+
+from . import eia, sources, store
+from .regions import ALL_STATES, REGION_TO_STATE
+from .snapshots import Snapshot
+
+logger = logging.getLogger(__name__)
+
+INDEX_KEY = 'capacity:index'
+# Summed when a year has no 'ALL' total row
+MAJOR_FUELS = ['WND', 'SUN', 'NG', 'COW', 'NUC', 'HYC']
+
+
+def summarize(rows):
+    """Summarize one state's sector-99 capacity rows, or None if they hold no total."""
+    years = {}
+    for row in rows:
+        if row.get('sectorid') != '99':
+            continue
+        try:
+            mw = float(row.get('nameplate-capacity-mw', 0) or 0)
+        except (ValueError, TypeError):
+            continue
+        by_fuel = years.setdefault(row.get('period'), {})
+        fuel = row.get('fueltypeid')
+        by_fuel[fuel] = by_fuel.get(fuel, 0) + mw
+
+    history = {}
+    for year, by_fuel in years.items():
+        total = by_fuel.get('ALL', 0)
+        if total <= 0:
+            total = sum(by_fuel.get(ft, 0) for ft in MAJOR_FUELS)
+        if total > 0:
+            history[year] = total
+    if not history:
+        return None
+
+    latest = max(history)
+    return {
+        'year': latest,
+        'total_mw': history[latest],
+        'by_fuel': {ft: mw for ft, mw in years[latest].items() if ft != 'ALL'},
+        'history': dict(sorted(history.items())),
+    }
+
+
+def index_states():
+    return list(dict.fromkeys([*ALL_STATES, *REGION_TO_STATE.values()]))
+
+
+def build_index(api_key=None):
+    """Summarize every state from the store, fetching states it lacks when ``api_key`` is set."""
+    states = index_states()
+    grouped = store.capacity_by_location(states)
+
+    missing = [s for s in states if s not in grouped]
+    if missing and api_key:
+        # One merged multi-location request instead of one per state
+        results = sources.fetch_planned(api_key, {
+            s: (eia.OPERATIONAL_DATA_URL, sources.capacity_params(api_key, s, 500), store.upsert_capacity)
+            for s in missing
+        })
+        for state, rows in results.items():
+            if isinstance(rows, Exception):
+                logger.error("Capacity Index Error (%s): %s", state, rows)
+            else:
+                grouped[state] = rows
+
+    summaries = {}
+    for state, rows in grouped.items():
+        summary = summarize(rows)
+        if summary is not None:
+            summaries[state] = summary
+    return {'states': summaries, 'built_at': time.time()}
+
+
+_index = Snapshot(INDEX_KEY, build_index)
+
+get_index = _index.get
+current_index = _index.current
+refresh = _index.refresh
+refresh_in_background = _index.refresh_in_background
+
+
+def for_state(state_code, api_key=None):
+    """A state's summary, rebuilding the index in the background when it is missing or out of date."""
+    index = current_index(api_key)
+    return index['states'].get(state_code) if index else None
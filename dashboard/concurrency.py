@@ -0,0 +1,103 @@
+"""
+Helpers for running independent upstream fetches side by side: a bounded
+thread pool for the sync views and asyncio.gather for the async ones.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.db import connections
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+# Set on the pool's threads, so calls made from one run inline (see run_concurrently)
+_local = threading.local()
+
+
+def get_executor():
+    # Like the HTTP session, the pool must not be shared across a fork
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.EIA_MAX_CONCURRENCY, thread_name_prefix='eia-fetch',
+                )
+                _executor_pid = pid
+    return _executor
+
+
+def _task(fn):
+    # Run in a copy of the caller's context so context-local state (timings,
+    # request priority, ...) follows the call onto the worker thread.
+    ctx = contextvars.copy_context()
+
+    def run():
+        _local.in_pool = True
+        try:
+            return ctx.run(fn)
+        finally:
+            _local.in_pool = False
+            connections.close_all()
+    return run
+
+
+def run_concurrently(calls, timeout=None):
+    """Run ``{name: callable}`` concurrently and return ``{name: result}``.
+
+    A call that raises or misses the timeout gets its exception as the
+    result instead, so callers can keep their own per-call fallbacks. A
+    call still running at the timeout can't be stopped; it keeps its thread
+    until its own upstream budget runs out.
+
+    From one of the pool's own threads (a view fanned out by the warm-up,
+    say) the calls run one after another on that thread instead: waiting
+    there on more pool work could fill the pool with waiters and deadlock.
+    """
+    if getattr(_local, 'in_pool', False):
+        results = {}
+        for name, fn in calls.items():
+            try:
+                results[name] = fn()
+            except Exception as e:
+                results[name] = e
+        return results
+
+    timeout = settings.EIA_REQUEST_BUDGET + 1 if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    executor = get_executor()
+    futures = {name: executor.submit(_task(fn)) for name, fn in calls.items()}
+
+    results = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeout:
+            future.cancel()
+            results[name] = TimeoutError(f"{name} did not finish within {timeout}s")
+        except Exception as e:
+            results[name] = e
+    return results
+
+
+async def arun_concurrently(calls, timeout=None):
+    """Async counterpart of run_concurrently(); the callables return awaitables."""
+    timeout = settings.EIA_REQUEST_BUDGET + 1 if timeout is None else timeout
+
+    async def run(name, fn):
+        try:
+            return await asyncio.wait_for(fn(), timeout)
+        except asyncio.TimeoutError:
+            return TimeoutError(f"{name} did not finish within {timeout}s")
+        except Exception as e:
+            return e
+
+    names = list(calls)
+    results = await asyncio.gather(*(run(name, calls[name]) for name in names))
+    return dict(zip(names, results))
@@ -0,0 +1,190 @@
+"""
+State x year x fuel cube of annual generation for every state.
+
+The cube is built from the local store, with any state the store lacks
+fetched in one merged multi-location EIA request. It is a Snapshot (see
+snapshots.py) that ingest_eia rebuilds whenever stored generation changes,
+so the national rankings and each state's drill-down are array slices
+instead of per-state queries. Cells with no reported row are NaN.
+"""
+import logging
+import time
+
+import numpy as np
+
+from . import eia, series, sources, store
+from .regions import ALL_STATES, STATE_FUEL_TYPES
+from .snapshots import Snapshot
+
+logger = logging.getLogger(__name__)
+
+CUBE_KEY = 'generation:cube'
+# 'ALL' is the all-fuel total that shares are taken against
+FUELS = [*STATE_FUEL_TYPES, 'ALL']
+RENEWABLES = ['WND', 'SUN']
+# Window for renewable growth, in years
+GROWTH_YEARS = 5
+# A year counts as published once this share of states reports a total
+COMPLETE_SHARE = 0.8
+
+METRICS = {
+    'renewable_share': 'Wind + Solar Share (%)',
+    'renewable_growth': f'Wind + Solar Share Change, {GROWTH_YEARS}y (pts)',
+    'yoy': 'Total Generation YoY (%)',
+    'total': 'Total Generation (thousand MWh)',
+}
+
+
+def _complete(rows):
+    # Has an all-fuel total for its latest year
+    latest = rows[-1]['period']
+    return any(r['period'] == latest and r['fueltypeid'] == 'ALL' for r in rows)
+
+
+def build_cube(api_key=None):
+    """Build the cube from the store, fetching incomplete states when ``api_key`` is set."""
+    grouped = store.generation_by_location(ALL_STATES, FUELS)
+
+    missing = [s for s in ALL_STATES if s not in grouped or not _complete(grouped[s])]
+    if missing and api_key:
+        results = sources.fetch_planned(api_key, {
+            s: (eia.OPERATIONAL_DATA_URL, sources.generation_params(api_key, s, FUELS), store.upsert_generation)
+            for s in missing
+        })
+        for state, rows in results.items():
+            if isinstance(rows, Exception):
+                logger.error("Generation Cube Error (%s): %s", state, rows)
+            elif rows:
+                grouped[state] = rows
+
+    rows = [row for state in ALL_STATES for row in grouped.get(state, ()) if row.get('period')]
+    state_index = {s: i for i, s in enumerate(ALL_STATES)}
+    fuel_index = {f: i for i, f in enumerate(FUELS)}
+    years, year_pos = np.unique(np.asarray(series.column(rows, 'period'), dtype=str), return_inverse=True)
+    state_pos = np.array([state_index[r['location']] for r in rows], dtype=int)
+    fuel_pos = np.array([fuel_index.get(r['fueltypeid'], -1) for r in rows], dtype=int)
+    values = series.to_floats(series.column(rows, 'generation'))
+
+    keep = (fuel_pos >= 0) & ~np.isnan(values)
+    shape = (len(ALL_STATES), len(years), len(FUELS))
+    sums = np.zeros(shape)
+    counts = np.zeros(shape)
+    where = (state_pos[keep], year_pos[keep], fuel_pos[keep])
+    np.add.at(sums, where, values[keep])
+    np.add.at(counts, where, 1)
+    sums[counts == 0] = np.nan
+
+    return {
+        'states': list(ALL_STATES),
+        'years': years.tolist(),
+        'fuels': list(FUELS),
+        'values': sums,
+        'fingerprint': store.generation_fingerprint(),
+        'built_at': time.time(),
+    }
+
+
+_cube = Snapshot(CUBE_KEY, build_cube)
+
+get_cube = _cube.get
+current_cube = _cube.current
+refresh = _cube.refresh
+refresh_in_background = _cube.refresh_in_background
+
+
+def refresh_if_changed(api_key=None):
+    """Rebuild only when stored generation differs from what the cube was built from."""
+    cube = get_cube()
+    if cube is None or cube['fingerprint'] != store.generation_fingerprint():
+        return refresh(api_key)
+    return cube
+
+
+def state_totals(state_code, cube=None):
+    """One state's sorted years and ``{fuel: per-year totals}``, like series.annual_totals().
+
+    None if the cube has no rows for the state.
+    """
+    cube = cube or get_cube()
+    if cube is None or state_code not in cube['states']:
+        return None
+    values = cube['values'][cube['states'].index(state_code)]
+    reported = ~np.isnan(values).all(axis=1)
+    if not reported.any():
+        return None
+    values = np.nan_to_num(values[reported])
+    years = [y for y, r in zip(cube['years'], reported.tolist()) if r]
+    return years, {f: values[:, i].tolist() for i, f in enumerate(cube['fuels']) if f in STATE_FUEL_TYPES}
+
+
+def latest_year(cube):
+    """Newest year for which most states have published a total."""
+    totals = cube['values'][:, :, cube['fuels'].index('ALL')]
+    reporting = (~np.isnan(totals)).sum(axis=0)
+    published = np.flatnonzero(reporting >= COMPLETE_SHARE * len(cube['states']))
+    if len(published):
+        return cube['years'][published[-1]]
+    return cube['years'][-1] if cube['years'] else None
+
+
+def _number(value, digits=1):
+    return None if value != value else round(float(value), digits)
+
+
+def rankings(cube, year=None, sort='renewable_share'):
+    """Every state's fuel mix, renewable growth and YoY change in ``year``, ranked by ``sort``.
+
+    ``sort`` is one of METRICS or a fuel code (ranks by that fuel's share).
+    States without a figure for the sort metric go last.
+    """
+    year = year or latest_year(cube)
+    if year is None or year not in cube['years']:
+        return year, []
+    y = cube['years'].index(year)
+    fuel = {f: i for i, f in enumerate(cube['fuels'])}
+    values = cube['values']
+
+    renewables = [fuel[f] for f in RENEWABLES]
+
+    def renewable_share(y):
+        # A state that reports no wind or solar row has none
+        return np.nansum(values[:, y, renewables], axis=1) / values[:, y, fuel['ALL']] * 100
+
+    total = values[:, y, fuel['ALL']]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shares = np.nan_to_num(values[:, y, :]) / total[:, None] * 100
+        ren_share = renewable_share(y)
+        growth = np.full(len(cube['states']), np.nan)
+        past = str(int(year) - GROWTH_YEARS)
+        if past in cube['years']:
+            growth = ren_share - renewable_share(cube['years'].index(past))
+        yoy = np.full(len(cube['states']), np.nan)
+        if y > 0 and int(cube['years'][y - 1]) == int(year) - 1:
+            yoy = (total / values[:, y - 1, fuel['ALL']] - 1) * 100
+    shares[~np.isfinite(shares)] = np.nan
+    ren_share[~np.isfinite(ren_share)] = np.nan
+    growth[~np.isfinite(growth)] = np.nan
+    yoy[~np.isfinite(yoy)] = np.nan
+
+    metric = {
+        'renewable_share': ren_share,
+        'renewable_growth': growth,
+        'yoy': yoy,
+        'total': total,
+    }.get(sort)
+    if metric is None:
+        metric = shares[:, fuel[sort]]
+    # NaN sorts last with the negated key
+    order = np.argsort(-np.nan_to_num(metric, nan=-np.inf), kind='stable')
+
+    rows = []
+    for i in order.tolist():
+        rows.append({
+            'state': cube['states'][i],
+            'total': _number(total[i], 0),
+            'shares': {f: _number(shares[i, fuel[f]]) for f in STATE_FUEL_TYPES},
+            'renewable_share': _number(ren_share[i]),
+            'renewable_growth': _number(growth[i]),
+            'yoy': _number(yoy[i]),
+        })
+    return year, rows
@@ -0,0 +1,438 @@
+"""
+Shared client for the EIA Open Data API (v2).
+
+All upstream traffic goes through one pooled ``requests.Session`` per process
+so TLS connections to api.eia.gov are reused between page views. Every call
+runs under connect/read timeouts and a total latency budget, and transient
+failures (429/5xx, dropped connections) are retried with backoff while the
+budget allows. A circuit breaker per endpoint (breaker.py) fails calls fast
+while EIA keeps failing, and every attempt waits its turn for an API key
+in the rate-limit scheduler (scheduler.py). stream_rows() decodes large pages row by row as
+they arrive, for the backfill. The endpoints live under EIA_BASE_URL, and
+with EIA_RECORD_DIR set every payload is also saved for replay (see
+replay.py).
+
+The async half of the module mirrors the sync one on top of httpx, for the
+views served under ASGI.
+"""
+import asyncio
+import codecs
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import weakref
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import contextmanager
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from . import breaker, caching, metrics, replay, scheduler, singleflight
+
+logger = logging.getLogger(__name__)
+
+REGION_DATA_URL = f"{settings.EIA_BASE_URL}/electricity/rto/region-data/data"
+FUEL_TYPE_DATA_URL = f"{settings.EIA_BASE_URL}/electricity/rto/fuel-type-data/data"
+OPERATIONAL_DATA_URL = f"{settings.EIA_BASE_URL}/electricity/electric-power-operational-data/data"
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class EIAError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class EIABudgetExceeded(EIAError):
+    pass
+
+
+class EIACircuitOpen(EIAError):
+    pass
+
+
+class EIARateLimited(EIABudgetExceeded):
+    # The budget ran out queued for an API key, before anything reached EIA
+    pass
+
+
+# What a fetch through the response cache can fail with while EIA is down or
+# slow: our own errors, transport errors outside the retry loop's, and the
+# single-flight wait on another caller's fetch (timed out, or its leader
+# interrupted). The sources fall back to last-known-good data on any of them.
+UPSTREAM_ERRORS = (
+    EIAError, requests.RequestException, httpx.HTTPError,
+    FutureTimeout, asyncio.TimeoutError, singleflight.Abandoned,
+)
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    # One session per process: gunicorn forks workers after import, and a
+    # pool inherited across fork would share sockets between processes.
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=4,
+                    pool_maxsize=settings.EIA_POOL_SIZE,
+                    max_retries=0,  # retries are handled by get() so they respect the budget
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session, _session_pid = session, pid
+    return _session
+
+
+def _retry_delay(attempt, response):
+    if response is not None:
+        if response.status_code == 429:
+            return 0.0  # the scheduler paused the key; the retry waits for one that is free
+        retry_after = _retry_after(response)
+        if retry_after is not None:
+            return retry_after
+    backoff = settings.EIA_RETRY_BACKOFF * (2 ** (attempt - 1))
+    return backoff * random.uniform(0.5, 1.5)
+
+
+def _retry_after(response):
+    value = response.headers.get('Retry-After', '')
+    return float(value) if value.isdigit() else None
+
+
+def _take_key(params, deadline, budget):
+    # Wait for the scheduler to hand out a key within the budget; returns the
+    # params to send and the key to report the response against
+    try:
+        key = scheduler.get_scheduler().acquire(deadline - time.monotonic())
+    except scheduler.QueueTimeout as e:
+        raise EIARateLimited(f"EIA request exceeded its {budget}s budget waiting for an API key") from e
+    return (params if key is None else {**params, 'api_key': key}), key
+
+
+def _status_error(response):
+    # None for a 200. Otherwise an EIAError, which is raised straight away
+    # unless the status is worth retrying.
+    if response.status_code == 200:
+        return None
+    error = EIAError(
+        f"EIA API Error {response.status_code}: {response.text[:200]}",
+        status=response.status_code,
+    )
+    if response.status_code not in RETRY_STATUSES:
+        raise error
+    return error
+
+
+def _payload_or_error(response):
+    # Returns (payload, None) on success and (None, error) for a retryable
+    # status; anything else raises straight away.
+    error = _status_error(response)
+    if error is not None:
+        return None, error
+    try:
+        return response.json(), None
+    except ValueError as e:
+        raise EIAError(f"EIA returned invalid JSON: {e}", status=200)
+
+
+def _rows(payload):
+    if not isinstance(payload, dict) or not isinstance(payload.get('response'), dict) \
+            or 'data' not in payload['response']:
+        # EIA answered, but not with data: counts against the breaker like invalid JSON
+        raise EIAError("API response format unexpected.", status=200)
+    return payload['response']['data']
+
+
+def _send(url, params, budget=None, stream=False):
+    """GET an EIA endpoint, retrying within the budget; returns the 200 response."""
+    budget = settings.EIA_REQUEST_BUDGET if budget is None else budget
+    deadline = time.monotonic() + budget
+    attempt = 0
+
+    while True:
+        if deadline - time.monotonic() <= 0:
+            raise EIABudgetExceeded(f"EIA request exceeded its {budget}s budget")
+        sent, key = _take_key(params, deadline, budget)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise EIABudgetExceeded(f"EIA request exceeded its {budget}s budget")
+
+        timeout = (
+            min(settings.EIA_CONNECT_TIMEOUT, remaining),
+            min(settings.EIA_READ_TIMEOUT, remaining),
+        )
+        response = None
+        try:
+            response = get_session().get(url, params=sent, timeout=timeout, stream=stream)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = EIAError(f"EIA request failed: {e}")
+        else:
+            scheduler.get_scheduler().report(key, response.status_code, _retry_after(response))
+            error = _status_error(response)
+            if error is None:
+                return response
+            response.close()
+
+        attempt += 1
+        if attempt > settings.EIA_MAX_RETRIES:
+            raise error
+
+        delay = _retry_delay(attempt, response)
+        if delay >= deadline - time.monotonic():
+            raise EIABudgetExceeded(f"EIA request exceeded its {budget}s budget") from error
+        time.sleep(delay)
+
+
+def _trips(error):
+    # Failures that say EIA is struggling, as opposed to rejecting the query
+    return error.status is None or error.status == 200 or error.status in RETRY_STATUSES
+
+
+@contextmanager
+def _guarded(name):
+    """Run one upstream call through ``name``'s circuit breaker and count its outcome."""
+    circuit = breaker.get(name)
+    if not circuit.allow():
+        metrics.count('eia_requests', endpoint=name, outcome='circuit_open')
+        raise EIACircuitOpen(f"EIA circuit open for {name}; failing fast")
+    try:
+        yield
+    except EIARateLimited:
+        # Our own throttling says nothing about EIA's health
+        metrics.count('eia_requests', endpoint=name, outcome='rate_limited')
+        circuit.release()
+        raise
+    except EIAError as e:
+        metrics.count('eia_requests', endpoint=name, outcome='error')
+        if _trips(e):
+            circuit.failure()
+        else:
+            circuit.success()
+        raise
+    except BaseException:
+        circuit.release()
+        raise
+    metrics.count('eia_requests', endpoint=name, outcome='ok')
+    circuit.success()
+
+
+def get(url, params, budget=None):
+    """GET an EIA endpoint and return the decoded JSON payload, checked to hold data rows."""
+    name = metrics.endpoint(url)
+    with _guarded(name), metrics.timed('eia_request', endpoint=name):
+        response = _send(url, params, budget=budget)
+        try:
+            payload = response.json()
+        except ValueError as e:
+            raise EIAError(f"EIA returned invalid JSON: {e}", status=200)
+        _rows(payload)
+    # Only payloads that passed validation are recorded for replay
+    replay.record(url, params, payload)
+    return payload
+
+
+_DATA_ARRAY = re.compile(r'"data"\s*:\s*\[')
+_decoder = json.JSONDecoder()
+
+
+def iter_rows(chunks):
+    """Yield the ``response.data`` rows of an EIA payload from raw byte chunks.
+
+    Rows are decoded one at a time as their bytes arrive, so memory holds
+    one chunk plus one row however long the page is.
+    """
+    decode = codecs.getincrementaldecoder('utf-8')().decode
+    buf = ''
+    pos = 0
+    in_data = False
+    seen_response = False
+    for chunk in chunks:
+        buf = buf[pos:] + decode(chunk)
+        pos = 0
+        if not in_data:
+            if not seen_response:
+                found = buf.find('"response"')
+                if found < 0:
+                    buf = buf[-16:]
+                    continue
+                seen_response = True
+                buf = buf[found:]
+            match = _DATA_ARRAY.search(buf)
+            if match is None:
+                buf = buf[-16:]
+                continue
+            in_data = True
+            pos = match.end()
+
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos >= len(buf):
+                break
+            if buf[pos] == ']':
+                return
+            try:
+                row, pos = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break  # the row continues in the next chunk
+            yield row
+
+    raise EIAError("API response format unexpected.", status=200)
+
+
+def stream_rows(url, params, budget=None, chunk_size=64 * 1024):
+    """Fetch an EIA query uncached and yield its rows as the body streams in.
+
+    The breaker's verdict waits for the whole body: a stream that breaks off
+    or doesn't parse counts against it, as a bad payload does in get().
+    """
+    with _guarded(metrics.endpoint(url)):
+        response = _send(url, params, budget=budget, stream=True)
+        try:
+            yield from iter_rows(response.iter_content(chunk_size=chunk_size))
+        except requests.RequestException as e:
+            raise EIAError(f"EIA stream interrupted: {e}")
+        except ValueError as e:
+            raise EIAError(f"EIA returned invalid JSON: {e}", status=200)
+        finally:
+            response.close()
+
+
+def fetch_uncached(url, params, budget=None):
+    """Fetch an EIA query straight from upstream, bypassing the response cache."""
+    return _rows(get(url, params, budget=budget))
+
+
+def fetch_rows(url, params, budget=None, on_fetch=None):
+    """Fetch an EIA query and return its ``response.data`` rows.
+
+    Results are served from the response cache when possible; callers get
+    their own list so sorting or reversing it never touches the cached copy.
+    ``on_fetch(rows)`` runs only when the rows actually came from upstream.
+    """
+    def fetch():
+        rows = fetch_uncached(url, params, budget)
+        if on_fetch is not None:
+            try:
+                on_fetch(rows)
+            except Exception as e:
+                logger.error("EIA on_fetch Error: %s", e)
+                metrics.count('store_write_errors', endpoint=metrics.endpoint(url))
+        return rows
+
+    key = caching.make_key(url, params)
+    rows = caching.get_or_fetch(key, caching.ttl_for(params), fetch)
+    return list(rows)
+
+
+# --- Async client ---
+
+# httpx clients are bound to the event loop that created them
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(limits=httpx.Limits(
+            max_connections=settings.EIA_ASYNC_POOL_SIZE,
+            max_keepalive_connections=settings.EIA_POOL_SIZE,
+        ))
+        _async_clients[loop] = client
+    return client
+
+
+async def aget(url, params, budget=None):
+    """Async counterpart of get()."""
+    name = metrics.endpoint(url)
+    with _guarded(name), metrics.timed('eia_request', endpoint=name):
+        payload = await _aget(url, params, budget)
+        _rows(payload)
+    replay.record(url, params, payload)
+    return payload
+
+
+async def _atake_key(params, deadline, budget):
+    try:
+        key = await scheduler.get_scheduler().aacquire(deadline - time.monotonic())
+    except scheduler.QueueTimeout as e:
+        raise EIARateLimited(f"EIA request exceeded its {budget}s budget waiting for an API key") from e
+    return (params if key is None else {**params, 'api_key': key}), key
+
+
+async def _aget(url, params, budget):
+    budget = settings.EIA_REQUEST_BUDGET if budget is None else budget
+    deadline = time.monotonic() + budget
+    attempt = 0
+
+    while True:
+        if deadline - time.monotonic() <= 0:
+            raise EIABudgetExceeded(f"EIA request exceeded its {budget}s budget")
+        sent, key = await _atake_key(params, deadline, budget)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise EIABudgetExceeded(f"EIA request exceeded its {budget}s budget")
+
+        timeout = httpx.Timeout(
+            connect=min(settings.EIA_CONNECT_TIMEOUT, remaining),
+            read=min(settings.EIA_READ_TIMEOUT, remaining),
+            write=min(settings.EIA_READ_TIMEOUT, remaining),
+            pool=remaining,
+        )
+        response = None
+        try:
+            response = await get_async_client().get(url, params=sent, timeout=timeout)
+        except httpx.TransportError as e:
+            error = EIAError(f"EIA request failed: {e}")
+        else:
+            scheduler.get_scheduler().report(key, response.status_code, _retry_after(response))
+            payload, error = _payload_or_error(response)
+            if error is None:
+                return payload
+
+        attempt += 1
+        if attempt > settings.EIA_MAX_RETRIES:
+            raise error
+
+        delay = _retry_delay(attempt, response)
+        if delay >= deadline - time.monotonic():
+            raise EIABudgetExceeded(f"EIA request exceeded its {budget}s budget") from error
+        await asyncio.sleep(delay)
+
+
+async def afetch_uncached(url, params, budget=None):
+    return _rows(await aget(url, params, budget=budget))
+
+
+async def afetch_rows(url, params, budget=None, on_fetch=None):
+    """Async counterpart of fetch_rows(); ``on_fetch`` stays a sync callable."""
+    async def fetch():
+        rows = await afetch_uncached(url, params, budget)
+        if on_fetch is not None:
+            try:
+                await sync_to_async(on_fetch, thread_sensitive=False)(rows)
+            except Exception as e:
+                logger.error("EIA on_fetch Error: %s", e)
+                metrics.count('store_write_errors', endpoint=metrics.endpoint(url))
+        return rows
+
+    key = caching.make_key(url, params)
+    rows = await caching.aget_or_fetch(key, caching.ttl_for(params), fetch)
+    return list(rows)
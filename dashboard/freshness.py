@@ -0,0 +1,78 @@
+"""
+Last-known-good data while EIA is failing.
+
+When an upstream fetch fails (its endpoint's circuit breaker is open, or
+the call itself failed), sources.py serves the newest data still held
+instead: the store's rows however far behind they are, or else the
+expired response-cache entry kept for the query. Each such fallback is
+noted on the current request. The pages show a notice with the age of the
+oldest data they fell back to, and API payloads carry ``stale_since``.
+"""
+import contextvars
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import metrics
+
+_stale = contextvars.ContextVar('dashboard_stale_data', default=None)
+
+
+class StaleData:
+    # Fallbacks of one request, shared with its worker threads
+    def __init__(self):
+        self.stale = False
+        self.since = None  # as-of time of the oldest fallback, when known
+        self._lock = threading.Lock()
+
+    def add(self, as_of):
+        with self._lock:
+            self.stale = True
+            if as_of is not None and (self.since is None or as_of < self.since):
+                self.since = as_of
+
+
+def note(as_of, source):
+    """Record that last-known-good data from ``source`` ('store' or 'cache') was served."""
+    metrics.count('fallbacks', kind=f'last_known_good_{source}')
+    record = _stale.get()
+    if record is not None:
+        record.add(as_of)
+
+
+def current():
+    """This request's StaleData if it fell back to last-known-good data, else None."""
+    record = _stale.get()
+    return record if record is not None and record.stale else None
+
+
+class StaleDataMiddleware:
+    """Opens the per-request record that note() writes to."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _stale.set(StaleData())
+        try:
+            return self.get_response(request)
+        finally:
+            _stale.reset(token)
+
+    async def __acall__(self, request):
+        token = _stale.set(StaleData())
+        try:
+            return await self.get_response(request)
+        finally:
+            _stale.reset(token)
+
+
+def stale_data(request):
+    """Template context processor: ``stale_data`` for the notice in stale_notice.html."""
+    return {'stale_data': current()}
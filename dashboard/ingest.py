@@ -0,0 +1,202 @@
+"""
+Incremental EIA ingestion into the local store.
+
+Every series keeps a high-water mark (the newest period stored) in
+IngestCheckpoint, and each pass asks EIA only for periods from that mark on
+using the API's ``start`` filter. The mark's own period is requested again so
+late revisions to the newest hour are picked up; the idempotent upsert makes
+that overlap harmless. A pass runs through the request planner, which
+fetches series of the same kind for all respondents or states at once.
+
+backfill() loads long historical ranges instead: it walks the range in time
+windows and each window in offset/length pages, streaming rows and writing
+them in bounded batches so memory stays flat however much history is loaded.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import eia, planner, store
+from .models import IngestCheckpoint
+from .regions import ALL_STATES, DEMAND_RESPONDENTS, NET_LOAD_REGIONS, STATE_FUEL_TYPES
+
+Series = namedtuple('Series', 'key url params upsert hourly')
+
+KINDS = ['demand', 'fuel', 'generation', 'capacity']
+
+PAGE_LENGTH = planner.PAGE_LENGTH
+
+
+def demand_series(respondent):
+    return Series(f'demand:{respondent}', eia.REGION_DATA_URL, {
+        'frequency': 'local-hourly',
+        'data[0]': 'value',
+        'facets[respondent][]': respondent,
+        'facets[type][]': 'D',
+    }, store.upsert_demand, True)
+
+
+def fuel_series(respondent):
+    # All fuels, not just wind and solar, so the full mix is on hand locally
+    return Series(f'fuel:{respondent}', eia.FUEL_TYPE_DATA_URL, {
+        'frequency': 'local-hourly',
+        'data[0]': 'value',
+        'facets[respondent][]': respondent,
+    }, store.upsert_fuel_output, True)
+
+
+def generation_series(state):
+    return Series(f'generation:{state}', eia.OPERATIONAL_DATA_URL, {
+        'frequency': 'annual',
+        'data[0]': 'generation',
+        'facets[location][]': state,
+        'facets[sectorid][]': '99',
+        # 'ALL' is the total the national rankings take shares of
+        'facets[fueltypeid][]': [*STATE_FUEL_TYPES, 'ALL'],
+    }, store.upsert_generation, False)
+
+
+def capacity_series(state):
+    return Series(f'capacity:{state}', eia.OPERATIONAL_DATA_URL, {
+        'frequency': 'annual',
+        'data[0]': 'nameplate-capacity-mw',
+        'facets[location][]': state,
+        'facets[sectorid][]': '99',
+    }, store.upsert_capacity, False)
+
+
+def all_series(kinds=None):
+    kinds = kinds or KINDS
+    series = []
+    if 'demand' in kinds:
+        series += [demand_series(r) for r in DEMAND_RESPONDENTS]
+    if 'fuel' in kinds:
+        series += [fuel_series(r) for r in NET_LOAD_REGIONS]
+    if 'generation' in kinds:
+        series += [generation_series(s) for s in ALL_STATES]
+    if 'capacity' in kinds:
+        series += [capacity_series(s) for s in ALL_STATES]
+    return series
+
+
+def _newest_period(rows, hourly):
+    if hourly:
+        return max(rows, key=lambda r: store.parse_period(r['period']))['period']
+    return max(r['period'] for r in rows)
+
+
+def ingest(api_key, series_list, lookback_hours):
+    """Fetch and store everything newer than each series' high-water mark.
+
+    Series that differ only in their respondent or state are fetched
+    together through the request planner. Returns ``{series key: rows
+    written or the exception that stopped it}`` and the number of upstream
+    requests issued.
+    """
+    initial_start = (timezone.now() - timedelta(hours=lookback_hours)).strftime('%Y-%m-%dT%H')
+    keys = [series.key for series in series_list]
+    checkpoints = IngestCheckpoint.objects.in_bulk(keys, field_name='series')
+    queries = []
+    for series in series_list:
+        checkpoint = checkpoints.setdefault(series.key, IngestCheckpoint(series=series.key))
+        params = {**series.params, 'sort[0][column]': 'period', 'sort[0][direction]': 'asc'}
+        start = checkpoint.high_water or (initial_start if series.hourly else '')
+        if start:
+            params['start'] = start
+        queries.append(planner.Query(series.key, series.url, params))
+
+    fetched, requests = planner.execute(api_key, queries)
+
+    results = {}
+    for series in series_list:
+        rows = fetched[series.key]
+        if isinstance(rows, Exception) or not rows:
+            results[series.key] = rows or 0
+            continue
+        checkpoint = checkpoints[series.key]
+        try:
+            # Rows and their mark commit together, so a crash never skips rows
+            with transaction.atomic():
+                results[series.key] = series.upsert(rows)
+                checkpoint.high_water = _newest_period(rows, series.hourly)
+                checkpoint.save()
+        except Exception as e:
+            results[series.key] = e
+    return results, requests
+
+
+def backfill_series(kinds=None):
+    """Hourly series worth backfilling: demand and the full fuel mix of every respondent."""
+    kinds = kinds or KINDS
+    series = []
+    if 'demand' in kinds:
+        series += [demand_series(r) for r in DEMAND_RESPONDENTS]
+    if 'fuel' in kinds:
+        series += [fuel_series(r) for r in DEMAND_RESPONDENTS]
+    return series
+
+
+def _hour(dt):
+    return dt.strftime('%Y-%m-%dT%H')
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def backfill(api_key, series, start, end, window=timedelta(days=31), batch_size=store.BATCH_SIZE):
+    """Load an hourly series for the UTC hours in [start, end).
+
+    Progress is checkpointed as 'backfill:<series key>' after every batch
+    (the current window's start plus the rows of it already written); a
+    checkpoint inside [start, end] is resumed from. Returns the number of
+    rows written.
+    """
+    checkpoint, _ = IngestCheckpoint.objects.get_or_create(series=f'backfill:{series.key}')
+    window_start, offset = start, 0
+    if checkpoint.high_water:
+        resumed = datetime.strptime(checkpoint.high_water, '%Y-%m-%dT%H')
+        if start <= resumed <= end:
+            window_start, offset = resumed, checkpoint.offset
+
+    def save(window_start, offset):
+        checkpoint.high_water = _hour(window_start)
+        checkpoint.offset = offset
+        checkpoint.save(update_fields=['high_water', 'offset', 'updated_at'])
+
+    written = 0
+    while window_start < end:
+        window_end = min(window_start + window, end)
+        while True:
+            params = planner.totally_ordered(series.url, {
+                'api_key': api_key,
+                **series.params,
+                'start': _hour(window_start),
+                'end': _hour(window_end - timedelta(hours=1)),
+                'sort[0][column]': 'period',
+                'sort[0][direction]': 'asc',
+                'offset': offset,
+                'length': PAGE_LENGTH,
+            })
+
+            page_rows = 0
+            for batch in _batches(eia.stream_rows(series.url, params), batch_size):
+                written += series.upsert(batch)
+                page_rows += len(batch)
+                save(window_start, offset + page_rows)
+
+            offset += page_rows
+            if page_rows < PAGE_LENGTH:
+                break
+        window_start, offset = window_end, 0
+        save(window_start, offset)
+    return written
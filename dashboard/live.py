@@ -0,0 +1,298 @@
+"""
+Server-Sent Events feed of new chart points, for the ASGI app.
+
+Browsers subscribe to series such as 'demand:US48', 'net_load:CISO' or
+'congestion:ERCO'. Each series has one poller task per worker process: it
+re-reads the series every LIVE_POLL_INTERVAL seconds through the same
+store-first async paths as the pages, and fans the points that are new or
+revised out to every subscriber. Upstream load therefore depends on the
+number of series being watched, not on the number of open dashboards.
+
+Every subscriber has a bounded queue. One that falls LIVE_QUEUE_SIZE events
+behind, or whose stream has not been written to for LIVE_CLIENT_TIMEOUT
+seconds, is disconnected; EventSource reconnects with Last-Event-ID and
+catches up from the poller's latest snapshot. The event id is the
+subscriber's cursor for every series it watches (``demand:US48=<period>;...``),
+so each series resumes from its own last point. A poller stops once it has
+no subscribers left.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import time
+import weakref
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from . import async_sources, async_views, metrics, payloads, store, views
+from .regions import CONGESTION_REGIONS, DEMAND_RESPONDENTS, NET_LOAD_REGIONS
+
+logger = logging.getLogger(__name__)
+
+
+async def _demand(api_key, respondent):
+    demand_context = views.process_demand(await async_sources.demand_rows(api_key, respondent, 24))
+    return {
+        'periods': demand_context['periods'],
+        'labels': demand_context['labels'],
+        'values': demand_context['data'],
+    }
+
+
+async def _net_load(api_key, region):
+    chart = await async_views.get_net_load_data(api_key, region)
+    if chart is None:
+        return None
+    return {c: chart[c] for c in ['periods', 'labels', 'gross_demand', 'net_load', 'solar', 'wind']}
+
+
+async def _congestion(api_key, region):
+    data = await async_views.get_congestion_data(api_key, region)
+    # process_congestion() pads a failed fetch with mock hours; never push those
+    if data is None or not data['hourly_data'] or data['hourly_data'][0]['day'] == 'MockDay':
+        return None
+    hourly = data['hourly_data']
+    payload = {'periods': [h['period'] for h in hourly], 'capacity_mw': data['capacity_mw']}
+    for column in ['demand', 'utilization', 'is_high']:
+        payload[column] = [h[column] for h in hourly]
+    return payload
+
+
+# kind -> (valid codes, async fetch returning columnar points or None)
+SERIES = {
+    'demand': (DEMAND_RESPONDENTS, _demand),
+    'net_load': (NET_LOAD_REGIONS, _net_load),
+    'congestion': (CONGESTION_REGIONS, _congestion),
+}
+
+
+def parse_series(values):
+    """Validate ``kind:code`` names; raises ValueError."""
+    if not values:
+        raise ValueError("Pass at least one series, e.g. series=demand:US48")
+    keys = []
+    for value in values:
+        kind, _, code = value.partition(':')
+        if kind not in SERIES or code not in SERIES[kind][0]:
+            raise ValueError(f"Unknown series: {value!r}")
+        keys.append((kind, code))
+    return list(dict.fromkeys(keys))
+
+
+def _key(period):
+    # Hourly periods compare as UTC instants so local-hourly offsets sort right
+    try:
+        return store.parse_period(period).isoformat()
+    except ValueError:
+        return period or ''
+
+
+def _columns(payload):
+    return [c for c, v in payload.items() if isinstance(v, list)]
+
+
+def _select(payload, keep):
+    """``payload`` with only the points at indexes ``keep``."""
+    return {c: [v[i] for i in keep] if isinstance(v, list) else v for c, v in payload.items()}
+
+
+def _event(kind, code, payload):
+    """``(key, newest period, event text)``; the ``id:`` line is added per subscriber."""
+    data = payloads.dumps({'series': f'{kind}:{code}', **payload}).decode()
+    return (kind, code), payload['periods'][-1], f"event: {kind}\ndata: {data}\n"
+
+
+def parse_cursors(since, keys):
+    """``{key: period}`` from a Last-Event-ID; a bare period applies to every series."""
+    if not since:
+        return {}
+    if '=' not in since:
+        return dict.fromkeys(keys, since)
+    cursors = {}
+    for part in since.split(';'):
+        name, _, period = part.partition('=')
+        kind, _, code = name.partition(':')
+        if (kind, code) in keys and period:
+            cursors[(kind, code)] = period
+    return cursors
+
+
+class Subscriber:
+    def __init__(self, keys, cursors):
+        self.keys = keys
+        self.cursors = dict(cursors)  # key -> newest period sent (or caught up from)
+        self.queue = asyncio.Queue(maxsize=settings.LIVE_QUEUE_SIZE)
+        self.last_write = time.monotonic()
+        self.closed = False
+
+    def offer(self, event):
+        """Queue ``event``; False if the subscriber is too far behind to keep."""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def render(self, event):
+        """The SSE text for ``event``, advancing this subscriber's cursor for its series."""
+        key, period, text = event
+        cursor = self.cursors.get(key)
+        if cursor is None or _key(period) > _key(cursor):
+            self.cursors[key] = period
+        cursor_id = ';'.join(f"{kind}:{code}={self.cursors[(kind, code)]}"
+                             for kind, code in self.keys if (kind, code) in self.cursors)
+        return f"{text}id: {cursor_id}\n\n"
+
+
+class Feed:
+    # One series: its latest points, who is watching it, and its poller
+    def __init__(self, kind, code):
+        self.kind = kind
+        self.code = code
+        self.subscribers = set()
+        self.latest = None
+        self.points = {}  # period -> point values, to spot new and revised points
+        self.task = None
+
+    def diff(self, payload):
+        columns = _columns(payload)
+        rows = list(zip(*(payload[c] for c in columns)))
+        changed = [i for i, (period, row) in enumerate(zip(payload['periods'], rows)) if self.points.get(period) != row]
+        self.points = dict(zip(payload['periods'], rows))
+        self.latest = payload
+        return _select(payload, changed) if changed else None
+
+    def catch_up(self, since):
+        """The latest points after ``since`` (all of them without it), as one event."""
+        if not self.latest or not self.latest['periods']:
+            return None
+        keep = [i for i, p in enumerate(self.latest['periods']) if not since or _key(p) > _key(since)]
+        return _event(self.kind, self.code, _select(self.latest, keep)) if keep else None
+
+
+class Hub:
+    def __init__(self):
+        self.feeds = {}
+        self.subscribers = set()
+
+    def subscribe(self, keys, cursors=None):
+        """Register a subscriber, with the catch-up events it should see first; None when full."""
+        if len(self.subscribers) >= settings.LIVE_MAX_CLIENTS:
+            return None, []
+        cursors = cursors or {}
+        subscriber = Subscriber(keys, cursors)
+        self.subscribers.add(subscriber)
+        events = []
+        for key in keys:
+            feed = self.feeds.get(key)
+            if feed is None:
+                feed = self.feeds[key] = Feed(*key)
+                # A fresh context: the poller outlives this request, and
+                # must not inherit its sync_to_async executor
+                feed.task = asyncio.create_task(
+                    self._poll(feed), name=f"live-{key[0]}-{key[1]}", context=contextvars.Context(),
+                )
+            feed.subscribers.add(subscriber)
+            event = feed.catch_up(cursors.get(key))
+            if event:
+                events.append(event)
+        return subscriber, events
+
+    def unsubscribe(self, subscriber):
+        subscriber.closed = True
+        self.subscribers.discard(subscriber)
+        for key in subscriber.keys:
+            feed = self.feeds.get(key)
+            if feed is not None:
+                feed.subscribers.discard(subscriber)
+
+    def _publish(self, feed, event):
+        for subscriber in list(feed.subscribers):
+            if not subscriber.offer(event):
+                logger.info("Live Feed: evicting a slow client of %s:%s", feed.kind, feed.code)
+                metrics.count('live_evictions', reason='slow')
+                self.unsubscribe(subscriber)
+
+    def _evict_idle(self, feed):
+        # Streams whose writes (events or keep-alives) have stalled
+        stale = time.monotonic() - settings.LIVE_CLIENT_TIMEOUT
+        for subscriber in list(feed.subscribers):
+            if subscriber.last_write < stale:
+                logger.info("Live Feed: evicting an idle client of %s:%s", feed.kind, feed.code)
+                metrics.count('live_evictions', reason='idle')
+                self.unsubscribe(subscriber)
+
+    async def _poll(self, feed):
+        _, fetch = SERIES[feed.kind]
+        while feed.subscribers:
+            try:
+                payload = await fetch(os.getenv('EIA_API_KEY'), feed.code)
+                changed = feed.diff(payload) if payload and payload['periods'] else None
+                if changed:
+                    self._publish(feed, _event(feed.kind, feed.code, changed))
+            except Exception as e:
+                logger.error("Live Feed Error (%s:%s): %s", feed.kind, feed.code, e)
+            await asyncio.sleep(settings.LIVE_POLL_INTERVAL)
+            self._evict_idle(feed)
+        del self.feeds[(feed.kind, feed.code)]
+
+
+# One hub per event loop: pollers are tasks and can't outlive their loop
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub():
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = Hub()
+    return hub
+
+
+async def _stream(hub, subscriber, events):
+    try:
+        # Reconnect quickly after an eviction or a restart
+        yield f"retry: {settings.LIVE_RETRY_MS}\n\n"
+        for event in events:
+            yield subscriber.render(event)
+        subscriber.last_write = time.monotonic()
+        while not subscriber.closed:
+            try:
+                event = subscriber.render(
+                    await asyncio.wait_for(subscriber.queue.get(), timeout=settings.LIVE_HEARTBEAT)
+                )
+            except asyncio.TimeoutError:
+                # A comment line keeps proxies from closing a quiet stream
+                event = ": keep-alive\n\n"
+            if subscriber.closed:
+                break
+            yield event
+            subscriber.last_write = time.monotonic()
+    finally:
+        hub.unsubscribe(subscriber)
+
+
+@require_GET
+async def stream(request):
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': "Live updates need the ASGI server"}, status=501)
+    try:
+        keys = parse_series(request.GET.getlist('series'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    since = request.headers.get('Last-Event-ID') or request.GET.get('since')
+    hub = get_hub()
+    subscriber, events = hub.subscribe(keys, parse_cursors(since, keys))
+    if subscriber is None:
+        return JsonResponse({'error': "Too many live clients"}, status=503)
+
+    response = StreamingHttpResponse(_stream(hub, subscriber, events), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,68 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark chart processing on synthetic EIA payloads and page latency through the test client, "
+        "and compare the results with a saved JSON baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default=','.join(str(n) for n in benchmarks.SIZES),
+            help="Comma-separated payload sizes in rows (default: %(default)s).",
+        )
+        parser.add_argument('--only', choices=['processing', 'views'], help="Run one half of the suite.")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed requests per page (default: %(default)s).")
+        parser.add_argument(
+            '--baseline', default=str(Path(settings.BASE_DIR) / 'benchmark_baseline.json'),
+            help="Baseline JSON file (default: %(default)s).",
+        )
+        parser.add_argument('--save', action='store_true', help="Write this run to the baseline file.")
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help="Fail when a metric is worse than the baseline by more than this fraction (default: %(default)s).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(n) for n in options['sizes'].split(',') if n.strip()]
+        except ValueError:
+            raise CommandError("--sizes takes comma-separated row counts, e.g. 48,10000")
+        if not sizes or min(sizes) < 1:
+            raise CommandError("--sizes takes positive row counts.")
+
+        results = {}
+        if options['only'] != 'views':
+            self.stdout.write("Processing (decode + process):")
+            results.update(benchmarks.run_processing(sizes, report=self.stdout.write))
+        if options['only'] != 'processing':
+            self.stdout.write("Views (test client, stubbed upstream):")
+            results.update(benchmarks.run_views(repeat=options['repeat'], report=self.stdout.write))
+
+        path = Path(options['baseline'])
+        if options['save']:
+            path.write_text(json.dumps(
+                {'environment': benchmarks.environment(), 'results': results}, indent=2, sort_keys=True,
+            ) + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Saved the baseline to {path}."))
+            return
+        if not path.exists():
+            self.stdout.write(f"No baseline at {path}; run with --save to record one.")
+            return
+
+        baseline = json.loads(path.read_text())
+        if baseline.get('environment') != benchmarks.environment():
+            self.stdout.write(self.style.WARNING("The baseline was recorded in a different environment."))
+        regressions = benchmarks.compare(baseline['results'], results, options['threshold'])
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} regression(s) beyond {options['threshold']:.0%}:\n  " + '\n  '.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS(f"No regressions beyond {options['threshold']:.0%} against {path}."))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import replay
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve recorded EIA responses (see EIA_RECORD_DIR) as a stand-in for api.eia.gov, "
+        "with optional latency and injected failures. Point EIA_BASE_URL at http://HOST:PORT/v2."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help="Directory of recordings made with EIA_RECORD_DIR.")
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8900)
+        parser.add_argument('--latency', type=float, default=0, help="Added delay per request, in ms.")
+        parser.add_argument('--jitter', type=float, default=0, help="Random +/- spread of the delay, in ms.")
+        parser.add_argument(
+            '--error-rate', type=float, default=0, help="Share of requests that fail, 0-1 (default: %(default)s).",
+        )
+        parser.add_argument(
+            '--errors', default=','.join(replay.FAULTS),
+            help="Comma-separated failures to inject: 429, 500, malformed (no response.data), "
+                 "truncated (body cut off). Default: %(default)s.",
+        )
+        parser.add_argument('--seed', type=int, default=0, help="Seed for latency and failures (default: %(default)s).")
+        parser.add_argument('--verbose', action='store_true', help="Log every request.")
+
+    def handle(self, *args, **options):
+        kinds = [kind.strip() for kind in options['errors'].split(',') if kind.strip()]
+        unknown = set(kinds) - set(replay.FAULTS)
+        if unknown:
+            raise CommandError(f"Unknown --errors: {', '.join(sorted(unknown))}")
+        if not 0 <= options['error_rate'] <= 1 or (options['error_rate'] and not kinds):
+            raise CommandError("--error-rate must be between 0 and 1, with at least one kind in --errors.")
+
+        recordings = replay.Recordings(options['directory'])
+        if not len(recordings):
+            raise CommandError(f"No recordings in {options['directory']}.")
+        faults = replay.Faults(
+            latency=options['latency'] / 1000, jitter=options['jitter'] / 1000,
+            error_rate=options['error_rate'], kinds=kinds, seed=options['seed'],
+        )
+        server = replay.make_server(recordings, faults, options['host'], options['port'], options['verbose'])
+        self.stdout.write(
+            f"Replaying {len(recordings)} recordings on http://{options['host']}:{options['port']}/v2 "
+            f"(latency {options['latency']:.0f}±{options['jitter']:.0f} ms, "
+            f"error rate {options['error_rate']:.0%}). Ctrl-C to stop."
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
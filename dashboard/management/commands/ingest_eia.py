@@ -0,0 +1,147 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from dashboard import capacity, cube, ingest, scheduler, store
+from dashboard.models import IngestCheckpoint
+
+
+def _date(value):
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+class Command(BaseCommand):
+    help = "Fetch new EIA data into the local store, optionally polling on a schedule."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep polling every --interval seconds instead of running a single pass.",
+        )
+        parser.add_argument(
+            '--interval', type=int, default=settings.EIA_INGEST_INTERVAL,
+            help="Seconds between the start of consecutive passes (default: %(default)s).",
+        )
+        parser.add_argument(
+            '--only', nargs='+', choices=ingest.KINDS,
+            help="Restrict the pass to these series kinds.",
+        )
+        parser.add_argument(
+            '--lookback-hours', type=int, default=settings.EIA_INGEST_LOOKBACK_HOURS,
+            help="History to fetch for hourly series that have no high-water mark yet.",
+        )
+        parser.add_argument(
+            '--backfill', type=_date, metavar='YYYY-MM-DD',
+            help="Instead of a regular pass, load hourly demand and fuel mix history from this date.",
+        )
+        parser.add_argument(
+            '--until', type=_date, metavar='YYYY-MM-DD',
+            help="End (exclusive) of the backfill range (default: the current hour).",
+        )
+        parser.add_argument(
+            '--window-days', type=int, default=31,
+            help="Days of history requested per backfill window (default: %(default)s).",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=store.BATCH_SIZE,
+            help="Rows written per database batch during a backfill (default: %(default)s).",
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help="Ignore saved backfill checkpoints and start the range over.",
+        )
+
+    def handle(self, *args, **options):
+        api_key = os.getenv('EIA_API_KEY')
+        if not api_key:
+            raise CommandError("EIA_API_KEY is not set.")
+
+        if options['backfill'] and options['loop']:
+            raise CommandError("--backfill runs once; it can't be combined with --loop.")
+
+        # Behind page views and the warm-up when sharing EIA keys with them
+        with scheduler.priority('backfill'):
+            if options['backfill']:
+                self.run_backfill(api_key, options)
+                return
+
+            while True:
+                started = time.monotonic()
+                self.run_pass(api_key, options['only'], options['lookback_hours'])
+                if not options['loop']:
+                    break
+                close_old_connections()
+                time.sleep(max(0, options['interval'] - (time.monotonic() - started)))
+
+    def run_pass(self, api_key, kinds, lookback_hours):
+        started = time.monotonic()
+        total = failed = 0
+        series_list = ingest.all_series(kinds)
+        results, requests = ingest.ingest(api_key, series_list, lookback_hours)
+        for key, written in results.items():
+            if isinstance(written, Exception):
+                failed += 1
+                self.stderr.write(f"{key}: {written}")
+                continue
+            total += written
+            if written:
+                self.stdout.write(f"{key}: {written} rows")
+        self.stdout.write(self.style.SUCCESS(
+            f"Ingested {total} rows from {len(series_list) - failed}/{len(series_list)} series "
+            f"with {requests} requests in {time.monotonic() - started:.1f}s"
+        ))
+
+        if not kinds or 'capacity' in kinds:
+            try:
+                index = capacity.refresh(api_key)
+            except Exception as e:
+                self.stderr.write(f"capacity index: {e}")
+            else:
+                self.stdout.write(f"Capacity index rebuilt for {len(index['states'])} states")
+
+        if not kinds or 'generation' in kinds:
+            try:
+                before = cube.get_cube()
+                built = cube.refresh_if_changed(api_key)
+            except Exception as e:
+                self.stderr.write(f"generation cube: {e}")
+            else:
+                if built is not before:
+                    self.stdout.write(f"Generation cube rebuilt through {cube.latest_year(built)}")
+
+    def run_backfill(self, api_key, options):
+        start = options['backfill']
+        end = options['until'] or timezone.now().replace(tzinfo=None, minute=0, second=0, microsecond=0)
+        if start >= end:
+            raise CommandError("--backfill must be before --until.")
+        window = timedelta(days=options['window_days'])
+
+        started = time.monotonic()
+        total = failed = 0
+        series_list = ingest.backfill_series(options['only'])
+        for series in series_list:
+            if options['restart']:
+                IngestCheckpoint.objects.filter(series=f'backfill:{series.key}').delete()
+            series_started = time.monotonic()
+            try:
+                written = ingest.backfill(
+                    api_key, series, start, end, window=window, batch_size=options['batch_size'],
+                )
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"{series.key}: {e} (rerun to resume from the checkpoint)")
+                continue
+            total += written
+            elapsed = time.monotonic() - series_started
+            self.stdout.write(f"{series.key}: {written} rows in {elapsed:.1f}s ({written / max(elapsed, 1e-9):.0f} rows/s)")
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfilled {total} rows from {len(series_list) - failed}/{len(series_list)} series "
+            f"in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} rows/s)"
+        ))
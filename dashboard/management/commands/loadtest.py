@@ -0,0 +1,79 @@
+import asyncio
+import statistics
+import time
+
+import httpx
+from django.core.management.base import BaseCommand
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent GETs at a running dashboard and report throughput and latency. "
+        "Run it once against the WSGI deployment and once against the ASGI one to compare them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help="Page URLs to request, round-robin.")
+        parser.add_argument('--requests', type=int, default=500, help="Total requests (default: %(default)s).")
+        parser.add_argument(
+            '--concurrency', type=int, default=50, help="Requests in flight at once (default: %(default)s).",
+        )
+        parser.add_argument('--timeout', type=float, default=30, help="Per-request timeout in seconds.")
+
+    def handle(self, *args, **options):
+        latencies, errors, elapsed = asyncio.run(self.run(
+            options['urls'], options['requests'], options['concurrency'], options['timeout'],
+        ))
+        latencies.sort()
+        done = len(latencies)
+        self.stdout.write(f"Requests:    {done + errors} ({errors} failed)")
+        self.stdout.write(f"Concurrency: {options['concurrency']}")
+        self.stdout.write(f"Throughput:  {done / elapsed:.1f} req/s over {elapsed:.1f}s")
+        if latencies:
+            self.stdout.write(
+                "Latency ms:  "
+                f"mean {statistics.mean(latencies) * 1000:.0f}  "
+                f"p50 {percentile(latencies, 50) * 1000:.0f}  "
+                f"p95 {percentile(latencies, 95) * 1000:.0f}  "
+                f"p99 {percentile(latencies, 99) * 1000:.0f}  "
+                f"max {latencies[-1] * 1000:.0f}"
+            )
+
+    async def run(self, urls, total, concurrency, timeout):
+        latencies = []
+        errors = 0
+        queue = asyncio.Queue()
+        for i in range(total):
+            queue.put_nowait(urls[i % len(urls)])
+
+        async def worker(client):
+            nonlocal errors
+            while True:
+                try:
+                    url = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                started = time.perf_counter()
+                try:
+                    response = await client.get(url)
+                    if response.status_code >= 400:
+                        errors += 1
+                        continue
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+        return latencies, errors, elapsed
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard import profiles, rollups
+from dashboard.regions import DEMAND_RESPONDENTS
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily/weekly/monthly rollups and hour-of-day demand profiles from every stored hour."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--respondent', nargs='+', default=DEMAND_RESPONDENTS,
+            help="Respondents to rebuild (default: every respondent with a demand series).",
+        )
+
+    def handle(self, *args, **options):
+        # Writes keep the rollups and profiles current on their own; this is
+        # for history stored before they existed, or after editing rows by hand.
+        for respondent in options['respondent']:
+            started = time.monotonic()
+            days = rollups.rebuild([respondent])
+            hours = profiles.rebuild([respondent])
+            self.stdout.write(f"{respondent}: {days} days, {hours} profile hours in {time.monotonic() - started:.1f}s")
+        self.stdout.write(self.style.SUCCESS("Rollups and profiles rebuilt."))
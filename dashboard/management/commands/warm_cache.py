@@ -0,0 +1,28 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import warmup
+
+
+class Command(BaseCommand):
+    help = "Prefetch the default view of every page into the store and the shared cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--boot', action='store_true',
+            help="Run as the boot warm-up a new deployment waits on (/ready/ answers 503 until it ends).",
+        )
+
+    def handle(self, *args, **options):
+        api_key = os.getenv('EIA_API_KEY')
+        if not api_key:
+            raise CommandError("EIA_API_KEY is not set.")
+
+        results = warmup.warm(api_key, report=self.stdout.write, boot=options['boot'])
+        state = warmup.status()
+        message = f"Warmed {state['warmed']} of {len(results)} views in {state['seconds']}s."
+        if state['failed']:
+            self.stdout.write(self.style.WARNING(f"{message} Failed: {', '.join(state['failed'])}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
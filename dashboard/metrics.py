@@ -0,0 +1,234 @@
+"""
+Request timing and Prometheus metrics.
+
+TimingMiddleware opens a per-request timing record in a context variable.
+Instrumented stages (upstream EIA calls, chart processing, template
+rendering) add their durations to it with timed(), and the response goes out
+with a ``Server-Timing`` header listing each stage. Stages that run side by
+side on worker threads are summed, so they can add up to more than ``total``.
+
+Every timed stage, the request itself, the response-cache lookups and the
+fallbacks (mock or default data shown instead of real data) and the failures
+that are otherwise only logged (store writes, background refreshes, breaker
+trips, live feed evictions) also feed an in-process registry served at
+/metrics in the Prometheus text format. Each worker process keeps its own
+numbers, so scrape every worker (or run one process per scrape target) to
+see all of them.
+"""
+import contextvars
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from django.shortcuts import render as django_render
+from django.views.decorators.http import require_GET
+
+from . import singleflight
+
+# Seconds; Prometheus client defaults
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'dashboard_request_seconds': ('histogram', "Time to produce a response, by view."),
+    'dashboard_eia_request_seconds': ('histogram', "Upstream EIA request latency, retries included, by endpoint."),
+    'dashboard_processing_seconds': ('histogram', "Time spent turning rows into chart data, by step."),
+    'dashboard_render_seconds': ('histogram', "Template render time, by template."),
+    'dashboard_eia_requests_total': ('counter', "Upstream EIA requests, by endpoint and outcome."),
+    'dashboard_eia_cache_total': ('counter', "EIA response-cache lookups: fresh hit, stale hit or miss."),
+    'dashboard_fallbacks_total': ('counter', "Fallbacks to last-known-good, mock or default data instead of fresh data, by kind."),
+    'dashboard_store_write_errors_total': ('counter', "Fetched EIA rows that failed to be written to the store, by endpoint."),
+    'dashboard_refresh_errors_total': ('counter', "Background refreshes that failed, by kind (response_cache or snapshot)."),
+    'dashboard_live_evictions_total': ('counter', "Live feed clients disconnected for falling behind (slow) or stalling (idle)."),
+    'dashboard_singleflight_total': ('counter', "How upstream fetches were resolved by singleflight."),
+    'dashboard_api_not_modified_total': ('counter', "API 304s answered from remembered validators, before any fetch."),
+    'dashboard_breaker_transitions_total': ('counter', "EIA circuit breaker state changes, by endpoint and new state."),
+    'dashboard_breaker_state': ('gauge', "EIA circuit breaker state by endpoint: 0 closed, 1 half-open, 2 open."),
+    'dashboard_scheduler_queue_depth': ('gauge', "Upstream requests waiting for an EIA key, by priority."),
+    'dashboard_scheduler_wait_seconds': ('histogram', "Time upstream requests waited for an EIA key, by priority."),
+    'dashboard_scheduler_key_rate': ('gauge', "Current request rate allowed per EIA key (requests/second)."),
+    'dashboard_scheduler_throttled_total': ('counter', "429 responses from EIA, by key."),
+}
+
+_lock = threading.Lock()
+_counters = {}  # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+_gauges = {}  # (name, labels) -> value
+
+_timings = contextvars.ContextVar('dashboard_timings', default=None)
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def count(name, amount=1, **labels):
+    key = (f'dashboard_{name}_total', _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def gauge(name, value, **labels):
+    with _lock:
+        _gauges[(f'dashboard_{name}', _labels(labels))] = value
+
+
+def observe(name, seconds, **labels):
+    key = (f'dashboard_{name}_seconds', _labels(labels))
+    with _lock:
+        state = _histograms.get(key)
+        if state is None:
+            state = _histograms[key] = [0] * len(BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                state[i] += 1
+        state[-2] += seconds
+        state[-1] += 1
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _gauges.clear()
+
+
+class Timings:
+    # Stage durations (seconds) of one request, shared with its worker threads
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def header(self, total):
+        parts = [f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in self.stages.items()]
+        return ', '.join([*parts, f'total;dur={total * 1000:.1f}'])
+
+
+@contextmanager
+def timed(stage, **labels):
+    """Time a block as ``stage``: into this request's Server-Timing and the stage's histogram."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        timings = _timings.get()
+        if timings is not None:
+            timings.add(stage, seconds)
+        observe(stage, seconds, **labels)
+
+
+def timed_step(fn):
+    """Decorator: time a chart processing function as a ``processing`` step."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with timed('processing', step=fn.__name__):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def render(request, template_name, context=None):
+    """django.shortcuts.render(), timed as the ``render`` stage."""
+    with timed('render', template=template_name.rsplit('/', 1)[-1]):
+        return django_render(request, template_name, context)
+
+
+def endpoint(url):
+    # 'https://api.eia.gov/v2/electricity/rto/region-data/data' -> 'rto/region-data'
+    parts = url.rstrip('/').split('/')
+    return '/'.join(parts[-3:-1]) if parts[-1] == 'data' else parts[-1]
+
+
+class TimingMiddleware:
+    """Adds ``Server-Timing`` to every response and times it per view."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _finish(self, request, response, timings, started):
+        total = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else 'unmatched'
+        observe('request', total, view=view, method=request.method, status=str(response.status_code))
+        response['Server-Timing'] = timings.header(total)
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        timings = Timings()
+        token = _timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self._finish(request, response, timings, started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        timings = Timings()
+        token = _timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self._finish(request, response, timings, started)
+
+
+def _format_labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _number(value):
+    return '+Inf' if value == math.inf else repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def exposition():
+    """Every metric in the Prometheus text format (version 0.0.4)."""
+    with _lock:
+        counters = {**_counters, **_gauges}
+        histograms = {key: list(state) for key, state in _histograms.items()}
+    for name, value in singleflight.stats()['process'].items():
+        counters[('dashboard_singleflight_total', (('result', name),))] = value
+
+    lines = []
+    for name, (kind, text) in HELP.items():
+        lines += [f'# HELP {name} {text}', f'# TYPE {name} {kind}']
+        if kind in ('counter', 'gauge'):
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {_number(value)}')
+            continue
+        for (metric, labels), state in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, n in zip([*BUCKETS, math.inf], [*state[:len(BUCKETS)], state[-1]]):
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", _number(bound))])} {n}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_number(state[-2])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {state[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+@require_GET
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse(status=401)
+    return HttpResponse(exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
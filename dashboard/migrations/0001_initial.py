@@ -0,0 +1,72 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FuelTypeOutput',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('respondent', models.CharField(max_length=10)),
+                ('fueltype', models.CharField(max_length=10)),
+                ('period', models.CharField(max_length=20)),
+                ('timestamp', models.DateTimeField()),
+                ('value', models.FloatField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['respondent', 'fueltype', 'timestamp'], name='fuel_output_ts_idx')],
+                'constraints': [models.UniqueConstraint(fields=('respondent', 'period', 'fueltype'), name='fuel_output_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RegionDemand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('respondent', models.CharField(max_length=10)),
+                ('period', models.CharField(max_length=20)),
+                ('timestamp', models.DateTimeField()),
+                ('value', models.FloatField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['respondent', 'timestamp'], name='region_demand_ts_idx')],
+                'constraints': [models.UniqueConstraint(fields=('respondent', 'period'), name='region_demand_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StateCapacity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(max_length=4)),
+                ('period', models.CharField(max_length=4)),
+                ('fueltypeid', models.CharField(max_length=10)),
+                ('sectorid', models.CharField(max_length=4)),
+                ('capacity_mw', models.FloatField()),
+            ],
+            options={
+                'verbose_name_plural': 'state capacities',
+                'constraints': [models.UniqueConstraint(fields=('location', 'period', 'fueltypeid', 'sectorid'), name='state_capacity_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StateGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(max_length=4)),
+                ('period', models.CharField(max_length=4)),
+                ('fueltypeid', models.CharField(max_length=10)),
+                ('sectorid', models.CharField(max_length=4)),
+                ('generation', models.FloatField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('location', 'period', 'fueltypeid', 'sectorid'), name='state_generation_unique')],
+            },
+        ),
+    ]
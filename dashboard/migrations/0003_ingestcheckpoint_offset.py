@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_ingestcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestcheckpoint',
+            name='offset',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
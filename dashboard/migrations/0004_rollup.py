@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_ingestcheckpoint_offset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Rollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('respondent', models.CharField(max_length=10)),
+                ('metric', models.CharField(max_length=10)),
+                ('grain', models.CharField(max_length=5)),
+                ('bucket', models.DateField()),
+                ('count', models.PositiveIntegerField()),
+                ('total', models.FloatField()),
+                ('minimum', models.FloatField()),
+                ('maximum', models.FloatField()),
+                ('peak_period', models.CharField(max_length=20)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('respondent', 'metric', 'grain', 'bucket'), name='rollup_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('respondent', models.CharField(max_length=10)),
+                ('layout', models.CharField(max_length=7)),
+                ('row', models.PositiveSmallIntegerField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField()),
+                ('total', models.FloatField()),
+                ('histogram', models.JSONField(default=dict)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('respondent', 'layout', 'row', 'hour'), name='demand_profile_unique')],
+            },
+        ),
+    ]
@@ -1,3 +1,134 @@
 from django.db import models
 
-# Create your models here.
+
+class RegionDemand(models.Model):
+    # Hourly demand per balancing authority (rto/region-data, type 'D')
+    respondent = models.CharField(max_length=10)
+    period = models.CharField(max_length=20)  # raw EIA period, e.g. '2024-05-01T13-07'
+    timestamp = models.DateTimeField()  # period converted to UTC
+    value = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['respondent', 'period'], name='region_demand_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['respondent', 'timestamp'], name='region_demand_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.respondent} {self.period}: {self.value}"
+
+
+class FuelTypeOutput(models.Model):
+    # Hourly generation per balancing authority and fuel (rto/fuel-type-data)
+    respondent = models.CharField(max_length=10)
+    fueltype = models.CharField(max_length=10)
+    period = models.CharField(max_length=20)
+    timestamp = models.DateTimeField()
+    value = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['respondent', 'period', 'fueltype'], name='fuel_output_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['respondent', 'fueltype', 'timestamp'], name='fuel_output_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.respondent} {self.fueltype} {self.period}: {self.value}"
+
+
+class StateGeneration(models.Model):
+    # Annual net generation per state and fuel (electric-power-operational-data)
+    location = models.CharField(max_length=4)
+    period = models.CharField(max_length=4)
+    fueltypeid = models.CharField(max_length=10)
+    sectorid = models.CharField(max_length=4)
+    generation = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['location', 'period', 'fueltypeid', 'sectorid'], name='state_generation_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.location} {self.fueltypeid} {self.period}: {self.generation}"
+
+
+class StateCapacity(models.Model):
+    # Annual nameplate capacity per state and fuel (electric-power-operational-data)
+    location = models.CharField(max_length=4)
+    period = models.CharField(max_length=4)
+    fueltypeid = models.CharField(max_length=10)
+    sectorid = models.CharField(max_length=4)
+    capacity_mw = models.FloatField()
+
+    class Meta:
+        verbose_name_plural = 'state capacities'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['location', 'period', 'fueltypeid', 'sectorid'], name='state_capacity_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.location} {self.fueltypeid} {self.period}: {self.capacity_mw} MW"
+
+
+class Rollup(models.Model):
+    # Daily/weekly/monthly aggregate of an hourly series, maintained by
+    # rollups.py as hours are stored. ``bucket`` is the local date the
+    # day, week (Monday) or month starts on.
+    respondent = models.CharField(max_length=10)
+    metric = models.CharField(max_length=10)  # 'demand', a fuel code, or 'net_load'
+    grain = models.CharField(max_length=5)  # 'day', 'week' or 'month'
+    bucket = models.DateField()
+    count = models.PositiveIntegerField()
+    total = models.FloatField()
+    minimum = models.FloatField()
+    maximum = models.FloatField()
+    peak_period = models.CharField(max_length=20)  # hour of the maximum
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['respondent', 'metric', 'grain', 'bucket'], name='rollup_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.respondent} {self.metric} {self.grain} {self.bucket}: {self.count}h"
+
+
+class DemandProfile(models.Model):
+    # Running aggregate of every stored demand hour that fell on one local
+    # hour of the day of one weekday or month, maintained by profiles.py
+    respondent = models.CharField(max_length=10)
+    layout = models.CharField(max_length=7)  # 'weekday' or 'month'
+    row = models.PositiveSmallIntegerField()  # weekday (Monday 0) or month (January 0)
+    hour = models.PositiveSmallIntegerField()
+    count = models.IntegerField()
+    total = models.FloatField()
+    histogram = models.JSONField(default=dict)  # log-scale bin -> hours, see profiles.BIN_RATIO
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['respondent', 'layout', 'row', 'hour'], name='demand_profile_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.respondent} {self.layout} {self.row}/{self.hour}: {self.count}h"
+
+
+class IngestCheckpoint(models.Model):
+    # Newest period already stored for one ingested series (e.g. 'demand:CISO')
+    series = models.CharField(max_length=64, unique=True)
+    high_water = models.CharField(max_length=20, blank=True)
+    # Rows of the current page window already written, for resuming a backfill
+    offset = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.series} @ {self.high_water or '-'}"
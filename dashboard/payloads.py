@@ -0,0 +1,157 @@
+"""
+Chart datasets serialized once, for the pages and the API alike.
+
+dumps() turns a dataset into compact JSON bytes with orjson when it is
+installed, else the json module. ``<``, ``>`` and ``&`` come out as \\u
+escapes (as json_script writes them), so the same bytes can be inlined in
+a page's ``<script type="application/json">`` or sent as an API body.
+
+A Payload carries those bytes with their digest and builds the gzip and
+brotli variants the first time a client asks for them. Payloads are kept
+in an in-process LRU keyed by the digest, so an unchanged dataset (which
+most API polls get until a new hour lands) is compressed only once, and
+under the caller's version of the dataset when it has one, so an unchanged
+dataset isn't even serialized again. Brotli comes from the ``brotli``
+package (in requirements.txt); without it clients get gzip. Codings an
+Accept-Encoding header gives ``q=0`` are never used.
+"""
+import gzip
+import hashlib
+import json
+import threading
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from .caching import LRUCache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this go out uncompressed, as with GZipMiddleware
+MIN_COMPRESS_SIZE = 200
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+
+_SCRIPT_ESCAPES = [(b'<', b'\\u003C'), (b'>', b'\\u003E'), (b'&', b'\\u0026')]
+
+
+def _default(value):
+    # Dates, Decimals, UUIDs and lazy strings, as json_script encodes them
+    return DjangoJSONEncoder().default(value)
+
+
+def dumps(value):
+    """Compact JSON bytes for ``value``, safe to inline in a <script> element."""
+    if orjson is not None:
+        body = orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    else:
+        body = json.dumps(value, separators=(',', ':'), cls=DjangoJSONEncoder).encode()
+    for char, escape in _SCRIPT_ESCAPES:
+        if char in body:
+            body = body.replace(char, escape)
+    return body
+
+
+def _qvalues(accept_encoding):
+    # 'gzip;q=0.5, br' -> {'gzip': 0.5, 'br': 1.0}
+    codings = {}
+    for part in accept_encoding.split(','):
+        coding, *params = [p.strip() for p in part.split(';')]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding.lower()] = q
+    return codings
+
+
+def encoding_for(accept_encoding, size):
+    """The content-encoding a ``size``-byte body is sent with for this Accept-Encoding, or None.
+
+    The client's highest-q coding we can produce wins, brotli on a tie.
+    """
+    if size < MIN_COMPRESS_SIZE:
+        return None
+    qvalues = _qvalues(accept_encoding)
+    wildcard = qvalues.get('*', 0.0)
+    available = ['br', 'gzip'] if brotli is not None else ['gzip']
+    accepted = [(qvalues.get(coding, wildcard), coding) for coding in available]
+    accepted = [(q, coding) for q, coding in accepted if q > 0]
+    if not accepted:
+        return None
+    return max(accepted, key=lambda pair: pair[0])[1]
+
+
+class Payload:
+    def __init__(self, body):
+        self.body = body
+        self.digest = hashlib.sha1(body).hexdigest()[:16]
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, accept_encoding):
+        """``(bytes, content-encoding or None)`` for a client's Accept-Encoding header."""
+        encoding = encoding_for(accept_encoding, len(self.body))
+        if encoding is None:
+            return self.body, None
+        with self._lock:
+            variant = self._variants.get(encoding)
+            if variant is None:
+                if encoding == 'br':
+                    variant = brotli.compress(self.body, quality=BROTLI_QUALITY)
+                else:
+                    # mtime=0 keeps the bytes identical between processes
+                    variant = gzip.compress(self.body, compresslevel=GZIP_LEVEL, mtime=0)
+                self._variants[encoding] = variant
+        return variant, encoding
+
+
+_payloads = LRUCache(256)
+_versions = LRUCache(256)  # version -> (expires at, Payload)
+
+
+def payload(value, version=None, ttl=0):
+    """The Payload for ``value``, reusing the compressed variants of an identical earlier one.
+
+    ``version`` is a key that changes whenever ``value`` does: for ``ttl``
+    seconds, the Payload built for it is returned without serializing
+    ``value`` again.
+    """
+    if version is not None:
+        entry = _versions.get(version)
+        if entry is not None and time.monotonic() < entry[0]:
+            return entry[1]
+    body = dumps(value)
+    serialized = Payload(body)
+    cached = _payloads.get(serialized.digest)
+    if cached is not None and cached.body == body:
+        serialized = cached
+    else:
+        _payloads.set(serialized.digest, serialized)
+    if version is not None:
+        _versions.set(version, (time.monotonic() + ttl, serialized))
+    return serialized
+
+
+def script(value, element_id):
+    """``<script id=... type="application/json">`` holding ``value`` (or a Payload's bytes)."""
+    body = value.body if isinstance(value, Payload) else dumps(value)
+    return format_html(
+        '<script id="{}" type="application/json">{}</script>', element_id, mark_safe(body.decode()),
+    )
@@ -0,0 +1,157 @@
+"""
+Request planner that merges compatible EIA queries.
+
+Many series differ only in one facet value: CISO demand and ERCO demand are
+the same ``rto/region-data`` query with a different ``facets[respondent][]``.
+The planner groups queries that agree on everything but that facet (and
+their ``start``/``length``), issues one multi-facet request per group, pages
+through it, and splits the rows back to each query by the facet column.
+"""
+from collections import namedtuple
+
+from . import eia, store
+
+# One consumer's query. ``params`` are the consumer's own EIA parameters
+# without the api_key, exactly as it would send them alone.
+Query = namedtuple('Query', 'key url params')
+
+MERGE_FACETS = ['facets[respondent][]', 'facets[location][]']
+# Per-query parameters the planner takes over when merging
+PLANNED_PARAMS = {'api_key', 'start', 'length', 'offset'}
+# Keeps URLs short enough for EIA and proxies
+MAX_FACET_VALUES = 50
+PAGE_LENGTH = 5000  # EIA's maximum rows per response
+
+# Offset paging needs a total order. After the period, these columns
+# identify a row of each endpoint, whichever facets the query sets: capacity
+# queries, for one, repeat each period across sectors and fuels.
+SORT_TIEBREAK = {
+    eia.REGION_DATA_URL: ['respondent', 'type'],
+    eia.FUEL_TYPE_DATA_URL: ['respondent', 'fueltype'],
+    eia.OPERATIONAL_DATA_URL: ['location', 'sectorid', 'fueltypeid'],
+}
+
+Batch = namedtuple('Batch', 'url params facet queries')
+
+
+def _merge_facet(params):
+    for facet in MERGE_FACETS:
+        value = params.get(facet)
+        if isinstance(value, str):
+            return facet
+    return None
+
+
+def _signature(query, facet):
+    rest = []
+    for name, value in query.params.items():
+        if name == facet or name in PLANNED_PARAMS:
+            continue
+        rest.append((name, tuple(sorted(value)) if isinstance(value, (list, tuple)) else str(value)))
+    return (query.url, facet, tuple(sorted(rest)))
+
+
+def _period_key(period):
+    try:
+        return (0, store.parse_period(period).isoformat())
+    except ValueError:
+        return (1, period)
+
+
+def plan(queries):
+    """Group ``queries`` into the fewest multi-facet batches."""
+    groups = {}
+    for query in queries:
+        facet = _merge_facet(query.params)
+        signature = _signature(query, facet) if facet else (query.url, None, query.key)
+        groups.setdefault(signature, (facet, []))[1].append(query)
+
+    batches = []
+    for facet, members in groups.values():
+        for i in range(0, len(members), MAX_FACET_VALUES):
+            chunk = members[i:i + MAX_FACET_VALUES]
+            params = {k: v for k, v in chunk[0].params.items() if k not in PLANNED_PARAMS}
+            if facet:
+                params[facet] = sorted({q.params[facet] for q in chunk})
+            # Every member needs rows from its own start on, so ask from the earliest
+            starts = [q.params.get('start') for q in chunk]
+            if all(starts):
+                params['start'] = min(starts, key=_period_key)
+            batches.append(Batch(chunk[0].url, params, facet, chunk))
+    return batches
+
+
+def totally_ordered(url, params, facet=None):
+    """``params`` with the sort columns that make offset paging of ``url`` stable appended."""
+    params = dict(params)
+    sort = 0
+    sorted_by = set()
+    while f'sort[{sort}][column]' in params:
+        sorted_by.add(params[f'sort[{sort}][column]'])
+        sort += 1
+    tiebreaks = [facet[len('facets['):-len('][]')]] if facet else []
+    tiebreaks += SORT_TIEBREAK.get(url, [])
+    direction = params.get('sort[0][direction]', 'asc')
+    for column in dict.fromkeys(tiebreaks):
+        if column in sorted_by:
+            continue
+        params[f'sort[{sort}][column]'] = column
+        params[f'sort[{sort}][direction]'] = direction
+        sort += 1
+    return params
+
+
+def _sorted_params(batch, api_key):
+    return totally_ordered(batch.url, {'api_key': api_key, **batch.params}, batch.facet)
+
+
+def run(api_key, batch):
+    """Fetch one batch and return ``{query key: rows}``.
+
+    Queries with a ``length`` get their first ``length`` rows (in the
+    batch's sort order), and paging stops once all of them are satisfied.
+    Queries without one get every row from the batch's start on.
+    """
+    column = batch.facet[len('facets['):-len('][]')] if batch.facet else None
+    wanted = {q.key: q.params.get('length') for q in batch.queries}
+    limited = all(wanted.values())
+    page_length = PAGE_LENGTH
+    if limited:
+        page_length = min(PAGE_LENGTH, sum(int(n) for n in wanted.values()))
+
+    by_value = {}
+    for q in batch.queries:
+        by_value.setdefault(q.params[batch.facet] if column else None, []).append(q.key)
+    results = {q.key: [] for q in batch.queries}
+
+    params = _sorted_params(batch, api_key)
+    offset = 0
+    while True:
+        rows = eia.fetch_uncached(batch.url, {**params, 'offset': offset, 'length': page_length})
+        for row in rows:
+            for key in by_value.get(row.get(column) if column else None, ()):
+                if not wanted[key] or len(results[key]) < int(wanted[key]):
+                    results[key].append(row)
+        offset += len(rows)
+        if len(rows) < page_length:
+            break
+        if limited and all(len(results[k]) >= int(n) for k, n in wanted.items()):
+            break
+    return results
+
+
+def execute(api_key, queries):
+    """Run ``queries`` as planned batches; a failed batch fails each of its queries.
+
+    Returns ``{query key: rows or exception}`` and the number of upstream
+    batches issued.
+    """
+    results = {}
+    batches = plan(queries)
+    for batch in batches:
+        try:
+            results.update(run(api_key, batch))
+        except Exception as e:
+            for q in batch.queries:
+                results[q.key] = e
+    return results, len(batches)
@@ -0,0 +1,174 @@
+"""
+Hour-of-day demand profiles over all stored history.
+
+For every respondent, each local hour of the day is bucketed by weekday
+(7 x 24 cells) and by month (12 x 24 cells). A bucket keeps the count and
+sum of its demand hours plus a log-scale histogram of their values. Rows
+are running aggregates: store.upsert_demand() passes each write through
+record(), which subtracts the value an hour previously had and adds the
+new one, so revisions stay exact and reading a whole profile is a fixed
+number of rows however long the history is.
+
+Demand is stored rather than utilization, so a capacity revision never
+invalidates the profile: mean and p95 utilization scale exactly with the
+capacity passed to heatmap(), and the hours above the high threshold are
+read off the histogram to within one bin (1%).
+"""
+import math
+from collections import defaultdict
+
+from .models import DemandProfile, RegionDemand
+from .rollups import local_day
+
+LAYOUTS = {
+    'weekday': ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'],
+    'month': ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'],
+}
+# Histogram bins grow by this ratio, starting at 1 MW
+BIN_RATIO = 1.01
+# Utilization above this share of capacity counts as a high hour
+HIGH_UTILIZATION = 85
+
+
+def _bin(value):
+    return str(int(math.log(max(value, 1.0), BIN_RATIO)))
+
+
+def _cells(period):
+    day, hour = local_day(period), int(period[11:13])
+    return [('weekday', day.weekday(), hour), ('month', day.month - 1, hour)]
+
+
+class _Buckets(dict):
+    # (layout, row, hour) -> {'count', 'total', 'histogram'}, starting from
+    # the stored rows (locked until the transaction ends) when ``load`` is set
+    def __init__(self, respondent, load=True):
+        super().__init__()
+        if not load:
+            return
+        for row in DemandProfile.objects.select_for_update().filter(respondent=respondent).values():
+            self[(row['layout'], row['row'], row['hour'])] = row
+
+    def add(self, period, value, sign=1):
+        for key in _cells(period):
+            bucket = self.setdefault(key, {'count': 0, 'total': 0.0, 'histogram': {}})
+            bucket['count'] += sign
+            bucket['total'] += sign * value
+            histogram = bucket['histogram']
+            b = _bin(value)
+            histogram[b] = histogram.get(b, 0) + sign
+            if not histogram[b]:
+                del histogram[b]
+
+    def save(self, respondent):
+        DemandProfile.objects.bulk_create(
+            [DemandProfile(respondent=respondent, layout=layout, row=row, hour=hour,
+                           count=b['count'], total=b['total'], histogram=b['histogram'])
+             for (layout, row, hour), b in self.items()],
+            update_conflicts=True,
+            unique_fields=['respondent', 'layout', 'row', 'hour'],
+            update_fields=['count', 'total', 'histogram'],
+        )
+
+
+def record(objs):
+    """Fold unsaved RegionDemand rows into the profiles; call before writing them.
+
+    Must run in the same transaction as the write, so the previous values it
+    reads are the ones being replaced.
+    """
+    by_respondent = defaultdict(dict)
+    for obj in objs:
+        # The last occurrence of a period wins, as in store._upsert()
+        by_respondent[obj.respondent][obj.period] = obj.value
+
+    for respondent, values in by_respondent.items():
+        previous = dict(RegionDemand.objects
+                        .filter(respondent=respondent, period__gte=min(values), period__lte=max(values))
+                        .values_list('period', 'value'))
+        buckets = _Buckets(respondent)
+        for period, value in values.items():
+            if period in previous:
+                if previous[period] == value:
+                    continue
+                buckets.add(period, previous[period], sign=-1)
+            buckets.add(period, value)
+        buckets.save(respondent)
+
+
+def rebuild(respondents):
+    """Recompute the profiles of ``respondents`` from every stored hour; returns the hours read."""
+    hours = 0
+    for respondent in respondents:
+        buckets = _Buckets(respondent, load=False)
+        for period, value in (RegionDemand.objects.filter(respondent=respondent)
+                              .values_list('period', 'value').iterator()):
+            buckets.add(period, value)
+            hours += 1
+        DemandProfile.objects.filter(respondent=respondent).delete()
+        buckets.save(respondent)
+    return hours
+
+
+def _percentile(histogram, count, share):
+    rank = share * count
+    seen = 0
+    for b in sorted(histogram, key=int):
+        seen += histogram[b]
+        if seen >= rank:
+            # Geometric middle of the bin
+            return BIN_RATIO ** (int(b) + 0.5)
+    return None
+
+
+def _above(histogram, threshold):
+    # Bins wholly above the threshold, plus the part of the straddling bin
+    # above it on the log scale
+    edge = math.log(max(threshold, 1.0), BIN_RATIO)
+    hours = 0.0
+    for b, n in histogram.items():
+        lower = int(b)
+        if lower >= edge:
+            hours += n
+        elif lower + 1 > edge:
+            hours += n * (lower + 1 - edge)
+    return round(hours)
+
+
+def heatmap(respondent, layout, total_capacity):
+    """Mean and p95 utilization and high hours for each cell of ``layout``.
+
+    ``grid`` holds one entry per weekday or month with its 24 hour-of-day
+    cells. None if nothing is stored for ``respondent``.
+    """
+    rows = LAYOUTS[layout]
+    stored = {(p['row'], p['hour']): p for p in DemandProfile.objects
+              .filter(respondent=respondent, layout=layout).values('row', 'hour', 'count', 'total', 'histogram')}
+    if not stored:
+        return None
+
+    def utilization(mw):
+        return round(mw / total_capacity * 100, 1) if total_capacity > 0 and mw is not None else None
+
+    threshold = total_capacity * HIGH_UTILIZATION / 100
+    grid = []
+    for r, label in enumerate(rows):
+        cells = []
+        for hour in range(24):
+            p = stored.get((r, hour))
+            count = p['count'] if p else 0
+            cells.append({
+                'hour': hour,
+                'hours': count,
+                'mean': utilization(p['total'] / count) if count else None,
+                'p95': utilization(_percentile(p['histogram'], count, 0.95)) if count else None,
+                'high_hours': _above(p['histogram'], threshold) if count else 0,
+            })
+        grid.append({'label': label, 'cells': cells})
+    return {
+        'layout': layout,
+        'rows': rows,
+        'capacity_mw': int(total_capacity),
+        'hours': sum(p['count'] for p in stored.values()),
+        'grid': grid,
+    }
@@ -0,0 +1,49 @@
+# Regions and states shown by the dashboard pages. The ingestion and
+# warm-up jobs use the same lists, so every selectable option stays current.
+
+NET_LOAD_REGIONS = {
+    'CISO': 'CAISO (California)',
+    'ERCO': 'ERCOT (Texas)',
+    'PJM': 'PJM (East/Mid-Atlantic)',
+    'MISO': 'MISO (Midwest)',
+    'NYIS': 'NYISO (New York)',
+    'ISNE': 'ISO-NE (New England)'
+}
+
+CONGESTION_REGIONS = {
+    'CISO': 'CAISO (California)',
+    'ERCO': 'ERCOT (Texas)',
+    'NYIS': 'NYISO (New York)',
+    'PJM': 'PJM (East)',
+    'MISO': 'MISO (Central)'
+}
+
+# Mapping Region (Real-time Demand) -> Representative State (Capacity)
+REGION_TO_STATE = {
+    'CISO': 'CA', 
+    'ERCO': 'TX', 
+    'NYIS': 'NY', 
+    'ISNE': 'MA', 
+    'PJM': 'PA',  
+    'MISO': 'IL'  
+}
+
+ALL_STATES = [
+    'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'FL', 'GA', 
+    'HI', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MD', 
+    'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ', 
+    'NM', 'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC', 
+    'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY'
+]
+
+# Respondents with an hourly demand series on some page
+DEMAND_RESPONDENTS = ['US48'] + list(dict.fromkeys([*NET_LOAD_REGIONS, *CONGESTION_REGIONS]))
+
+# Fuels charted by the state analysis page
+STATE_FUEL_TYPES = {
+    'WND': 'Wind',
+    'SUN': 'Solar',
+    'NG': 'Natural Gas', 
+    'COW': 'Coal',
+    'NUC': 'Nuclear'
+}
@@ -0,0 +1,214 @@
+"""
+Record and replay of EIA API traffic, for offline and reproducible load tests.
+
+With EIA_RECORD_DIR set, every payload the client fetches through eia.get()
+and eia.aget() is also saved there, one JSON file per endpoint and query.
+The API key is never written. ``manage.py eia_replay_server`` serves a
+directory of recordings over HTTP, and pointing EIA_BASE_URL at it runs the
+whole dashboard without touching api.eia.gov:
+
+    EIA_RECORD_DIR=recordings python manage.py warm_cache
+    python manage.py eia_replay_server recordings --latency 150 --error-rate 0.02
+    EIA_BASE_URL=http://127.0.0.1:8900/v2 EIA_API_KEY=replay gunicorn energy_project.wsgi
+
+A query that was recorded as is gets its recorded payload back. Any other
+query on a recorded endpoint (another mix of facets from the planner, a
+different page or window) is answered from every row recorded for that
+endpoint, frequency and columns: filtered by its facets, sorted and paged
+as EIA would. ``start``/``end`` are ignored there, since recordings are
+fixed in time while the views ask for windows relative to now.
+
+The server can add latency and inject the failures the client has to
+survive: 429s and 500s, payloads without ``response.data``, and bodies cut
+off mid-JSON. Faults are drawn from a seeded generator, so a run can be
+repeated exactly.
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Per-request parameters ignored when answering from the pooled rows
+WINDOW_PARAMS = {'start', 'end', 'offset', 'length'}
+PAGE_LENGTH = 5000  # EIA's default and maximum rows per response
+
+FAULTS = ['429', '500', 'malformed', 'truncated']
+
+
+def route(url):
+    # 'https://api.eia.gov/v2/electricity/rto/region-data/data' -> 'electricity/rto/region-data/data'
+    return urlsplit(url).path.split('/v2/', 1)[-1].strip('/')
+
+
+def query(params):
+    """``params`` as sorted ``(name, value)`` string pairs, as sent, without the API key."""
+    pairs = []
+    for name, value in params.items():
+        if name == 'api_key':
+            continue
+        for v in value if isinstance(value, (list, tuple)) else [value]:
+            pairs.append((name, str(v)))
+    return sorted(pairs)
+
+
+def _digest(name, pairs):
+    return hashlib.sha1(json.dumps([name, pairs]).encode()).hexdigest()[:16]
+
+
+def record(url, params, payload):
+    """Save ``payload`` under EIA_RECORD_DIR, if set."""
+    directory = settings.EIA_RECORD_DIR
+    if not directory:
+        return
+    name, pairs = route(url), query(params)
+    path = Path(directory) / f"{name.replace('/', '_')}-{_digest(name, pairs)}.json"
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename, so a concurrent replay never reads half a file
+        tmp = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}')
+        tmp.write_text(json.dumps({'route': name, 'query': pairs, 'payload': payload}))
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.error("EIA Record Error: %s", e)
+
+
+def _facet_field(name):
+    # 'facets[respondent][]' -> 'respondent'
+    return name[len('facets['):name.index(']')]
+
+
+def _shape(pairs):
+    # What a query asks for besides its facets, sort order and window
+    return tuple(p for p in pairs
+                 if p[0] not in WINDOW_PARAMS and not p[0].startswith(('facets[', 'sort[')))
+
+
+class Recordings:
+    """The recordings of one directory, indexed for replay."""
+
+    def __init__(self, directory):
+        self.exact = {}  # (route, query) -> body
+        self.pooled = {}  # (route, shape) -> {row json: row}
+        self.routes = set()
+        for path in sorted(Path(directory).glob('*.json')):
+            try:
+                recording = json.loads(path.read_text())
+                name, pairs = recording['route'], [tuple(p) for p in recording['query']]
+                rows = recording['payload']['response']['data']
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.error("EIA Replay Error (%s): %s", path.name, e)
+                continue
+            self.routes.add(name)
+            self.exact[(name, tuple(pairs))] = json.dumps(recording['payload']).encode()
+            pool = self.pooled.setdefault((name, _shape(pairs)), {})
+            for row in rows:
+                pool.setdefault(json.dumps(row, sort_keys=True), row)
+
+    def __len__(self):
+        return len(self.exact)
+
+    def answer(self, name, pairs):
+        """The response body for a query; None for an endpoint never recorded."""
+        pairs = tuple(sorted(pairs))
+        body = self.exact.get((name, pairs))
+        if body is not None or name not in self.routes:
+            return body
+
+        params = dict(pairs)
+        facets = {}
+        for key, value in pairs:
+            if key.startswith('facets['):
+                facets.setdefault(_facet_field(key), set()).add(value)
+        rows = [row for row in self.pooled.get((name, _shape(pairs)), {}).values()
+                if all(str(row.get(field)) in values for field, values in facets.items())]
+
+        sorts = []
+        while f'sort[{len(sorts)}][column]' in params:
+            n = len(sorts)
+            sorts.append((params[f'sort[{n}][column]'], params.get(f'sort[{n}][direction]') == 'desc'))
+        # Stable sorts, last key first, so the first key decides
+        for column, descending in reversed(sorts):
+            rows.sort(key=lambda row: str(row.get(column, '')), reverse=descending)
+
+        offset = int(params.get('offset', 0))
+        length = int(params.get('length', PAGE_LENGTH))
+        payload = {'response': {'total': str(len(rows)), 'data': rows[offset:offset + length]}}
+        return json.dumps(payload).encode()
+
+
+class Faults:
+    """Added latency and injected failures, drawn from a seeded generator."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, kinds=FAULTS, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.kinds = list(kinds)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """``(delay seconds, fault kind or None)`` for the next request."""
+        with self._lock:
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fault = self._random.choice(self.kinds) if self._random.random() < self.error_rate else None
+        return delay, fault
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    # Keep-alive, as the client's connection pools expect from api.eia.gov
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        name = route(url.path)
+        pairs = [p for p in parse_qsl(url.query, keep_blank_values=True) if p[0] != 'api_key']
+        delay, fault = self.server.faults.draw()
+        if delay:
+            time.sleep(delay)
+
+        if fault == '429':
+            return self._send(429, b'{"error": "Too many requests (injected)"}', {'Retry-After': '1'})
+        if fault == '500':
+            return self._send(500, b'{"error": "Internal server error (injected)"}')
+
+        body = self.server.recordings.answer(name, pairs)
+        if body is None:
+            return self._send(404, json.dumps({'error': f"No recordings for {name!r}"}).encode())
+        if fault == 'malformed':
+            body = b'{"response": {"total": "0", "warnings": [{"warning": "injected"}]}}'
+        elif fault == 'truncated':
+            body = body[:len(body) // 2]
+        self._send(200, body)
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(recordings, faults, host='127.0.0.1', port=8900, verbose=False):
+    server = ThreadingHTTPServer((host, port), ReplayHandler)
+    server.daemon_threads = True
+    server.recordings = recordings
+    server.faults = faults
+    server.verbose = verbose
+    return server
@@ -0,0 +1,156 @@
+"""
+Daily, weekly and monthly rollups of the hourly series.
+
+Every write of demand or fuel hours (ingest, backfill, or rows fetched for a
+page) calls refresh() with the respondents and local days it touched. Only
+those buckets are replaced: each touched day from its own raw hours, then
+the weeks and months containing it from their day rollups. A revised hour
+therefore updates its day, week and month exactly, and nothing else is
+recomputed. Net load is demand minus wind and solar at the hours where
+all the fuels the respondent reported that day are present.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db import transaction
+
+from .models import FuelTypeOutput, RegionDemand, Rollup
+
+GRAINS = ['day', 'week', 'month']
+GRAIN_HOURS = {'day': 24, 'week': 168, 'month': 730}
+NET_LOAD_FUELS = ['SUN', 'WND']
+
+
+def bucket_start(day, grain):
+    if grain == 'week':
+        return day - timedelta(days=day.weekday())
+    if grain == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def local_day(period):
+    return date.fromisoformat(period[:10])
+
+
+def touched(rows):
+    """``{respondent: {local day}}`` for hourly EIA rows."""
+    days = defaultdict(set)
+    for row in rows:
+        if row.get('respondent') and row.get('period'):
+            days[row['respondent']].add(local_day(row['period']))
+    return days
+
+
+def grain_for(hours, points):
+    """Coarsest grain whose buckets are no wider than ``hours / points``; None for hourly."""
+    chosen = None
+    for grain in GRAINS:
+        if GRAIN_HOURS[grain] <= hours / points:
+            chosen = grain
+    return chosen
+
+
+def _summary(points):
+    peak_period, peak = max(points, key=lambda p: p[1])
+    values = [v for _, v in points]
+    return {
+        'count': len(values), 'total': sum(values), 'minimum': min(values),
+        'maximum': peak, 'peak_period': peak_period,
+    }
+
+
+def _write(respondent, grain, buckets, summaries):
+    # Replace the buckets outright, so a metric that no longer has any hours
+    # in one (say net load, once a fuel's report disappears) loses its row
+    Rollup.objects.filter(respondent=respondent, grain=grain, bucket__in=buckets).delete()
+    Rollup.objects.bulk_create(
+        [Rollup(respondent=respondent, grain=grain, bucket=bucket, metric=metric, **summary)
+         for (metric, bucket), summary in summaries.items()],
+        update_conflicts=True,
+        unique_fields=['respondent', 'metric', 'grain', 'bucket'],
+        update_fields=['count', 'total', 'minimum', 'maximum', 'peak_period'],
+    )
+
+
+def _refresh_days(respondent, days):
+    lo, hi = min(days).isoformat(), (max(days) + timedelta(days=1)).isoformat()
+    points = defaultdict(list)  # (metric, day) -> [(period, value)]
+
+    demand = {}
+    for period, value in (RegionDemand.objects.filter(respondent=respondent, period__gte=lo, period__lt=hi)
+                          .values_list('period', 'value')):
+        if local_day(period) in days:
+            demand[period] = value
+            points[('demand', local_day(period))].append((period, value))
+
+    fuels = defaultdict(dict)  # period -> {fuel: value}
+    reported = defaultdict(set)  # day -> net-load fuels seen that day
+    for period, fueltype, value in (FuelTypeOutput.objects
+                                    .filter(respondent=respondent, period__gte=lo, period__lt=hi)
+                                    .values_list('period', 'fueltype', 'value')):
+        day = local_day(period)
+        if day in days:
+            points[(fueltype, day)].append((period, value))
+            if fueltype in NET_LOAD_FUELS:
+                fuels[period][fueltype] = value
+                reported[day].add(fueltype)
+
+    for period, value in demand.items():
+        day = local_day(period)
+        at = fuels.get(period, {})
+        if reported[day] and reported[day] <= at.keys():
+            points[('net_load', day)].append((period, value - sum(at.values())))
+
+    _write(respondent, 'day', days, {key: _summary(p) for key, p in points.items()})
+
+
+def _refresh_coarser(respondent, days, grain):
+    buckets = {bucket_start(day, grain) for day in days}
+    lo = min(buckets)
+    hi = max(bucket_start(day, grain) for day in days) + timedelta(days=31 if grain == 'month' else 7)
+    merged = {}
+    for row in (Rollup.objects.filter(respondent=respondent, grain='day', bucket__gte=lo, bucket__lt=hi)
+                .order_by('bucket').values('metric', 'bucket', 'count', 'total', 'minimum', 'maximum', 'peak_period')):
+        bucket = bucket_start(row['bucket'], grain)
+        if bucket not in buckets:
+            continue
+        key = (row['metric'], bucket)
+        summary = merged.get(key)
+        if summary is None:
+            merged[key] = {k: row[k] for k in ('count', 'total', 'minimum', 'maximum', 'peak_period')}
+            continue
+        summary['count'] += row['count']
+        summary['total'] += row['total']
+        summary['minimum'] = min(summary['minimum'], row['minimum'])
+        if row['maximum'] > summary['maximum']:
+            summary['maximum'], summary['peak_period'] = row['maximum'], row['peak_period']
+    _write(respondent, grain, buckets, merged)
+
+
+def refresh(days_by_respondent):
+    """Rebuild the rollups of the given ``{respondent: {local day}}``."""
+    with transaction.atomic():
+        for respondent, days in days_by_respondent.items():
+            if not days:
+                continue
+            _refresh_days(respondent, days)
+            for grain in GRAINS[1:]:
+                _refresh_coarser(respondent, days, grain)
+
+
+def rebuild(respondents, chunk_days=31):
+    """Rebuild every rollup of ``respondents`` from all stored hours; returns the days covered."""
+    covered = 0
+    for respondent in respondents:
+        periods = RegionDemand.objects.filter(respondent=respondent).values_list('period', flat=True)
+        first, last = periods.order_by('period').first(), periods.order_by('-period').first()
+        if first is None:
+            continue
+        day, end = local_day(first), local_day(last)
+        while day <= end:
+            chunk = {day + timedelta(days=i) for i in range(chunk_days) if day + timedelta(days=i) <= end}
+            refresh({respondent: chunk})
+            covered += len(chunk)
+            day += timedelta(days=chunk_days)
+    return covered
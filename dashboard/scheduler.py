@@ -0,0 +1,210 @@
+"""
+Rate-limit-aware scheduling of upstream EIA requests.
+
+Every attempt eia.py makes (retries included) first takes a token from one
+of the configured API keys (EIA_API_KEYS plus EIA_API_KEY). Each key is a
+token bucket refilling at EIA_KEY_RATE requests per second, with bursts of
+up to EIA_KEY_BURST, and requests go out on whichever key can serve them
+soonest. Waiting requests queue by priority class, then arrival:
+
+    interactive  page and API views (the default)
+    warmup       the boot warm-up and background refreshes (cache entries,
+                 snapshots, live feeds)
+    backfill     manage.py ingest_eia
+
+so a busy ingest never delays a page view by more than one token. The
+class follows the calling context: ``with priority('backfill'):``.
+
+When EIA answers 429, that key's rate is halved and the key is paused for
+Retry-After; each success then raises the rate again by a twentieth of
+EIA_KEY_RATE, back up to EIA_KEY_RATE (additive increase, multiplicative
+decrease). The buckets are per process, so with several workers set
+EIA_KEY_RATE to the key's limit divided by the number of processes. Queue
+depth, waits and per-key rates are exported to /metrics; keys are labelled
+by position there, never by value.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from . import metrics
+
+PRIORITIES = {'interactive': 0, 'warmup': 1, 'backfill': 2}
+
+# How often queued async callers recheck the queue
+_POLL_INTERVAL = 0.05
+
+_priority = contextvars.ContextVar('eia_priority', default='interactive')
+
+
+@contextmanager
+def priority(name):
+    """Run the block's upstream requests (and the threads it starts through
+    run_concurrently) in priority class ``name``."""
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown priority: {name!r}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class QueueTimeout(Exception):
+    pass
+
+
+class _Bucket:
+    def __init__(self, key, label):
+        self.key = key
+        self.label = label
+        self.rate = settings.EIA_KEY_RATE
+        self.tokens = float(settings.EIA_KEY_BURST)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def wait(self, now):
+        """Seconds until this key can send, after topping up its tokens."""
+        self.tokens = min(settings.EIA_KEY_BURST, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.paused_until:
+            return self.paused_until - now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class Scheduler:
+    def __init__(self, keys):
+        # Without configured keys, one bucket paces the key each caller passes
+        self.buckets = [_Bucket(key, f'key{i}') for i, key in enumerate(keys or [None])]
+        self._by_key = {b.key: b for b in self.buckets}
+        self._queue = []  # heap of (priority, arrival)
+        self._arrivals = itertools.count()
+        self._cond = threading.Condition()
+
+    def _enqueue(self, name):
+        ticket = (PRIORITIES[name], next(self._arrivals))
+        heapq.heappush(self._queue, ticket)
+        self._gauge_depth(name)
+        return ticket
+
+    def _dequeue(self, ticket, name):
+        if self._queue and self._queue[0] == ticket:
+            heapq.heappop(self._queue)
+        elif ticket in self._queue:
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+        self._gauge_depth(name)
+        self._cond.notify_all()
+
+    def _gauge_depth(self, name):
+        rank = PRIORITIES[name]
+        metrics.gauge('scheduler_queue_depth', sum(1 for p, _ in self._queue if p == rank), priority=name)
+
+    def _try(self, ticket):
+        # Under the lock: (bucket, 0) when ``ticket`` may send now, else
+        # (None, seconds worth waiting before checking again)
+        if self._queue[0] != ticket:
+            return None, _POLL_INTERVAL
+        now = time.monotonic()
+        bucket = min(self.buckets, key=lambda b: (b.wait(now), -b.tokens))
+        wait = bucket.wait(now)
+        if wait > 0:
+            return None, wait
+        bucket.tokens -= 1
+        return bucket, 0.0
+
+    def acquire(self, timeout):
+        """Block until a key may send; returns it (None without configured keys)."""
+        name = _priority.get()
+        started = time.monotonic()
+        deadline = started + timeout
+        with self._cond:
+            ticket = self._enqueue(name)
+            try:
+                while True:
+                    bucket, wait = self._try(ticket)
+                    if bucket is not None:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise QueueTimeout(f"No EIA key was free within {timeout:.1f}s")
+                    self._cond.wait(min(wait, remaining))
+            finally:
+                self._dequeue(ticket, name)
+        metrics.observe('scheduler_wait', time.monotonic() - started, priority=name)
+        return bucket.key
+
+    async def aacquire(self, timeout):
+        """Async counterpart of acquire(); waits without blocking the event loop."""
+        name = _priority.get()
+        started = time.monotonic()
+        deadline = started + timeout
+        with self._cond:
+            ticket = self._enqueue(name)
+        try:
+            while True:
+                with self._cond:
+                    bucket, wait = self._try(ticket)
+                if bucket is not None:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise QueueTimeout(f"No EIA key was free within {timeout:.1f}s")
+                await asyncio.sleep(min(wait, _POLL_INTERVAL, remaining))
+        finally:
+            with self._cond:
+                self._dequeue(ticket, name)
+        metrics.observe('scheduler_wait', time.monotonic() - started, priority=name)
+        return bucket.key
+
+    def report(self, key, status, retry_after=None):
+        """Adapt ``key``'s rate to the status EIA answered a request on it with."""
+        with self._cond:
+            bucket = self._by_key.get(key)
+            if bucket is None:
+                return
+            if status == 429:
+                bucket.rate = max(settings.EIA_KEY_RATE / 16, bucket.rate / 2)
+                bucket.tokens = min(bucket.tokens, 0.0)
+                bucket.paused_until = time.monotonic() + (retry_after or 1 / bucket.rate)
+                metrics.count('scheduler_throttled', key=bucket.label)
+            elif status == 200 and bucket.rate < settings.EIA_KEY_RATE:
+                bucket.rate = min(settings.EIA_KEY_RATE, bucket.rate + settings.EIA_KEY_RATE / 20)
+            else:
+                return
+            metrics.gauge('scheduler_key_rate', bucket.rate, key=bucket.label)
+            self._cond.notify_all()
+
+    def stats(self):
+        now = time.monotonic()
+        with self._cond:
+            keys = {b.label: {
+                'rate': round(b.rate, 3),
+                'tokens': round(min(settings.EIA_KEY_BURST, b.tokens + (now - b.updated) * b.rate), 2),
+                'paused_for': round(max(0.0, b.paused_until - now), 2),
+            } for b in self.buckets}
+            queued = {name: sum(1 for p, _ in self._queue if p == rank) for name, rank in PRIORITIES.items()}
+        return {'keys': keys, 'queued': queued}
+
+
+_scheduler = None
+_scheduler_pid = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    # One per process, rebuilt after a fork like the HTTP session
+    global _scheduler, _scheduler_pid
+    pid = os.getpid()
+    if _scheduler is None or _scheduler_pid != pid:
+        with _scheduler_lock:
+            if _scheduler is None or _scheduler_pid != pid:
+                _scheduler, _scheduler_pid = Scheduler(settings.EIA_API_KEYS), pid
+    return _scheduler
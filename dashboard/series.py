@@ -0,0 +1,243 @@
+"""
+Vectorized series engine behind the chart processing in views.py.
+
+Hourly EIA periods ('2024-05-01T13', or '2024-05-01T13-07' for local-hourly
+data) are parsed into UTC ``datetime64[h]`` arrays, so series line up with
+sorted joins and combine with array arithmetic instead of per-row dict work.
+Gaps are explicit: an hour missing inside a series' range becomes NaN and
+leaves the engine as None (JSON null), so charts break the line instead of
+drawing a made-up zero.
+"""
+import numpy as np
+
+HOUR = np.timedelta64(1, 'h')
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def column(rows, key):
+    return [row.get(key) for row in rows]
+
+
+def to_floats(values):
+    """Array of floats with NaN for anything that isn't a number."""
+    return np.fromiter((_float(v) for v in values), dtype=float, count=len(values))
+
+
+def to_json(values):
+    """Plain Python list for templates and JSON, with None in place of NaN."""
+    return [None if v != v else v for v in values.tolist()]
+
+
+def parse_periods(periods):
+    """Return UTC hours and the UTC offset (hours) of each hourly period."""
+    periods = np.asarray(periods, dtype=str)
+    if not len(periods):
+        return np.array([], dtype='datetime64[h]'), np.array([], dtype=int)
+    local = periods.astype('U13').astype('datetime64[h]')
+    offsets = np.array([int(p[13:]) if len(p) > 13 else 0 for p in periods.tolist()])
+    return local - offsets * HOUR, offsets
+
+
+def format_periods(times, offsets, with_offset):
+    """Inverse of parse_periods(): the EIA period strings for UTC ``times``."""
+    text = np.datetime_as_string(times + offsets * HOUR, unit='h').tolist()
+    if with_offset:
+        return [f"{t}{o:+03d}" for t, o in zip(text, offsets.tolist())]
+    return text
+
+
+def has_offsets(periods):
+    return any(len(p) > 13 for p in periods)
+
+
+def hour_labels(periods):
+    return [p.split('T')[1] + ":00" if 'T' in p else p for p in periods]
+
+
+def hourly(periods, values):
+    """Sorted unique hours with their offsets and values, summing duplicate hours.
+
+    An hour whose values are all non-numeric stays NaN rather than 0.
+    """
+    times, offsets = parse_periods(periods)
+    values = np.asarray(values, dtype=float)
+    hours, first, inverse = np.unique(times, return_index=True, return_inverse=True)
+    sums = np.zeros(len(hours))
+    counts = np.zeros(len(hours))
+    np.add.at(sums, inverse, np.nan_to_num(values))
+    np.add.at(counts, inverse, ~np.isnan(values))
+    sums[counts == 0] = np.nan
+    return hours, offsets[first], sums
+
+
+def hourly_grid(times, offsets):
+    """Every hour from the first to the last of sorted ``times``, offsets carried forward."""
+    if not len(times):
+        return times, offsets
+    grid = np.arange(times[0], times[-1] + HOUR, HOUR)
+    return grid, offsets[np.searchsorted(times, grid, side='right') - 1]
+
+
+def align(grid, times, values):
+    """Values of a sorted series at each grid hour; NaN where it has none."""
+    out = np.full(len(grid), np.nan)
+    if not len(times):
+        return out
+    pos = np.minimum(np.searchsorted(times, grid), len(times) - 1)
+    hit = times[pos] == grid
+    out[hit] = values[pos[hit]]
+    return out
+
+
+def range_labels(periods):
+    """Chart labels for ranges longer than a day: date and hour."""
+    return [p[5:13].replace('T', ' ') + ":00" if 'T' in p else p for p in periods]
+
+
+def lttb(values, threshold):
+    """Indices Largest-Triangle-Three-Buckets keeps to draw ``values`` with ``threshold`` points.
+
+    Positions are the x axis. Gap (NaN) points are never picked, so a gap
+    narrower than a bucket closes up in the downsampled line.
+    """
+    x = np.flatnonzero(~np.isnan(values))
+    if threshold >= len(x) or threshold < 3:
+        return x
+    y = values[x]
+    n = len(x)
+    # Bucket i covers [edges[i], edges[i + 1]); the first and last points stay
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    keep = np.empty(threshold, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        # Third corner: the average of the next bucket
+        cx, cy = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return x[keep]
+
+
+def downsample(chart, key, columns, threshold):
+    """Keep about ``threshold`` points of every column in ``chart``, picked by LTTB on ``key``."""
+    values = np.array(chart[key], dtype=float)
+    if len(values) <= threshold:
+        return chart
+    keep = lttb(values, threshold).tolist()
+    return {**chart, **{c: [chart[c][i] for i in keep] for c in columns}}
+
+
+def rollup_columns(grouped, key_metric):
+    """Bucket dates of ``key_metric`` and every metric's hourly mean in each, None where missing."""
+    buckets = [row['bucket'] for row in grouped[key_metric]]
+    columns = {}
+    for metric, rows in grouped.items():
+        means = {row['bucket']: row['total'] / row['count'] for row in rows if row['count']}
+        columns[metric] = [means.get(bucket) for bucket in buckets]
+    return [bucket.isoformat() for bucket in buckets], columns
+
+
+def demand(rows):
+    """Hourly periods and demand on a gap-explicit grid, oldest first."""
+    periods = column(rows, 'period')
+    times, offsets, values = hourly(periods, to_floats(column(rows, 'value')))
+    grid, grid_offsets = hourly_grid(times, offsets)
+    return format_periods(grid, grid_offsets, has_offsets(periods)), to_json(align(grid, times, values))
+
+
+def net_load(demand_rows, fuel_rows, fuels=(('solar', 'SUN'), ('wind', 'WND'))):
+    """Demand, renewables and net load on a gap-explicit hourly grid.
+
+    The grid spans the demand series. A fuel with no rows at all counts as
+    zero output; a fuel missing at some hours leaves those hours (and their
+    net load) null.
+    """
+    demand_periods = column(demand_rows, 'period')
+    d_times, d_offsets, d_values = hourly(demand_periods, to_floats(column(demand_rows, 'value')))
+    grid, offsets = hourly_grid(d_times, d_offsets)
+    demand = align(grid, d_times, d_values)
+
+    fueltypes = np.asarray(column(fuel_rows, 'fueltype'), dtype=object)
+    fuel_periods = np.asarray(column(fuel_rows, 'period'), dtype=object)
+    fuel_values = to_floats(column(fuel_rows, 'value'))
+    output = {}
+    for name, code in fuels:
+        mask = fueltypes == code
+        if not mask.any():
+            output[name] = np.zeros(len(grid))
+            continue
+        times, _, values = hourly(fuel_periods[mask].tolist(), fuel_values[mask])
+        output[name] = align(grid, times, values)
+
+    periods = format_periods(grid, offsets, has_offsets(demand_periods))
+    result = {
+        'periods': periods,
+        'labels': hour_labels(periods),
+        'gross_demand': to_json(demand),
+        'net_load': to_json(demand - sum(output.values())),
+    }
+    for name, _ in fuels:
+        result[name] = to_json(output[name])
+    return result
+
+
+def utilization(demand_rows, capacity_mw):
+    """Hourly periods, demand and % of ``capacity_mw`` in use, oldest first.
+
+    Hours without a numeric demand reading are dropped; the congestion
+    heatmap leaves their cells empty.
+    """
+    periods = column(demand_rows, 'period')
+    times, offsets, demand = hourly(periods, to_floats(column(demand_rows, 'value')))
+    keep = ~np.isnan(demand)
+    times, offsets, demand = times[keep], offsets[keep], demand[keep]
+    if capacity_mw > 0:
+        percent = demand / capacity_mw * 100
+    else:
+        percent = np.zeros(len(demand))
+    return format_periods(times, offsets, has_offsets(periods)), demand, percent
+
+
+def annual_totals(rows, value_key, category_key, categories):
+    """Sorted years and ``{category: per-year sums}`` for annual rows.
+
+    Rows in other categories still contribute their year, with zeros.
+    """
+    rows = [row for row in rows if row.get('period')]
+    years, inverse = np.unique(np.asarray(column(rows, 'period'), dtype=str), return_inverse=True)
+    index = {c: i for i, c in enumerate(categories)}
+    cat = np.array([index.get(c, -1) for c in column(rows, category_key)], dtype=int)
+    values = np.nan_to_num(to_floats(column(rows, value_key)))
+
+    totals = np.zeros((len(categories), len(years)))
+    keep = cat >= 0
+    np.add.at(totals, (cat[keep], inverse[keep]), values[keep])
+    return years.tolist(), {c: totals[i].tolist() for c, i in index.items()}
+
+
+def net_load_summary(chart):
+    """Headline figures for one net-load chart, ignoring gap hours."""
+    demand = np.array(chart['gross_demand'], dtype=float)
+    net = np.array(chart['net_load'], dtype=float)
+    renewables = np.array(chart['solar'], dtype=float) + np.array(chart['wind'], dtype=float)
+    if not np.isfinite(net).any():
+        return {'peak_net_load': None, 'min_net_load': None, 'max_ramp': None, 'renewable_share': None}
+
+    ramps = np.diff(net)
+    total_demand = np.nansum(demand[np.isfinite(renewables)])
+    return {
+        'peak_net_load': float(np.nanmax(net)),
+        'min_net_load': float(np.nanmin(net)),
+        # Steepest hour-over-hour rise, the evening ramp on a duck curve
+        'max_ramp': float(np.nanmax(ramps)) if np.isfinite(ramps).any() else None,
+        'renewable_share': round(float(np.nansum(renewables) / total_demand * 100), 1) if total_demand else None,
+    }
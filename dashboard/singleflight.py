@@ -0,0 +1,162 @@
+"""
+Single-flight coalescing for identical upstream fetches.
+
+Within a process, concurrent callers for the same key share one in-flight
+future. Across gunicorn workers, a ``cache.add`` lock in the shared cache
+elects one fetcher; the others return the stale value if they have one, or
+poll the shared cache briefly for the leader's result. Counters record how
+each call was resolved, per process like the rest of /metrics.
+
+Followers only ever see the leader's Exceptions. An async leader's fetch
+runs in its own task, so a client disconnecting cancels only its own wait.
+A sync leader that is interrupted hands its followers Abandoned.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.core.cache import cache
+
+COUNTERS = ['leader', 'coalesced_local', 'coalesced_remote', 'stale_served', 'lock_timeouts']
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+_stats = dict.fromkeys(COUNTERS, 0)
+_stats_lock = threading.Lock()
+
+_POLL_INTERVAL = 0.05
+
+
+class Abandoned(Exception):
+    """The leader stopped before finishing (interrupted), so there is no result to share."""
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def stats():
+    """Counters for this process."""
+    with _stats_lock:
+        return {'process': dict(_stats)}
+
+
+def _lock_timeout():
+    return int(settings.EIA_REQUEST_BUDGET) + 5
+
+
+def _across_workers(key, fn, read_shared, stale):
+    lock_key = f"{key}:flight"
+    if cache.add(lock_key, os.getpid(), timeout=_lock_timeout()):
+        _count('leader')
+        try:
+            return fn()
+        finally:
+            cache.delete(lock_key)
+
+    # Another worker is already fetching this key
+    if stale is not None:
+        _count('stale_served')
+        return stale
+    deadline = time.monotonic() + settings.EIA_SINGLEFLIGHT_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(_POLL_INTERVAL)
+        found, value = read_shared()
+        if found:
+            _count('coalesced_remote')
+            return value
+        if cache.get(lock_key) is None:
+            break  # the leader gave up without storing anything
+    _count('lock_timeouts')
+    return fn()
+
+
+def do(key, fn, read_shared, stale=None):
+    """Return ``fn()``, running it at most once at a time per key.
+
+    ``read_shared()`` returns ``(found, value)`` for a result another worker
+    may have stored; ``stale`` is served instead of waiting when given.
+    """
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _inflight[key] = future
+
+    if not leader:
+        _count('coalesced_local')
+        return future.result(timeout=_lock_timeout())
+
+    try:
+        result = _across_workers(key, fn, read_shared, stale)
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    except BaseException:
+        future.set_exception(Abandoned(f"The fetch of {key} was interrupted"))
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+# --- Async variant; in-flight fetches are tasks, tracked per event loop ---
+
+_ainflight = {}
+
+
+async def _aacross_workers(key, fn, read_shared, stale):
+    lock_key = f"{key}:flight"
+    if await cache.aadd(lock_key, os.getpid(), timeout=_lock_timeout()):
+        _count('leader')
+        try:
+            return await fn()
+        finally:
+            await cache.adelete(lock_key)
+
+    if stale is not None:
+        _count('stale_served')
+        return stale
+    deadline = time.monotonic() + settings.EIA_SINGLEFLIGHT_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(_POLL_INTERVAL)
+        found, value = await read_shared()
+        if found:
+            _count('coalesced_remote')
+            return value
+        if await cache.aget(lock_key) is None:
+            break
+    _count('lock_timeouts')
+    return await fn()
+
+
+async def ado(key, fn, read_shared, stale=None):
+    """Async counterpart of do(); ``fn`` and ``read_shared`` are coroutine functions."""
+    loop = asyncio.get_running_loop()
+    flight_key = (id(loop), key)
+    task = _ainflight.get(flight_key)
+    if task is not None:
+        _count('coalesced_local')
+        return await asyncio.shield(task)
+
+    # The fetch runs as its own task (in a copy of this context), so
+    # cancelling the leader's request leaves it running for the followers
+    task = loop.create_task(_aacross_workers(key, fn, read_shared, stale))
+    _ainflight[flight_key] = task
+    task.add_done_callback(lambda done: _finished(flight_key, done))
+    return await asyncio.shield(task)
+
+
+def _finished(flight_key, task):
+    _ainflight.pop(flight_key, None)
+    if not task.cancelled():
+        # Mark it retrieved, so a failure nobody was left waiting for doesn't log a warning
+        task.exception()
@@ -0,0 +1,94 @@
+"""
+Derived datasets that are rebuilt out of band and read on every request.
+
+A Snapshot keeps its value in the shared cache (no expiry) with a copy in
+each process, so a read is a dict access. Processes pick up a rebuild done
+by another worker within ``memo_seconds``. Rebuilds run from ingest_eia, or
+in a background thread when a request (through current()) finds nothing
+built yet or a value older than EIA_INGEST_INTERVAL, so a deployment
+without the ingest worker still refreshes on that schedule.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from . import metrics, scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot:
+    def __init__(self, key, build, memo_seconds=60, lock_seconds=300):
+        self.key = key
+        self.build = build
+        self.memo_seconds = memo_seconds
+        self.lock_seconds = lock_seconds
+        self._value = None
+        self._built_at = 0.0
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _remember(self, built_at, value):
+        with self._lock:
+            self._built_at = built_at
+            self._value = value
+            self._checked = time.monotonic()
+
+    def _load(self):
+        entry = cache.get(self.key)
+        # Entries are (built_at, value); anything else predates that and counts as stale
+        if isinstance(entry, tuple) and len(entry) == 2:
+            self._remember(*entry)
+        elif entry is not None:
+            self._remember(0.0, entry)
+        else:
+            self._remember(self._built_at, self._value)
+
+    def get(self):
+        """The latest built value, or None if nothing has been built yet."""
+        if self._value is None or time.monotonic() - self._checked >= self.memo_seconds:
+            self._load()
+        return self._value
+
+    def _stale(self):
+        return self._value is None or time.time() - self._built_at >= settings.EIA_INGEST_INTERVAL
+
+    def current(self, *args):
+        """Like get(), but rebuilds in the background (with ``args``) when missing or out of date."""
+        value = self.get()
+        if self._stale():
+            # Another worker may already have rebuilt it within our memo window
+            self._load()
+            value = self._value
+            if self._stale():
+                self.refresh_in_background(*args)
+        return value
+
+    def refresh(self, *args):
+        value = self.build(*args)
+        built_at = time.time()
+        cache.set(self.key, (built_at, value), timeout=None)
+        self._remember(built_at, value)
+        return value
+
+    def refresh_in_background(self, *args):
+        lock_key = f"{self.key}:refresh"
+        if not cache.add(lock_key, 1, timeout=self.lock_seconds):
+            return
+
+        def run():
+            try:
+                with scheduler.priority('warmup'):
+                    self.refresh(*args)
+            except Exception as e:
+                logger.error("Snapshot Refresh Error (%s): %s", self.key, e)
+                metrics.count('refresh_errors', kind='snapshot')
+            finally:
+                cache.delete(lock_key)
+                connections.close_all()
+
+        threading.Thread(target=run, name=f"snapshot-{self.key}", daemon=True).start()
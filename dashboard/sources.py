@@ -0,0 +1,280 @@
+"""
+Row sources for the dashboard views.
+
+Each function answers from the local store when it holds a current copy of
+the series and otherwise queries EIA (through the cached client), writing
+what comes back into the store on the way. async_sources.py offers the same
+functions for the async views.
+
+The ``*_many`` variants serve several respondents at once: whatever the
+store and the response cache can't answer is fetched in merged multi-facet
+requests through the planner. The ``*_between`` variants return every hour
+of a time range, paging through EIA when the store doesn't cover it.
+
+When EIA fails, each function falls back to the last-known-good data (see
+freshness.py) and raises only if nothing at all is held.
+"""
+import logging
+
+from . import caching, eia, freshness, metrics, planner, rollups, store, timerange
+
+logger = logging.getLogger(__name__)
+
+
+def demand_params(api_key, respondent, length):
+    return {
+        'api_key': api_key,
+        'frequency': 'local-hourly',
+        'data[0]': 'value',
+        'facets[respondent][]': respondent,
+        'facets[type][]': 'D',
+        'sort[0][column]': 'period',
+        'sort[0][direction]': 'desc',
+        'length': length,
+    }
+
+
+def fuel_params(api_key, respondent, fueltypes, length):
+    return {
+        'api_key': api_key,
+        'frequency': 'local-hourly',
+        'data[0]': 'value',
+        'facets[respondent][]': respondent,
+        'facets[fueltype][]': list(fueltypes),
+        'sort[0][column]': 'period',
+        'sort[0][direction]': 'desc',
+        'length': length,
+    }
+
+
+def range_params(params, time_range):
+    """``params`` turned into an oldest-first query for every row in ``time_range``."""
+    start, end = timerange.eia_bounds(time_range)
+    params = {k: v for k, v in params.items() if k != 'length'}
+    params.update({'start': start, 'end': end, 'sort[0][direction]': 'asc'})
+    return params
+
+
+def generation_params(api_key, location, fueltypes):
+    return {
+        'api_key': api_key,
+        'frequency': 'annual',
+        'data[0]': 'generation',
+        'facets[location][]': location,
+        'facets[sectorid][]': '99',
+        'facets[fueltypeid][]': list(fueltypes),
+        'sort[0][column]': 'period',
+        'sort[0][direction]': 'asc',
+    }
+
+
+def capacity_params(api_key, location, length):
+    return {
+        'api_key': api_key,
+        'frequency': 'annual',
+        'data[0]': 'nameplate-capacity-mw',
+        'facets[location][]': location,
+        'sort[0][column]': 'period',
+        'sort[0][direction]': 'desc',
+        'length': length,
+    }
+
+
+def last_known_good(url, params, stored):
+    """The newest data held for a query EIA just failed to answer; None if nothing is.
+
+    ``stored()`` returns the store's rows for it however far behind, which
+    win over an expired copy in the response cache. Either way the fallback
+    is noted on the current request.
+    """
+    rows = stored()
+    if rows:
+        freshness.note(store.newest_timestamp(rows), 'store')
+        return rows
+    held = caching.last_known_good(caching.make_key(url, params))
+    if held is None:
+        return None
+    rows, fetched_at = held
+    freshness.note(fetched_at, 'cache')
+    return list(rows)
+
+
+def _fetch(url, params, on_fetch, stored):
+    try:
+        return eia.fetch_rows(url, params, on_fetch=on_fetch)
+    except eia.UPSTREAM_ERRORS:
+        rows = last_known_good(url, params, stored)
+        if rows is None:
+            raise
+        return rows
+
+
+def demand_rows(api_key, respondent, length):
+    rows = store.demand_rows(respondent, length)
+    if rows is not None:
+        return rows
+    return _fetch(
+        eia.REGION_DATA_URL, demand_params(api_key, respondent, length), store.upsert_demand,
+        lambda: store.demand_rows(respondent, length, current=False),
+    )
+
+
+def fuel_rows(api_key, respondent, fueltypes, length):
+    rows = store.fuel_rows(respondent, fueltypes, length)
+    if rows is not None:
+        return rows
+    return _fetch(
+        eia.FUEL_TYPE_DATA_URL, fuel_params(api_key, respondent, fueltypes, length), store.upsert_fuel_output,
+        lambda: store.fuel_rows(respondent, fueltypes, length, current=False),
+    )
+
+
+def generation_rows(api_key, location, fueltypes):
+    rows = store.generation_rows(location, fueltypes)
+    if rows is not None:
+        return rows
+    return _fetch(
+        eia.OPERATIONAL_DATA_URL, generation_params(api_key, location, fueltypes), store.upsert_generation,
+        lambda: store.generation_rows(location, fueltypes, current=False),
+    )
+
+
+def capacity_rows(api_key, location, length=500):
+    rows = store.capacity_rows(location, length)
+    if rows is not None:
+        return rows
+    return _fetch(
+        eia.OPERATIONAL_DATA_URL, capacity_params(api_key, location, length), store.upsert_capacity,
+        lambda: store.capacity_rows(location, length, current=False),
+    )
+
+
+def fetch_planned(api_key, wanted):
+    """Fetch ``{name: (url, params, on_fetch)}`` with as few upstream requests as possible.
+
+    Each query is answered from the response cache when it holds a fresh
+    copy; the rest go out as merged requests, and what comes back is cached
+    under each query's own key, as if it had been fetched alone. Returns
+    ``{name: rows or exception}``.
+    """
+    results = {}
+    queries = []
+    for name, (url, params, on_fetch) in wanted.items():
+        rows = caching.peek(caching.make_key(url, params))
+        if rows is not None:
+            results[name] = list(rows)
+        else:
+            own = {k: v for k, v in params.items() if k != 'api_key'}
+            queries.append(planner.Query(name, url, own))
+
+    fetched, _ = planner.execute(api_key, queries)
+    writes = {}
+    for name, rows in fetched.items():
+        if not isinstance(rows, Exception):
+            url, params, on_fetch = wanted[name]
+            caching.put(caching.make_key(url, params), rows, caching.ttl_for(params))
+            writes.setdefault((on_fetch, url), []).extend(rows)
+            rows = list(rows)
+        results[name] = rows
+
+    # One write per kind of series rather than one per query
+    for (on_fetch, url), rows in writes.items():
+        try:
+            on_fetch(rows)
+        except Exception as e:
+            logger.error("EIA on_fetch Error: %s", e)
+            metrics.count('store_write_errors', endpoint=metrics.endpoint(url))
+    return results
+
+
+def _fetch_between(api_key, url, params, on_fetch, time_range, stored):
+    # Long ranges take several pages; the planner walks them
+    rows = fetch_planned(api_key, {'range': (url, params, on_fetch)})['range']
+    if isinstance(rows, eia.UPSTREAM_ERRORS):
+        held = last_known_good(url, params, stored)
+        rows = rows if held is None else held
+    if isinstance(rows, Exception):
+        raise rows
+    return [row for row in rows if timerange.contains(time_range, store.parse_period(row['period']))]
+
+
+def demand_rows_between(api_key, respondent, time_range):
+    """Every hour of demand in ``time_range``, oldest first."""
+    rows = store.demand_between(respondent, *time_range)
+    if rows is not None:
+        return rows
+    params = range_params(demand_params(api_key, respondent, None), time_range)
+    return _fetch_between(
+        api_key, eia.REGION_DATA_URL, params, store.upsert_demand, time_range,
+        lambda: store.demand_between(respondent, *time_range, current=False),
+    )
+
+
+def fuel_rows_between(api_key, respondent, fueltypes, time_range):
+    """Every hour of output for ``fueltypes`` in ``time_range``, oldest first."""
+    rows = store.fuel_between(respondent, fueltypes, *time_range)
+    if rows is not None:
+        return rows
+    params = range_params(fuel_params(api_key, respondent, fueltypes, None), time_range)
+    return _fetch_between(
+        api_key, eia.FUEL_TYPE_DATA_URL, params, store.upsert_fuel_output, time_range,
+        lambda: store.fuel_between(respondent, fueltypes, *time_range, current=False),
+    )
+
+
+def rollups_between(respondent, metrics, time_range, points):
+    """The coarsest rollups that still give ``points`` points over ``time_range``.
+
+    Returns ``(grain, {metric: rollups})``, or ``(None, None)`` when the
+    range needs hourly rows or the stored rollups don't cover it.
+    """
+    grain = rollups.grain_for(timerange.hours(time_range), points)
+    if grain is None:
+        return None, None
+    buckets = store.rollups_between(respondent, metrics, grain, *time_range)
+    return (grain, buckets) if buckets is not None else (None, None)
+
+
+def _planned_or_last_known_good(api_key, wanted, stored):
+    # fetch_planned(), with last-known-good data for the queries EIA failed;
+    # ``stored(name)`` reads a query's rows from the store
+    results = fetch_planned(api_key, wanted)
+    for name, rows in results.items():
+        if isinstance(rows, eia.UPSTREAM_ERRORS):
+            url, params, _ = wanted[name]
+            held = last_known_good(url, params, lambda: stored(name))
+            if held is not None:
+                results[name] = held
+    return results
+
+
+def demand_rows_many(api_key, respondents, length):
+    results = {}
+    wanted = {}
+    for respondent in respondents:
+        rows = store.demand_rows(respondent, length)
+        if rows is not None:
+            results[respondent] = rows
+        else:
+            params = demand_params(api_key, respondent, length)
+            wanted[respondent] = (eia.REGION_DATA_URL, params, store.upsert_demand)
+    results.update(_planned_or_last_known_good(
+        api_key, wanted, lambda respondent: store.demand_rows(respondent, length, current=False),
+    ))
+    return results
+
+
+def fuel_rows_many(api_key, respondents, fueltypes, length):
+    results = {}
+    wanted = {}
+    for respondent in respondents:
+        rows = store.fuel_rows(respondent, fueltypes, length)
+        if rows is not None:
+            results[respondent] = rows
+        else:
+            params = fuel_params(api_key, respondent, fueltypes, length)
+            wanted[respondent] = (eia.FUEL_TYPE_DATA_URL, params, store.upsert_fuel_output)
+    results.update(_planned_or_last_known_good(
+        api_key, wanted, lambda respondent: store.fuel_rows(respondent, fueltypes, length, current=False),
+    ))
+    return results
@@ -0,0 +1,38 @@
+"""
+WhiteNoise static file serving that can sit in an async middleware chain.
+
+WhiteNoiseMiddleware (6.x) is sync-only, so under ASGI Django adapts every
+request around it: the rest of the chain runs through async_to_sync, and
+each in-flight async view holds a thread. StaticFilesMiddleware serves the
+same files but declares itself async-capable. Misses are a dict lookup in
+the index WhiteNoise builds at startup and go straight on to the next
+middleware on the event loop; only a hit (or a lookup with autorefresh on,
+which scans the disk) runs on a worker thread.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
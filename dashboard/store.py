@@ -0,0 +1,294 @@
+"""
+Local time-series store for EIA data.
+
+``upsert_*`` take rows exactly as the EIA API returns them and write them
+idempotently, so re-ingesting an overlapping window only updates values.
+Hourly writes also refresh the rollups of the days they touched, and demand
+writes fold into the hour-of-day profiles.
+The query helpers hand rows back in the same shape (and order) as the API,
+which lets the chart processing in views.py consume either source.
+"""
+import re
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from . import profiles, rollups
+from .models import FuelTypeOutput, RegionDemand, Rollup, StateCapacity, StateGeneration
+
+_HOURLY_PERIOD = re.compile(r'^(\d{4}-\d{2}-\d{2})T(\d{2})(?:([+-]\d{2}))?$')
+
+BATCH_SIZE = 500
+# Share of a range's hours the store must hold to answer it
+MIN_COVERAGE = 0.95
+
+
+def parse_period(period):
+    """Convert an hourly EIA period ('2024-05-01T13' or '2024-05-01T13-07') to UTC."""
+    match = _HOURLY_PERIOD.match(period or '')
+    if not match:
+        raise ValueError(f"Not an hourly period: {period!r}")
+    date, hour, offset = match.groups()
+    tz = dt_timezone(timedelta(hours=int(offset))) if offset else dt_timezone.utc
+    local = datetime.strptime(f"{date} {hour}", "%Y-%m-%d %H").replace(tzinfo=tz)
+    return local.astimezone(dt_timezone.utc)
+
+
+def newest_timestamp(rows):
+    """UTC time of the newest hourly row (rows sorted either way); None for annual rows."""
+    times = []
+    for row in (rows[0], rows[-1]):
+        try:
+            times.append(parse_period(row['period']))
+        except ValueError:
+            pass
+    return max(times, default=None)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _upsert(model, objs, unique_fields, update_fields):
+    # Keep the last occurrence of each key: a single INSERT ... ON CONFLICT
+    # statement may not touch the same row twice.
+    deduped = {tuple(getattr(o, f) for f in unique_fields): o for o in objs}
+    if not deduped:
+        return 0
+    model.objects.bulk_create(
+        deduped.values(),
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=update_fields,
+    )
+    return len(deduped)
+
+
+def upsert_demand(rows):
+    objs = []
+    for row in rows:
+        value = _to_float(row.get('value'))
+        if value is None or not row.get('respondent'):
+            continue
+        objs.append(RegionDemand(
+            respondent=row['respondent'],
+            period=row['period'],
+            timestamp=parse_period(row['period']),
+            value=value,
+        ))
+    with transaction.atomic():
+        profiles.record(objs)
+        written = _upsert(RegionDemand, objs, ['respondent', 'period'], ['timestamp', 'value'])
+        rollups.refresh(rollups.touched(rows))
+    return written
+
+
+def upsert_fuel_output(rows):
+    objs = []
+    for row in rows:
+        value = _to_float(row.get('value'))
+        if value is None or not row.get('respondent') or not row.get('fueltype'):
+            continue
+        objs.append(FuelTypeOutput(
+            respondent=row['respondent'],
+            fueltype=row['fueltype'],
+            period=row['period'],
+            timestamp=parse_period(row['period']),
+            value=value,
+        ))
+    with transaction.atomic():
+        written = _upsert(FuelTypeOutput, objs, ['respondent', 'period', 'fueltype'], ['timestamp', 'value'])
+        rollups.refresh(rollups.touched(rows))
+    return written
+
+
+def upsert_generation(rows):
+    objs = []
+    for row in rows:
+        value = _to_float(row.get('generation'))
+        if value is None or not row.get('location'):
+            continue
+        objs.append(StateGeneration(
+            location=row['location'],
+            period=row['period'],
+            fueltypeid=row.get('fueltypeid', ''),
+            sectorid=row.get('sectorid', ''),
+            generation=value,
+        ))
+    return _upsert(StateGeneration, objs, ['location', 'period', 'fueltypeid', 'sectorid'], ['generation'])
+
+
+def upsert_capacity(rows):
+    objs = []
+    for row in rows:
+        value = _to_float(row.get('nameplate-capacity-mw'))
+        if value is None or not row.get('location'):
+            continue
+        objs.append(StateCapacity(
+            location=row['location'],
+            period=row['period'],
+            fueltypeid=row.get('fueltypeid', ''),
+            sectorid=row.get('sectorid', ''),
+            capacity_mw=value,
+        ))
+    return _upsert(StateCapacity, objs, ['location', 'period', 'fueltypeid', 'sectorid'], ['capacity_mw'])
+
+
+# --- Query helpers ---
+
+def _is_recent(timestamp):
+    return timestamp >= timezone.now() - timedelta(hours=settings.EIA_STORE_MAX_LAG_HOURS)
+
+
+def _is_recent_year(period):
+    # Annual figures are published with roughly a year's delay
+    return period.isdigit() and int(period) >= timezone.now().year - 2
+
+
+def demand_rows(respondent, length, current=True):
+    """Latest ``length`` hours of demand, newest first; None if the store is behind.
+
+    With ``current=False``, whatever is stored (None only when nothing is),
+    for serving as last-known-good data; the same goes for the other lookups.
+    """
+    qs = (RegionDemand.objects.filter(respondent=respondent)
+          .order_by('-timestamp').values('respondent', 'period', 'timestamp', 'value')[:length])
+    rows = list(qs)
+    if not rows or current and (len(rows) < length or not _is_recent(rows[0]['timestamp'])):
+        return None
+    for row in rows:
+        del row['timestamp']
+    return rows
+
+
+def fuel_rows(respondent, fueltypes, length, current=True):
+    """Latest ``length`` fuel rows for the given fuels, newest first; None if behind."""
+    qs = (FuelTypeOutput.objects.filter(respondent=respondent, fueltype__in=fueltypes)
+          .order_by('-timestamp', 'fueltype')
+          .values('respondent', 'fueltype', 'period', 'timestamp', 'value')[:length])
+    rows = list(qs)
+    if not rows or current and (len(rows) < length or not _is_recent(rows[0]['timestamp'])):
+        return None
+    for row in rows:
+        del row['timestamp']
+    return rows
+
+
+def _covers(rows, expected, end):
+    # Nearly every hour present, and current if the range runs up to now
+    if not rows or len(rows) < expected * MIN_COVERAGE:
+        return False
+    return end <= timezone.now() - timedelta(hours=settings.EIA_STORE_MAX_LAG_HOURS) or _is_recent(rows[-1]['timestamp'])
+
+
+def demand_between(respondent, start, end, current=True):
+    """Demand for the UTC hours in [start, end), oldest first; None if the store lacks them."""
+    rows = list(RegionDemand.objects
+                .filter(respondent=respondent, timestamp__gte=start, timestamp__lt=end)
+                .order_by('timestamp').values('respondent', 'period', 'timestamp', 'value'))
+    if not rows or current and not _covers(rows, (end - start) / timedelta(hours=1), end):
+        return None
+    for row in rows:
+        del row['timestamp']
+    return rows
+
+
+def fuel_between(respondent, fueltypes, start, end, current=True):
+    """Fuel rows for the UTC hours in [start, end), oldest first; None if the store lacks them."""
+    rows = list(FuelTypeOutput.objects
+                .filter(respondent=respondent, fueltype__in=fueltypes, timestamp__gte=start, timestamp__lt=end)
+                .order_by('timestamp', 'fueltype')
+                .values('respondent', 'fueltype', 'period', 'timestamp', 'value'))
+    if not rows or current and not _covers(rows, (end - start) / timedelta(hours=1) * len(fueltypes), end):
+        return None
+    for row in rows:
+        del row['timestamp']
+    return rows
+
+
+def rollups_between(respondent, metrics, grain, start, end):
+    """``{metric: rollups}`` for the ``grain`` buckets in [start, end), oldest first.
+
+    None unless the first metric's buckets hold nearly every hour of the range.
+    """
+    grouped = {metric: [] for metric in metrics}
+    # Every bucket that starts before ``end``, including a partial last day
+    last = end.date() if end.time() == dt_time.min else end.date() + timedelta(days=1)
+    qs = (Rollup.objects
+          .filter(respondent=respondent, metric__in=metrics, grain=grain,
+                  bucket__gte=rollups.bucket_start(start.date(), grain), bucket__lt=last)
+          .order_by('bucket')
+          .values('metric', 'bucket', 'count', 'total', 'minimum', 'maximum', 'peak_period'))
+    for row in qs:
+        grouped[row['metric']].append(row)
+    hours = sum(row['count'] for row in grouped[metrics[0]])
+    if hours < (end - start) / timedelta(hours=1) * MIN_COVERAGE:
+        return None
+    return grouped
+
+
+def generation_rows(location, fueltypes, sectorid='99', current=True):
+    """All stored years of generation for a state, oldest first; None if behind."""
+    rows = list(StateGeneration.objects
+                .filter(location=location, sectorid=sectorid, fueltypeid__in=fueltypes)
+                .order_by('period')
+                .values('location', 'period', 'fueltypeid', 'sectorid', 'generation'))
+    if not rows or current and not _is_recent_year(rows[-1]['period']):
+        return None
+    return rows
+
+
+def capacity_rows(location, length, current=True):
+    """Latest ``length`` capacity rows for a state, newest first; None if behind."""
+    rows = list(StateCapacity.objects.filter(location=location)
+                .order_by('-period', 'sectorid', 'fueltypeid')
+                .values('location', 'period', 'fueltypeid', 'sectorid', 'capacity_mw')[:length])
+    if not rows or current and not _is_recent_year(rows[0]['period']):
+        return None
+    for row in rows:
+        row['nameplate-capacity-mw'] = row.pop('capacity_mw')
+    return rows
+
+
+def generation_by_location(locations, fueltypes, sectorid='99'):
+    """Every stored generation row for the given states and fuels as ``{location: rows}``, oldest first."""
+    grouped = {}
+    qs = (StateGeneration.objects
+          .filter(location__in=locations, sectorid=sectorid, fueltypeid__in=fueltypes)
+          .order_by('location', 'period', 'fueltypeid')
+          .values('location', 'period', 'fueltypeid', 'sectorid', 'generation'))
+    for row in qs.iterator():
+        grouped.setdefault(row['location'], []).append(row)
+    return grouped
+
+
+def generation_fingerprint():
+    """Changes whenever a generation row is added or revised."""
+    summary = StateGeneration.objects.aggregate(rows=Count('id'), latest=Max('period'), total=Sum('generation'))
+    return (summary['rows'], summary['latest'], summary['total'])
+
+
+def hourly_version(respondents):
+    """Newest stored demand and fuel hours for ``respondents``; moves on as new hours land."""
+    demand = RegionDemand.objects.filter(respondent__in=respondents).aggregate(latest=Max('timestamp'))['latest']
+    fuel = FuelTypeOutput.objects.filter(respondent__in=respondents).aggregate(latest=Max('timestamp'))['latest']
+    return (demand and demand.isoformat(), fuel and fuel.isoformat())
+
+
+def capacity_by_location(locations, sectorid='99'):
+    """Every stored capacity row for the given states as ``{location: rows}``."""
+    grouped = {}
+    qs = (StateCapacity.objects.filter(location__in=locations, sectorid=sectorid)
+          .order_by('location', '-period', 'fueltypeid')
+          .values('location', 'period', 'fueltypeid', 'sectorid', 'capacity_mw'))
+    for row in qs.iterator():
+        row['nameplate-capacity-mw'] = row.pop('capacity_mw')
+        grouped.setdefault(row['location'], []).append(row)
+    return grouped
@@ -0,0 +1,11 @@
+from django import template
+
+from .. import payloads
+
+register = template.Library()
+
+
+@register.filter
+def json_payload(value, element_id):
+    """Like json_script, with the compact serializer of dashboard/payloads.py."""
+    return payloads.script(value, element_id)
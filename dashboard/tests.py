@@ -1,3 +1,1240 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import numpy as np
+import requests
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+import benchmarks
+
+from . import (
+    breaker, caching, capacity, concurrency, cube, eia, ingest, live, metrics, payloads, planner, profiles, replay,
+    rollups, scheduler, series, singleflight, sources, store, views, warmup,
+)
+from .concurrency import run_concurrently
+from .models import FuelTypeOutput, IngestCheckpoint, RegionDemand, Rollup
+from .regions import NET_LOAD_REGIONS, STATE_FUEL_TYPES
+from .snapshots import Snapshot
+from .staticfiles import StaticFilesMiddleware
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.payload = payload if payload is not None else {'response': {'data': []}}
+        self.text = ''
+
+    def json(self):
+        return self.payload
+
+    def close(self):
+        pass
+
+
+# No scheduler waits (unlimited tokens, and a fresh scheduler built for them) and fresh breakers
+@override_settings(EIA_KEY_RATE=1e9, EIA_KEY_BURST=10 ** 9, EIA_RETRY_BACKOFF=0, EIA_MAX_RETRIES=2)
+class UpstreamTestCase(SimpleTestCase):
+    def setUp(self):
+        for patcher in [mock.patch.object(scheduler, '_scheduler', None), mock.patch.dict(breaker._breakers, clear=True)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def upstream(self, *responses):
+        session = mock.Mock(**{'get.side_effect': list(responses)})
+        patcher = mock.patch.object(eia, 'get_session', return_value=session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return session
+
+
+class ClientTests(UpstreamTestCase):
+    def test_one_pooled_session_per_process(self):
+        self.assertIs(eia.get_session(), eia.get_session())
+
+    def test_retries_a_server_error_within_the_budget(self):
+        rows = [{'period': '2026-01-01T00'}]
+        session = self.upstream(FakeResponse(503), FakeResponse(payload={'response': {'data': rows}}))
+        self.assertEqual(eia.fetch_uncached(eia.REGION_DATA_URL, {'api_key': 'k'}), rows)
+        self.assertEqual(session.get.call_count, 2)
+
+    def test_does_not_retry_a_rejected_query(self):
+        session = self.upstream(FakeResponse(400), FakeResponse())
+        with self.assertRaises(eia.EIAError) as raised:
+            eia.fetch_uncached(eia.REGION_DATA_URL, {'api_key': 'k'})
+        self.assertEqual(raised.exception.status, 400)
+        self.assertEqual(session.get.call_count, 1)
+
+    def test_gives_up_when_the_budget_is_spent(self):
+        self.upstream(FakeResponse(503, headers={'Retry-After': '5'}), FakeResponse())
+        with self.assertRaises(eia.EIABudgetExceeded):
+            eia.fetch_uncached(eia.REGION_DATA_URL, {'api_key': 'k'}, budget=1)
+
+
+@override_settings(CACHES=LOCMEM)
+class ResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        caching._front.clear()
+
+    def expire(self, key, stale=False):
+        # Move an entry past its fresh (and optionally its stale) deadline, in both tiers
+        entry = dict(cache.get(key), fresh_until=time.time() - 1)
+        if stale:
+            entry['stale_until'] = time.time() - 1
+        cache.set(key, entry)
+        caching._front.set(key, entry)
+
+    def test_keys_ignore_the_api_key_and_parameter_order(self):
+        a = caching.make_key(eia.REGION_DATA_URL, {'api_key': 'a', 'frequency': 'hourly', 'facets[x][]': ['B', 'A']})
+        b = caching.make_key(eia.REGION_DATA_URL, {'facets[x][]': ['A', 'B'], 'frequency': 'hourly', 'api_key': 'b'})
+        self.assertEqual(a, b)
+
+    def test_ttl_follows_the_frequency(self):
+        self.assertEqual(caching.ttl_for({'frequency': 'annual'}), settings.EIA_CACHE_TTLS['annual'])
+        self.assertEqual(caching.ttl_for({}), settings.EIA_CACHE_TTLS['hourly'])
+
+    def test_fresh_entries_are_served_without_fetching(self):
+        fetch = mock.Mock(return_value=['rows'])
+        caching.get_or_fetch('eia:test', 60, fetch)
+        caching._front.clear()  # the shared tier still has it
+        self.assertEqual(caching.get_or_fetch('eia:test', 60, fetch), ['rows'])
+        self.assertEqual(fetch.call_count, 1)
+
+    def test_stale_entries_are_served_while_refreshing_in_the_background(self):
+        caching.get_or_fetch('eia:test', 60, lambda: ['old'])
+        self.expire('eia:test')
+        refreshed = threading.Event()
+
+        def fetch():
+            refreshed.set()
+            return ['new']
+
+        self.assertEqual(caching.get_or_fetch('eia:test', 60, fetch), ['old'])
+        self.assertTrue(refreshed.wait(2))
+        for _ in range(100):
+            if cache.get('eia:test')['value'] == ['new']:
+                break
+            time.sleep(0.01)
+        self.assertEqual(caching.get_or_fetch('eia:test', 60, fetch), ['new'])
+
+    def test_expired_entries_are_refetched_but_kept_as_last_known_good(self):
+        caching.get_or_fetch('eia:test', 60, lambda: ['old'])
+        self.expire('eia:test', stale=True)
+        self.assertEqual(caching.last_known_good('eia:test')[0], ['old'])
+        self.assertEqual(caching.get_or_fetch('eia:test', 60, lambda: ['new']), ['new'])
+
+    def test_front_tier_evicts_the_least_recently_used(self):
+        lru = caching.LRUCache(2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('a'), 1)
+
+
+def recent_periods(hours):
+    """UTC hourly periods ending at the current hour, newest first."""
+    now = datetime.now(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return [(now - timedelta(hours=h)).strftime('%Y-%m-%dT%H') for h in range(hours)]
+
+
+class StoreTests(TestCase):
+    def test_parse_period_handles_local_offsets(self):
+        self.assertEqual(store.parse_period('2026-01-01T13-05'), datetime(2026, 1, 1, 18, tzinfo=dt_timezone.utc))
+        self.assertEqual(store.parse_period('2026-01-01T13'), datetime(2026, 1, 1, 13, tzinfo=dt_timezone.utc))
+        with self.assertRaises(ValueError):
+            store.parse_period('2026')
+
+    def test_upserts_revise_rows_and_skip_unusable_ones(self):
+        rows = [{'respondent': 'CISO', 'period': '2026-01-01T00', 'value': '100'},
+                {'respondent': 'CISO', 'period': '2026-01-01T01', 'value': None},
+                {'respondent': 'CISO', 'period': '2026-01-01T00', 'value': '110'}]
+        self.assertEqual(store.upsert_demand(rows), 1)
+        store.upsert_demand([{'respondent': 'CISO', 'period': '2026-01-01T00', 'value': '120'}])
+        self.assertEqual(list(RegionDemand.objects.values_list('period', 'value')), [('2026-01-01T00', 120.0)])
+
+    def test_reads_only_answer_when_the_store_is_current(self):
+        periods = recent_periods(5)
+        store.upsert_demand([{'respondent': 'CISO', 'period': p, 'value': i} for i, p in enumerate(periods)])
+        self.assertEqual([r['period'] for r in store.demand_rows('CISO', 3)], periods[:3])
+        self.assertIsNone(store.demand_rows('CISO', 10))
+        self.assertEqual(len(store.demand_rows('CISO', 10, current=False)), 5)
+
+    def test_stale_stores_are_not_served_as_current(self):
+        store.upsert_demand([{'respondent': 'CISO', 'period': '2020-01-01T00', 'value': 1}])
+        self.assertIsNone(store.demand_rows('CISO', 1))
+        self.assertEqual(len(store.demand_rows('CISO', 1, current=False)), 1)
+
+
+class IngestTests(TestCase):
+    def run_ingest(self, fetched):
+        with mock.patch.object(planner, 'execute', return_value=(fetched, 1)) as execute:
+            results, _ = ingest.ingest('key', [ingest.demand_series('CISO')], lookback_hours=24)
+        query, = execute.call_args.args[1]
+        return results, query
+
+    def test_first_pass_starts_at_the_lookback_and_sets_the_mark(self):
+        rows = [{'respondent': 'CISO', 'period': p, 'value': 1} for p in recent_periods(3)]
+        results, query = self.run_ingest({'demand:CISO': rows})
+        self.assertEqual(results, {'demand:CISO': 3})
+        self.assertEqual(query.params['start'], recent_periods(25)[-1])
+        self.assertEqual(IngestCheckpoint.objects.get(series='demand:CISO').high_water, rows[0]['period'])
+
+    def test_later_passes_start_from_the_mark(self):
+        IngestCheckpoint.objects.create(series='demand:CISO', high_water='2026-01-01T05')
+        _, query = self.run_ingest({'demand:CISO': []})
+        self.assertEqual(query.params['start'], '2026-01-01T05')
+
+    def test_a_failed_fetch_keeps_the_mark(self):
+        IngestCheckpoint.objects.create(series='demand:CISO', high_water='2026-01-01T05')
+        results, _ = self.run_ingest({'demand:CISO': eia.EIAError("down")})
+        self.assertIsInstance(results['demand:CISO'], eia.EIAError)
+        self.assertEqual(IngestCheckpoint.objects.get(series='demand:CISO').high_water, '2026-01-01T05')
+
+
+@override_settings(EIA_MAX_CONCURRENCY=2)
+class ConcurrencyTests(SimpleTestCase):
+    def setUp(self):
+        # A pool built for the small limit, shut down afterwards
+        patcher = mock.patch.object(concurrency, '_executor', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: concurrency._executor and concurrency._executor.shutdown(wait=False))
+
+    def test_calls_run_side_by_side(self):
+        started = time.monotonic()
+        results = run_concurrently({'a': lambda: time.sleep(0.2) or 'a', 'b': lambda: time.sleep(0.2) or 'b'})
+        self.assertEqual(results, {'a': 'a', 'b': 'b'})
+        self.assertLess(time.monotonic() - started, 0.35)
+
+    def test_failures_and_timeouts_become_results(self):
+        def fail():
+            raise eia.EIAError("down")
+
+        results = run_concurrently({'fail': fail, 'slow': lambda: time.sleep(0.5)}, timeout=0.1)
+        self.assertIsInstance(results['fail'], eia.EIAError)
+        self.assertIsInstance(results['slow'], TimeoutError)
+
+    def test_nested_calls_do_not_deadlock_a_full_pool(self):
+        def outer(name):
+            inner = {f'{name}{i}': (lambda i=i: time.sleep(0.05) or i) for i in range(2)}
+            return run_concurrently(inner, timeout=3)
+
+        results = run_concurrently({'x': lambda: outer('x'), 'y': lambda: outer('y')}, timeout=3)
+        self.assertEqual(results, {'x': {'x0': 0, 'x1': 1}, 'y': {'y0': 0, 'y1': 1}})
+
+    def test_calls_keep_the_callers_priority(self):
+        with scheduler.priority('backfill'):
+            results = run_concurrently({'p': lambda: scheduler._priority.get()})
+        self.assertEqual(results, {'p': 'backfill'})
+
+
+class AsyncClientTests(UpstreamTestCase):
+    def async_upstream(self, *responses):
+        client = mock.Mock(**{'get': mock.AsyncMock(side_effect=list(responses))})
+        patcher = mock.patch.object(eia, 'get_async_client', return_value=client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return client
+
+    def test_retries_on_the_event_loop(self):
+        rows = [{'period': '2026-01-01T00'}]
+        request = httpx.Request('GET', eia.REGION_DATA_URL)
+        client = self.async_upstream(
+            httpx.Response(503, request=request), httpx.Response(200, json={'response': {'data': rows}}, request=request),
+        )
+        self.assertEqual(asyncio.run(eia.afetch_uncached(eia.REGION_DATA_URL, {'api_key': 'k'})), rows)
+        self.assertEqual(client.get.await_count, 2)
+
+    def test_transport_errors_become_eia_errors(self):
+        self.async_upstream(*[httpx.ConnectError("refused")] * 3)
+        with self.assertRaises(eia.EIAError):
+            asyncio.run(eia.afetch_uncached(eia.REGION_DATA_URL, {'api_key': 'k'}))
+
+
+class StaticFilesTests(SimpleTestCase):
+    def middleware(self, get_response):
+        middleware = StaticFilesMiddleware(get_response)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with open(os.path.join(directory.name, 'app.js'), 'w') as f:
+            f.write('console.log(1);')
+        middleware.autorefresh = False
+        middleware.add_files(directory.name, prefix='static/')
+        return middleware
+
+    def test_stays_async_in_an_async_chain(self):
+        async def view(request):
+            return HttpResponse('page')
+
+        middleware = self.middleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = asyncio.run(middleware(RequestFactory().get('/net-load/')))
+        self.assertEqual(response.content, b'page')
+
+    def test_serves_static_files(self):
+        async def view(request):
+            raise AssertionError("static files never reach the view")
+
+        response = asyncio.run(self.middleware(view)(RequestFactory().get('/static/app.js')))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'console.log(1);')
+
+    def test_stays_sync_in_a_sync_chain(self):
+        middleware = self.middleware(lambda request: HttpResponse('page'))
+        self.assertFalse(iscoroutinefunction(middleware))
+        self.assertEqual(middleware(RequestFactory().get('/')).content, b'page')
+
+
+@override_settings(CACHES=LOCMEM)
+class ApiValidatorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.periods = recent_periods(30)
+        store.upsert_demand([{'respondent': 'US48', 'period': p, 'value': 400000 + i} for i, p in enumerate(self.periods)])
+
+    def get(self, etag=None, encoding=''):
+        headers = {'HTTP_ACCEPT_ENCODING': encoding}
+        if etag:
+            headers['HTTP_IF_NONE_MATCH'] = etag
+        return self.client.get('/api/v1/demand', **headers)
+
+    def test_round_trip_to_304_without_rebuilding(self):
+        first = self.get()
+        self.assertEqual(first.status_code, 200)
+        with mock.patch.object(views, 'demand_context_for', side_effect=AssertionError("rebuilt")):
+            second = self.get(first['ETag'])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_a_new_hour_changes_the_version(self):
+        before = store.hourly_version(['US48'])
+        first = self.get()
+        newer = (store.parse_period(self.periods[0]) + timedelta(hours=1)).strftime('%Y-%m-%dT%H')
+        store.upsert_demand([{'respondent': 'US48', 'period': newer, 'value': 1}])
+        self.assertNotEqual(store.hourly_version(['US48']), before)
+        second = self.get(first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+
+    def test_each_encoding_revalidates_only_its_own_tag(self):
+        plain, gzipped = self.get(), self.get(encoding='gzip')
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzipped['ETag'], plain['ETag'][:-1] + '-gzip"')
+        self.assertEqual(self.get(gzipped['ETag'], encoding='gzip').status_code, 304)
+        # A client that doesn't accept gzip can't revalidate the gzip body
+        self.assertEqual(self.get(gzipped['ETag']).status_code, 200)
+        self.assertEqual(self.get(plain['ETag'], encoding='gzip').status_code, 200)
+
+
+class PlannerTests(SimpleTestCase):
+    def demand(self, key, respondent, **params):
+        return planner.Query(key, eia.REGION_DATA_URL, {
+            'frequency': 'hourly', 'data[0]': 'value', 'facets[type][]': 'D',
+            'facets[respondent][]': respondent, **params,
+        })
+
+    def test_queries_differing_in_the_facet_share_a_batch(self):
+        batches = planner.plan([
+            self.demand('ciso', 'CISO', start='2026-01-02T00'),
+            self.demand('erco', 'ERCO', start='2026-01-01T00'),
+        ])
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(batches[0].params['facets[respondent][]'], ['CISO', 'ERCO'])
+        self.assertEqual(batches[0].params['start'], '2026-01-01T00')
+
+    def test_incompatible_queries_stay_apart(self):
+        batches = planner.plan([self.demand('ciso', 'CISO'), self.demand('erco', 'ERCO', frequency='local-hourly')])
+        self.assertEqual(len(batches), 2)
+
+    def test_rows_are_split_back_by_facet_and_length(self):
+        rows = [{'respondent': r, 'period': f'2026-01-01T{h:02d}'} for h in range(3) for r in ['CISO', 'ERCO']]
+        batch, = planner.plan([self.demand('ciso', 'CISO', length=2), self.demand('erco', 'ERCO', length=3)])
+        with mock.patch.object(eia, 'fetch_uncached', return_value=rows) as fetch:
+            results = planner.run('key', batch)
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual([r['period'] for r in results['ciso']], ['2026-01-01T00', '2026-01-01T01'])
+        self.assertEqual(len(results['erco']), 3)
+
+
+    def test_paging_is_stable_when_periods_tie(self):
+        # Capacity rows repeat each year across sectors and fuels; the fake
+        # upstream returns ties in a different order on every request
+        rows = [{'period': year, 'location': state, 'sectorid': sector, 'fueltypeid': fuel}
+                for year in ['2024', '2025'] for state in ['CA', 'TX']
+                for sector in ['1', '99'] for fuel in ['ALL', 'SUN']]
+        shuffler = np.random.default_rng(1)
+
+        def fetch(url, params):
+            page = [rows[i] for i in shuffler.permutation(len(rows))]
+            sort = 0
+            columns = []
+            while f'sort[{sort}][column]' in params:
+                columns.append(params[f'sort[{sort}][column]'])
+                sort += 1
+            page.sort(key=lambda row: [row[c] for c in columns], reverse=params['sort[0][direction]'] == 'desc')
+            return page[params['offset']:params['offset'] + params['length']]
+
+        queries = [planner.Query(state, eia.OPERATIONAL_DATA_URL, sources.capacity_params(None, state, 500))
+                   for state in ['CA', 'TX']]
+        for query in queries:
+            del query.params['api_key']
+        batch, = planner.plan(queries)
+        with mock.patch.object(planner, 'PAGE_LENGTH', 3), mock.patch.object(eia, 'fetch_uncached', side_effect=fetch):
+            results = planner.run('key', batch)
+        for state in ['CA', 'TX']:
+            got = sorted(tuple(row.values()) for row in results[state])
+            self.assertEqual(got, sorted(tuple(row.values()) for row in rows if row['location'] == state))
+
+
+@override_settings(CACHES=LOCMEM, EIA_INGEST_INTERVAL=3600)
+class SnapshotTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.builds = []
+        self.built = threading.Event()
+
+        def build(api_key=None):
+            self.builds.append(api_key)
+            self.built.set()
+            return {'n': len(self.builds)}
+        self.snapshot = Snapshot('test:snapshot', build)
+
+    def wait_for_build(self):
+        self.assertTrue(self.built.wait(2))
+        self.built.clear()
+        for _ in range(100):
+            if cache.get('test:snapshot:refresh') is None:
+                return
+            time.sleep(0.01)
+
+    def test_a_missing_snapshot_is_built_in_the_background(self):
+        self.assertIsNone(self.snapshot.current('key'))
+        self.wait_for_build()
+        self.assertEqual(self.snapshot.current('key'), {'n': 1})
+        self.assertEqual(self.builds, ['key'])
+
+    def test_an_old_snapshot_is_served_while_it_is_rebuilt(self):
+        self.snapshot.refresh()
+        with override_settings(EIA_INGEST_INTERVAL=0):
+            self.assertEqual(self.snapshot.current('key'), {'n': 1})
+            self.wait_for_build()
+        self.assertEqual(self.snapshot.get(), {'n': 2})
+
+    def test_capacity_summary_prefers_the_reported_total(self):
+        rows = [{'period': '2024', 'sectorid': '99', 'fueltypeid': 'ALL', 'nameplate-capacity-mw': '100'},
+                {'period': '2024', 'sectorid': '99', 'fueltypeid': 'SUN', 'nameplate-capacity-mw': '30'},
+                {'period': '2025', 'sectorid': '99', 'fueltypeid': 'SUN', 'nameplate-capacity-mw': '40'},
+                {'period': '2025', 'sectorid': '1', 'fueltypeid': 'ALL', 'nameplate-capacity-mw': '999'}]
+        summary = capacity.summarize(rows)
+        self.assertEqual((summary['year'], summary['total_mw']), ('2025', 40))
+        self.assertEqual(summary['history'], {'2024': 100, '2025': 40})
+
+
+class SeriesTests(SimpleTestCase):
+    def test_local_periods_align_on_utc_hours(self):
+        times, offsets = series.parse_periods(['2024-05-01T13-07', '2024-05-01T20'])
+        self.assertEqual(times.tolist(), [datetime(2024, 5, 1, 20)] * 2)
+        self.assertEqual(offsets.tolist(), [-7, 0])
+        self.assertEqual(series.format_periods(times, offsets, True), ['2024-05-01T13-07', '2024-05-01T20+00'])
+
+    def test_demand_leaves_missing_hours_null(self):
+        rows = [{'period': '2024-05-01T03', 'value': 30},
+                {'period': '2024-05-01T00', 'value': 10},
+                {'period': '2024-05-01T01', 'value': None}]
+        periods, values = series.demand(rows)
+        self.assertEqual(periods, ['2024-05-01T00', '2024-05-01T01', '2024-05-01T02', '2024-05-01T03'])
+        self.assertEqual(values, [10.0, None, None, 30.0])
+
+    def test_duplicate_hours_are_summed(self):
+        hours, _, values = series.hourly(['2024-05-01T00', '2024-05-01T00'], np.array([1.0, 2.0]))
+        self.assertEqual(len(hours), 1)
+        self.assertEqual(values.tolist(), [3.0])
+
+    def test_net_load(self):
+        demand = [{'period': f'2024-05-01T{h:02d}', 'value': 100} for h in range(3)]
+        fuels = [{'period': f'2024-05-01T{h:02d}', 'fueltype': 'SUN', 'value': 10 * h} for h in (0, 2)]
+        chart = series.net_load(demand, fuels)
+        self.assertEqual(chart['solar'], [0.0, None, 20.0])
+        # No wind rows at all counts as zero wind
+        self.assertEqual(chart['wind'], [0.0, 0.0, 0.0])
+        self.assertEqual(chart['net_load'], [100.0, None, 80.0])
+        self.assertEqual(chart['labels'], ['00:00', '01:00', '02:00'])
+
+        summary = series.net_load_summary(chart)
+        self.assertEqual(summary['peak_net_load'], 100.0)
+        self.assertEqual(summary['min_net_load'], 80.0)
+        self.assertIsNone(summary['max_ramp'])
+        self.assertEqual(summary['renewable_share'], 10.0)
+
+    def test_net_load_summary_of_an_empty_chart(self):
+        chart = series.net_load([], [])
+        self.assertEqual(series.net_load_summary(chart)['peak_net_load'], None)
+
+    def test_annual_totals(self):
+        rows = [{'period': '2023', 'fuel': 'SUN', 'mw': 5}, {'period': '2024', 'fuel': 'SUN', 'mw': 7},
+                {'period': '2024', 'fuel': 'SUN', 'mw': 'x'}, {'period': '2022', 'fuel': 'COL', 'mw': 9}]
+        years, totals = series.annual_totals(rows, 'mw', 'fuel', ['SUN', 'WND'])
+        self.assertEqual(years, ['2022', '2023', '2024'])
+        self.assertEqual(totals, {'SUN': [0.0, 5.0, 7.0], 'WND': [0.0, 0.0, 0.0]})
+
+
+class BackfillTests(TestCase):
+    start = datetime(2026, 1, 1)
+    end = datetime(2026, 1, 3)
+
+    def upstream(self):
+        calls = []
+
+        def stream(url, params):
+            calls.append(params)
+            hours = []
+            hour = datetime.strptime(params['start'], '%Y-%m-%dT%H')
+            while hour <= datetime.strptime(params['end'], '%Y-%m-%dT%H'):
+                hours.append(hour)
+                hour += timedelta(hours=1)
+            for hour in hours[params['offset']:params['offset'] + params['length']]:
+                yield {'respondent': 'CISO', 'period': hour.strftime('%Y-%m-%dT%H'), 'value': hour.hour}
+        return calls, mock.patch.object(eia, 'stream_rows', side_effect=stream)
+
+    def backfill(self):
+        calls, patcher = self.upstream()
+        with patcher, mock.patch.object(ingest, 'PAGE_LENGTH', 5):
+            written = ingest.backfill('key', ingest.demand_series('CISO'), self.start, self.end,
+                                      window=timedelta(days=1), batch_size=2)
+        return written, calls
+
+    def test_walks_windows_and_pages(self):
+        written, calls = self.backfill()
+        self.assertEqual(written, 48)
+        self.assertEqual(RegionDemand.objects.count(), 48)
+        # Five pages of each day's 24 hours
+        self.assertEqual([c['offset'] for c in calls[:5]], [0, 5, 10, 15, 20])
+        self.assertEqual([c['start'] for c in calls], ['2026-01-01T00'] * 5 + ['2026-01-02T00'] * 5)
+        checkpoint = IngestCheckpoint.objects.get(series='backfill:demand:CISO')
+        self.assertEqual((checkpoint.high_water, checkpoint.offset), ('2026-01-03T00', 0))
+
+    def test_resumes_from_the_checkpoint(self):
+        IngestCheckpoint.objects.create(series='backfill:demand:CISO', high_water='2026-01-02T00', offset=7)
+        written, calls = self.backfill()
+        self.assertEqual(written, 24 - 7)
+        self.assertEqual((calls[0]['start'], calls[0]['offset']), ('2026-01-02T00', 7))
+
+    def test_a_checkpoint_outside_the_range_is_ignored(self):
+        IngestCheckpoint.objects.create(series='backfill:demand:CISO', high_water='2025-06-01T00', offset=7)
+        written, calls = self.backfill()
+        self.assertEqual(written, 48)
+        self.assertEqual((calls[0]['start'], calls[0]['offset']), ('2026-01-01T00', 0))
+
+    def test_rows_stream_across_chunk_boundaries(self):
+        body = '{"response": {"total": 2, "data": [{"name": "Caf\u00e9 \u00e9"}, {"v": [1, {"x": "]}"}]}]}}'
+        data = body.encode('utf-8')
+        chunks = [data[i:i + 5] for i in range(0, len(data), 5)]
+        self.assertEqual(list(eia.iter_rows(chunks)), [{'name': 'Caf\u00e9 \u00e9'}, {'v': [1, {'x': ']}'}]}])
+
+
+@override_settings(CACHES=LOCMEM)
+class NetLoadOverviewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.periods = ['2026-01-01T00', '2026-01-01T01', '2026-01-01T02']
+        self.demand = {code: [{'period': p, 'value': 100} for p in self.periods] for code in NET_LOAD_REGIONS}
+        self.fuel = {code: [{'period': p, 'fueltype': 'SUN', 'value': 10} for p in self.periods]
+                     for code in NET_LOAD_REGIONS}
+
+    def fetched(self):
+        return (mock.patch.object(sources, 'demand_rows_many', return_value=self.demand),
+                mock.patch.object(sources, 'fuel_rows_many', return_value=self.fuel))
+
+    def test_every_region_from_two_merged_fetches(self):
+        self.demand['PJM'] = eia.EIAError("down")
+        demand, fuel = self.fetched()
+        with demand as demand_rows, fuel as fuel_rows:
+            overview = views.get_net_load_overview('key')
+        self.assertEqual(demand_rows.call_count, 1)
+        self.assertEqual(fuel_rows.call_count, 1)
+        self.assertEqual([region['code'] for region in overview], list(NET_LOAD_REGIONS))
+        charts = {region['code']: region for region in overview}
+        self.assertIsNone(charts['PJM']['chart'])
+        self.assertEqual(charts['CISO']['chart']['net_load'], [90.0, 90.0, 90.0])
+        self.assertEqual(charts['CISO']['summary']['renewable_share'], 10.0)
+
+    def test_a_failed_fetch_fails_the_overview(self):
+        with mock.patch.object(sources, 'demand_rows_many', side_effect=eia.EIAError("down")):
+            self.assertIsNone(views.get_net_load_overview('key'))
+
+    def test_api_filters_every_region_since_a_period(self):
+        demand, fuel = self.fetched()
+        with demand, fuel, mock.patch.dict(os.environ, {'EIA_API_KEY': 'key'}):
+            response = self.client.get('/api/v1/net-load/overview', {'since': '2026-01-01T00'})
+        self.assertEqual(response.status_code, 200)
+        regions = response.json()['regions']
+        self.assertEqual(set(regions), set(NET_LOAD_REGIONS))
+        self.assertEqual(regions['ERCO']['periods'], self.periods[1:])
+        self.assertEqual(regions['ERCO']['net_load'], [90.0, 90.0])
+
+
+class GenerationCubeTests(TestCase):
+    def setUp(self):
+        reported = {
+            ('CA', '2019'): {'ALL': 100, 'SUN': 10, 'WND': 5},
+            ('CA', '2023'): {'ALL': 100, 'SUN': 20},
+            ('CA', '2024'): {'ALL': 110, 'SUN': 33, 'WND': 11},
+            ('TX', '2023'): {'ALL': 160},
+            ('TX', '2024'): {'ALL': 200, 'WND': 40},
+            ('TX', '2025'): {'ALL': 210},
+        }
+        store.upsert_generation([
+            {'location': state, 'period': year, 'fueltypeid': fuel, 'sectorid': '99', 'generation': value}
+            for (state, year), fuels in reported.items() for fuel, value in fuels.items()
+        ])
+
+    def test_the_latest_year_is_the_newest_most_states_published(self):
+        data = cube.build_cube()
+        self.assertEqual(data['years'], ['2019', '2023', '2024', '2025'])
+        with mock.patch.object(cube, 'COMPLETE_SHARE', 2 / len(data['states'])):
+            self.assertEqual(cube.latest_year(data), '2024')
+
+    def test_rankings(self):
+        year, ranked = cube.rankings(cube.build_cube(), '2024')
+        self.assertEqual(year, '2024')
+        self.assertEqual(len(ranked), len(cube.ALL_STATES))
+        ca, tx = ranked[:2]
+        self.assertEqual((ca['state'], ca['renewable_share'], ca['renewable_growth'], ca['yoy']), ('CA', 40.0, 25.0, 10.0))
+        self.assertEqual((tx['state'], tx['renewable_share'], tx['renewable_growth'], tx['yoy']), ('TX', 20.0, None, 25.0))
+        self.assertEqual(tx['shares']['WND'], 20.0)
+        # States with no figures go last
+        self.assertIsNone(ranked[2]['total'])
+
+        _, ranked = cube.rankings(cube.build_cube(), '2024', sort='yoy')
+        self.assertEqual([row['state'] for row in ranked[:2]], ['TX', 'CA'])
+
+    def test_state_totals(self):
+        data = cube.build_cube()
+        years, totals = cube.state_totals('CA', data)
+        self.assertEqual(years, ['2019', '2023', '2024'])
+        self.assertEqual(totals['SUN'], [10.0, 20.0, 33.0])
+        self.assertEqual(totals['WND'], [5.0, 0.0, 11.0])
+        self.assertIsNone(cube.state_totals('WY', data))
+
+    def test_states_the_store_lacks_are_fetched_in_one_request(self):
+        with mock.patch.object(sources, 'fetch_planned', return_value={}) as fetch:
+            cube.build_cube('key')
+        fetch.assert_called_once()
+        wanted = fetch.call_args.args[1]
+        self.assertEqual(set(wanted), set(cube.ALL_STATES) - {'CA', 'TX'})
+
+
+class ProfileTests(TestCase):
+    mondays = ['2026-01-05', '2026-01-12', '2026-01-19', '2026-01-26']
+
+    def add(self, values, hour=10):
+        store.upsert_demand([{'respondent': 'CISO', 'period': f'{day}T{hour:02d}-08', 'value': value}
+                             for day, value in zip(self.mondays, values)])
+
+    def cell(self, profile, row, hour):
+        return profile['grid'][row]['cells'][hour]
+
+    def test_heatmap(self):
+        self.add([50, 60, 70, 90])
+        profile = profiles.heatmap('CISO', 'weekday', 100)
+        self.assertEqual(profile['hours'], 4)
+        monday = self.cell(profile, 0, 10)
+        self.assertEqual((monday['hours'], monday['mean'], monday['high_hours']), (4, 67.5, 1))
+        self.assertAlmostEqual(monday['p95'], 90, delta=1)
+        self.assertEqual(self.cell(profile, 1, 10)['hours'], 0)
+        # January in the month layout
+        self.assertEqual(self.cell(profiles.heatmap('CISO', 'month', 100), 0, 10)['mean'], 67.5)
+
+    def test_revisions_replace_the_old_value(self):
+        self.add([50, 60, 70, 90])
+        self.add([50, 60, 70, 80])
+        monday = self.cell(profiles.heatmap('CISO', 'weekday', 100), 0, 10)
+        self.assertEqual((monday['hours'], monday['mean'], monday['high_hours']), (4, 65.0, 0))
+
+        before = profiles.heatmap('CISO', 'weekday', 100)
+        self.assertEqual(profiles.rebuild(['CISO']), 4)
+        self.assertEqual(profiles.heatmap('CISO', 'weekday', 100), before)
+
+    def test_nothing_stored(self):
+        self.assertIsNone(profiles.heatmap('CISO', 'weekday', 100))
+
+
+class LiveFeedTests(SimpleTestCase):
+    keys = [('demand', 'US48'), ('net_load', 'CISO')]
+
+    def test_parse_series(self):
+        self.assertEqual(live.parse_series(['demand:US48', 'net_load:CISO', 'demand:US48']), self.keys)
+        for values in [[], ['demand:NOPE'], ['weather:US48']]:
+            with self.assertRaises(ValueError):
+                live.parse_series(values)
+
+    def test_parse_cursors(self):
+        self.assertEqual(live.parse_cursors('', self.keys), {})
+        self.assertEqual(live.parse_cursors('2026-01-01T05', self.keys), dict.fromkeys(self.keys, '2026-01-01T05'))
+        since = 'demand:US48=2026-01-01T05;net_load:CISO=;congestion:ERCO=2026-01-01T01'
+        self.assertEqual(live.parse_cursors(since, self.keys), {('demand', 'US48'): '2026-01-01T05'})
+
+    def test_render_advances_only_its_own_cursor(self):
+        subscriber = live.Subscriber(self.keys, {('net_load', 'CISO'): '2026-01-01T02'})
+        text = subscriber.render((('demand', 'US48'), '2026-01-01T05', 'event: demand\ndata: {}\n'))
+        self.assertTrue(text.endswith('id: demand:US48=2026-01-01T05;net_load:CISO=2026-01-01T02\n\n'))
+        # A revision of an older hour leaves the cursor where it is; offsets compare as UTC
+        text = subscriber.render((('net_load', 'CISO'), '2026-01-01T01-08', 'event: net_load\ndata: {}\n'))
+        self.assertTrue(text.endswith('net_load:CISO=2026-01-01T01-08\n\n'))
+        text = subscriber.render((('net_load', 'CISO'), '2026-01-01T02', 'event: net_load\ndata: {}\n'))
+        self.assertTrue(text.endswith('net_load:CISO=2026-01-01T01-08\n\n'))
+
+    def test_feed_sends_new_and_revised_points(self):
+        feed = live.Feed('demand', 'US48')
+        self.assertIsNone(feed.catch_up(None))
+        feed.diff({'periods': ['2026-01-01T00', '2026-01-01T01'], 'values': [1, 2]})
+        changed = feed.diff({'periods': ['2026-01-01T00', '2026-01-01T01', '2026-01-01T02'], 'values': [1, 3, 4]})
+        self.assertEqual(changed, {'periods': ['2026-01-01T01', '2026-01-01T02'], 'values': [3, 4]})
+        self.assertIsNone(feed.diff(feed.latest))
+
+        key, period, text = feed.catch_up('2026-01-01T00')
+        self.assertEqual((key, period), (('demand', 'US48'), '2026-01-01T02'))
+        self.assertIn('"periods":["2026-01-01T01","2026-01-01T02"]', text.replace(' ', ''))
+        self.assertIsNone(feed.catch_up('2026-01-01T02'))
+
+    @override_settings(LIVE_QUEUE_SIZE=1)
+    def test_a_client_that_falls_behind_is_evicted(self):
+        hub = live.Hub()
+        feed = hub.feeds[('demand', 'US48')] = live.Feed('demand', 'US48')
+        slow, fast = live.Subscriber(self.keys[:1], {}), live.Subscriber(self.keys[:1], {})
+        hub.subscribers = {slow, fast}
+        feed.subscribers = {slow, fast}
+        event = (('demand', 'US48'), '2026-01-01T00', 'event: demand\n')
+        hub._publish(feed, event)
+        fast.queue.get_nowait()
+        hub._publish(feed, event)
+        self.assertTrue(slow.closed)
+        self.assertEqual(feed.subscribers, {fast})
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_exposition(self):
+        metrics.count('fallbacks', kind='mock "congestion"')
+        metrics.observe('render', 0.3, template='demand.html')
+        text = metrics.exposition()
+        self.assertIn('# TYPE dashboard_fallbacks_total counter', text)
+        self.assertIn('dashboard_fallbacks_total{kind="mock \\"congestion\\""} 1', text)
+        self.assertIn('dashboard_render_seconds_bucket{template="demand.html",le="0.25"} 0', text)
+        self.assertIn('dashboard_render_seconds_bucket{template="demand.html",le="0.5"} 1', text)
+        self.assertIn('dashboard_render_seconds_bucket{template="demand.html",le="+Inf"} 1', text)
+
+    def test_responses_carry_server_timing(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^total;dur=[0-9.]+$')
+        self.assertIn('dashboard_request_seconds_count{method="GET",status="200",view="metrics"} 1',
+                      self.client.get('/metrics').content.decode())
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    @override_settings(EIA_BREAKER_FAILURES=1)
+    def test_breaker_state(self):
+        b = breaker.Breaker('rto/region-data')
+        b.failure()
+        self.assertIn('dashboard_breaker_state{endpoint="rto/region-data"} 2', metrics.exposition())
+        b.success()
+        self.assertIn('dashboard_breaker_state{endpoint="rto/region-data"} 0', metrics.exposition())
+
+    def test_failed_store_writes_are_counted(self):
+        def write(rows):
+            raise ValueError("disk full")
+
+        wanted = {'CISO': (eia.REGION_DATA_URL, sources.demand_params('key', 'CISO', 24), write)}
+        with mock.patch.object(caching, 'peek', return_value=None), mock.patch.object(caching, 'put'), \
+                mock.patch.object(planner, 'execute', return_value=({'CISO': [{'period': 'x'}]}, 1)), \
+                self.assertLogs('dashboard.sources', 'ERROR'):
+            self.assertEqual(sources.fetch_planned('key', wanted), {'CISO': [{'period': 'x'}]})
+        self.assertIn('dashboard_store_write_errors_total{endpoint="rto/region-data"} 1', metrics.exposition())
+
+    @override_settings(CACHES=LOCMEM)
+    def test_failed_snapshot_refreshes_are_counted(self):
+        cache.clear()
+
+        def build():
+            raise eia.EIAError("down")
+
+        with self.assertLogs('dashboard.snapshots', 'ERROR'):
+            Snapshot('test:failing', build).refresh_in_background()
+            # The refresh lock goes once the failure is recorded
+            for _ in range(200):
+                if cache.get('test:failing:refresh') is None:
+                    break
+                time.sleep(0.01)
+        self.assertIn('dashboard_refresh_errors_total{kind="snapshot"} 1', metrics.exposition())
+
+    @override_settings(LIVE_QUEUE_SIZE=1)
+    def test_live_evictions_are_counted(self):
+        hub = live.Hub()
+        feed = hub.feeds[('demand', 'US48')] = live.Feed('demand', 'US48')
+        subscriber = live.Subscriber([('demand', 'US48')], {})
+        hub.subscribers, feed.subscribers = {subscriber}, {subscriber}
+        event = (('demand', 'US48'), '2026-01-01T00', 'event: demand\n')
+        hub._publish(feed, event)
+        hub._publish(feed, event)
+        self.assertIn('dashboard_live_evictions_total{reason="slow"} 1', metrics.exposition())
+
+
+@override_settings(CACHES=LOCMEM, EIA_MAX_CONCURRENCY=1)
+class WarmupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for patcher in [mock.patch.object(concurrency, '_executor', None),
+                        mock.patch.object(capacity, 'refresh'), mock.patch.object(cube, 'refresh_if_changed')]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: concurrency._executor and concurrency._executor.shutdown(wait=False))
+
+    def ready(self):
+        return self.client.get('/ready/')
+
+    def test_boot_warm_up_holds_readiness_until_it_ends(self):
+        seen = []
+
+        def page():
+            # Pages fetch concurrently themselves; with a one-thread pool
+            # that must not deadlock
+            seen.append((warmup.is_blocking(warmup.status()), self.ready().status_code))
+            return run_concurrently({'rows': lambda: [1]})
+
+        calls = {'demand:US48': page, 'net_load:CISO': lambda: None}
+        with mock.patch.object(warmup, 'page_calls', return_value=calls):
+            results = warmup.warm('key', report=lambda message: None, boot=True)
+        self.assertEqual(seen, [(True, 503)])
+        self.assertIsInstance(results['net_load:CISO'], ValueError)
+        state = warmup.status()
+        self.assertEqual((state['state'], state['warmed'], state['failed']), ('warm', 3, ['net_load:CISO']))
+        self.assertEqual(self.ready().status_code, 200)
+
+    def test_is_blocking(self):
+        self.assertEqual(warmup.status(), {'state': 'cold'})
+        now = time.time()
+        self.assertTrue(warmup.is_blocking({'state': 'warming', 'boot': True, 'started_at': now}))
+        self.assertFalse(warmup.is_blocking({'state': 'warming', 'boot': False, 'started_at': now}))
+        self.assertFalse(warmup.is_blocking({'state': 'warming', 'boot': True, 'started_at': now - 10**6}))
+        self.assertFalse(warmup.is_blocking({'state': 'skipped', 'reason': 'off'}))
+
+    def test_another_hosts_warm_up_leaves_this_one_ready(self):
+        cache.set('warmup:status:other-host', {'state': 'warming', 'boot': True, 'started_at': time.time()})
+        response = self.ready()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['warmup'], {'state': 'cold'})
+        warmup.skip("WARMUP_ON_BOOT is off")
+        self.assertEqual(self.ready().json()['warmup']['state'], 'skipped')
+
+
+class ReplayTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.rows = [{'period': f'2026-01-01T0{h}', 'respondent': r, 'value': h}
+                     for h in range(3) for r in ['CISO', 'ERCO']]
+        params = {'api_key': 'secret', 'frequency': 'hourly', 'data[0]': 'value',
+                  'facets[respondent][]': ['CISO', 'ERCO'], 'sort[0][column]': 'period', 'length': 10}
+        with override_settings(EIA_RECORD_DIR=self.directory.name):
+            replay.record(eia.REGION_DATA_URL, params, {'response': {'total': '6', 'data': self.rows}})
+        self.params = params
+
+    def test_recordings_never_hold_the_key(self):
+        path, = os.listdir(self.directory.name)
+        self.assertTrue(path.startswith('electricity_rto_region-data_data-'))
+        with open(os.path.join(self.directory.name, path)) as f:
+            self.assertNotIn('secret', f.read())
+
+    def test_exact_and_pooled_answers(self):
+        recordings = replay.Recordings(self.directory.name)
+        name = replay.route(eia.REGION_DATA_URL)
+        exact = json.loads(recordings.answer(name, replay.query(self.params)))
+        self.assertEqual(exact['response']['data'], self.rows)
+
+        # Another facet mix, sort and page of the same endpoint and columns
+        other = {**self.params, 'facets[respondent][]': 'ERCO', 'sort[0][direction]': 'desc', 'length': 2}
+        pooled = json.loads(recordings.answer(name, replay.query(other)))
+        self.assertEqual(pooled['response']['total'], '3')
+        self.assertEqual([row['period'] for row in pooled['response']['data']], ['2026-01-01T02', '2026-01-01T01'])
+        self.assertIsNone(recordings.answer('electricity/rto/fuel-type-data/data', replay.query(self.params)))
+
+    def test_broken_recordings_are_skipped(self):
+        with open(os.path.join(self.directory.name, 'broken.json'), 'w') as f:
+            f.write('{"route": ')
+        with self.assertLogs('dashboard.replay', 'ERROR'):
+            self.assertEqual(len(replay.Recordings(self.directory.name)), 1)
+
+    def test_faults_repeat_with_the_seed(self):
+        runs = [replay.Faults(0.1, 0.05, 0.5, seed=7), replay.Faults(0.1, 0.05, 0.5, seed=7)]
+        draws = [[faults.draw() for _ in range(40)] for faults in runs]
+        self.assertEqual(draws[0], draws[1])
+        self.assertTrue(all(0.05 <= delay <= 0.15 for delay, _ in draws[0]))
+        self.assertEqual({fault for _, fault in draws[0]} - {None}, set(replay.FAULTS))
+
+    def test_server(self):
+        faults = replay.Faults()
+        server = replay.make_server(replay.Recordings(self.directory.name), faults, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        base = f'http://127.0.0.1:{server.server_address[1]}/v2'
+
+        response = httpx.get(f'{base}/electricity/rto/region-data/data', params=self.params)
+        self.assertEqual(response.json()['response']['data'], self.rows)
+        self.assertEqual(httpx.get(f'{base}/electricity/rto/fuel-type-data/data').status_code, 404)
+        faults.error_rate, faults.kinds = 1.0, ['429']
+        response = httpx.get(f'{base}/electricity/rto/region-data/data', params=self.params)
+        self.assertEqual((response.status_code, response.headers['Retry-After']), (429, '1'))
+
+
+class BenchmarkFixtureTests(SimpleTestCase):
+    def test_state_generation_rows_keep_to_real_years(self):
+        for n in [48, 10_000, 1_000_000]:
+            rows = benchmarks.state_generation_rows(n)
+            years = {int(row['period']) for row in rows}
+            self.assertLessEqual(n - len(rows), len(STATE_FUEL_TYPES) * benchmarks.MAX_YEARS)
+            self.assertGreaterEqual(min(years), benchmarks.BASE_YEAR)
+            self.assertLess(max(years), benchmarks.BASE_YEAR + benchmarks.MAX_YEARS)
+
+
+class PayloadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(payloads, '_versions', caching.LRUCache(16))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_q_values(self):
+        size = payloads.MIN_COMPRESS_SIZE
+        with mock.patch.object(payloads, 'brotli', None):
+            self.assertEqual(payloads.encoding_for('gzip, deflate, br', size), 'gzip')
+            self.assertIsNone(payloads.encoding_for('gzip;q=0', size))
+            self.assertIsNone(payloads.encoding_for('identity', size))
+            self.assertIsNone(payloads.encoding_for('*;q=0, identity', size))
+            self.assertEqual(payloads.encoding_for('*', size), 'gzip')
+            self.assertEqual(payloads.encoding_for('GZIP ; Q=0.5', size), 'gzip')
+            self.assertIsNone(payloads.encoding_for('gzip', size - 1))
+        with mock.patch.object(payloads, 'brotli', mock.Mock()):
+            self.assertEqual(payloads.encoding_for('gzip, br', size), 'br')
+            self.assertEqual(payloads.encoding_for('gzip, br;q=0', size), 'gzip')
+            self.assertEqual(payloads.encoding_for('gzip;q=1.0, br;q=0.5', size), 'gzip')
+            self.assertEqual(payloads.encoding_for('*, gzip;q=0', size), 'br')
+
+    def test_a_version_skips_serializing(self):
+        with mock.patch.object(payloads, 'dumps', wraps=payloads.dumps) as dumps:
+            first = payloads.payload({'a': 1}, 'v1', 60)
+            self.assertIs(payloads.payload({'a': 1}, 'v1', 60), first)
+            self.assertEqual(dumps.call_count, 1)
+            self.assertEqual(payloads.payload({'a': 2}, 'v2', 60).body, b'{"a":2}')
+            # Expired: serialized again
+            payloads.payload({'a': 1}, 'v3', 0)
+            payloads.payload({'a': 1}, 'v3', 0)
+            self.assertEqual(dumps.call_count, 4)
+
+    def test_api_polls_reuse_the_serialized_body(self):
+        periods = recent_periods(30)
+        store.upsert_demand([{'respondent': 'US48', 'period': p, 'value': 1000 + i} for i, p in enumerate(periods)])
+        with mock.patch.object(payloads, 'dumps', wraps=payloads.dumps) as dumps:
+            first = self.client.get('/api/v1/demand', HTTP_ACCEPT_ENCODING='gzip;q=0')
+            second = self.client.get('/api/v1/demand')
+        self.assertEqual(dumps.call_count, 1)
+        self.assertNotIn('Content-Encoding', first)
+        self.assertEqual(first.content, second.content)
+
+
+class LttbTests(SimpleTestCase):
+    def test_keeps_the_ends_and_the_budget(self):
+        keep = series.lttb(np.sin(np.linspace(0, 20, 1000)), 50)
+        self.assertEqual(len(keep), 50)
+        self.assertEqual((keep[0], keep[-1]), (0, 999))
+        self.assertTrue(np.all(np.diff(keep) > 0))
+
+    def test_keeps_a_spike(self):
+        values = np.zeros(1000)
+        values[437] = 100
+        self.assertIn(437, series.lttb(values, 20))
+
+    def test_never_picks_gaps(self):
+        values = np.arange(100, dtype=float)
+        values[10:30] = np.nan
+        keep = series.lttb(values, 10)
+        self.assertFalse(np.isnan(values[keep]).any())
+
+    def test_short_series_are_kept_whole(self):
+        self.assertEqual(series.lttb(np.array([1.0, np.nan, 3.0]), 10).tolist(), [0, 2])
+
+
+class RollupTests(TestCase):
+    def add_hours(self, hours, solar_days):
+        for h in range(hours):
+            period = f'2026-01-{1 + h // 24:02d}T{h % 24:02d}'
+            timestamp = store.parse_period(period)
+            RegionDemand.objects.create(respondent='CISO', period=period, timestamp=timestamp, value=100 + h)
+            if rollups.local_day(period).day in solar_days:
+                FuelTypeOutput.objects.create(
+                    respondent='CISO', fueltype='SUN', period=period, timestamp=timestamp, value=10,
+                )
+
+    def buckets(self, metric, grain):
+        return dict(Rollup.objects.filter(respondent='CISO', metric=metric, grain=grain)
+                    .values_list('bucket', 'count'))
+
+    def test_days_weeks_and_net_load(self):
+        self.add_hours(30, solar_days={1, 2})
+        rollups.refresh({'CISO': {date(2026, 1, 1), date(2026, 1, 2)}})
+        self.assertEqual(self.buckets('demand', 'day'), {date(2026, 1, 1): 24, date(2026, 1, 2): 6})
+        self.assertEqual(self.buckets('demand', 'week'), {date(2025, 12, 29): 30})
+        day = Rollup.objects.get(respondent='CISO', metric='net_load', grain='day', bucket=date(2026, 1, 1))
+        self.assertEqual((day.minimum, day.maximum), (90, 113))
+
+    def test_refresh_replaces_buckets(self):
+        self.add_hours(30, solar_days={1, 2})
+        rollups.refresh({'CISO': {date(2026, 1, 1), date(2026, 1, 2)}})
+        FuelTypeOutput.objects.filter(period__startswith='2026-01-02').delete()
+        rollups.refresh({'CISO': {date(2026, 1, 2)}})
+        self.assertEqual(self.buckets('net_load', 'day'), {date(2026, 1, 1): 24})
+        self.assertEqual(self.buckets('net_load', 'week'), {date(2025, 12, 29): 24})
+
+    def test_rollups_between_includes_the_partial_last_day(self):
+        self.add_hours(30, solar_days=set())
+        rollups.refresh({'CISO': {date(2026, 1, 1), date(2026, 1, 2)}})
+        start = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+        grouped = store.rollups_between('CISO', ['demand'], 'day', start, datetime(2026, 1, 2, 6, tzinfo=dt_timezone.utc))
+        self.assertEqual([r['bucket'] for r in grouped['demand']], [date(2026, 1, 1), date(2026, 1, 2)])
+        grouped = store.rollups_between('CISO', ['demand'], 'day', start, datetime(2026, 1, 2, tzinfo=dt_timezone.utc))
+        self.assertEqual([r['bucket'] for r in grouped['demand']], [date(2026, 1, 1)])
+
+    def test_grain_for(self):
+        self.assertIsNone(rollups.grain_for(48, 1000))
+        self.assertEqual(rollups.grain_for(24 * 365, 100), 'day')
+        self.assertEqual(rollups.grain_for(24 * 365 * 5, 100), 'week')
+
+
+@override_settings(EIA_BREAKER_FAILURES=2, EIA_BREAKER_COOLDOWN=60)
+class BreakerTests(SimpleTestCase):
+    def test_opens_after_consecutive_failures(self):
+        b = breaker.Breaker('test')
+        b.failure()
+        b.success()
+        b.failure()
+        self.assertEqual(b.state, breaker.CLOSED)
+        b.failure()
+        self.assertEqual(b.state, breaker.OPEN)
+        self.assertFalse(b.allow())
+
+    def test_half_open_lets_one_probe_through(self):
+        b = breaker.Breaker('test')
+        b.failure()
+        b.failure()
+        with override_settings(EIA_BREAKER_COOLDOWN=0):
+            self.assertTrue(b.allow())
+            self.assertFalse(b.allow())
+            self.assertEqual(b.state, breaker.HALF_OPEN)
+            b.failure()
+            self.assertEqual(b.state, breaker.OPEN)
+            self.assertTrue(b.allow())
+            b.success()
+        self.assertEqual(b.state, breaker.CLOSED)
+        self.assertTrue(b.allow())
+
+
+@override_settings(EIA_BREAKER_FAILURES=1, EIA_BREAKER_COOLDOWN=60)
+class UpstreamErrorTests(SimpleTestCase):
+    def test_a_payload_without_data_trips_the_breaker_and_is_not_recorded(self):
+        response = mock.Mock(**{'json.return_value': {'error': 'maintenance'}})
+        # An endpoint of its own, so the opened breaker stays out of the other tests
+        url = eia.REGION_DATA_URL.replace('region-data', 'invalid-payload')
+        self.addCleanup(breaker._breakers.pop, metrics.endpoint(url), None)
+        with mock.patch.object(eia, '_send', return_value=response), \
+                mock.patch.object(replay, 'record') as record:
+            with self.assertRaises(eia.EIAError):
+                eia.fetch_uncached(url, {})
+        record.assert_not_called()
+        self.assertEqual(breaker.get(metrics.endpoint(url)).state, breaker.OPEN)
+
+    stream_url = eia.REGION_DATA_URL.replace('region-data', 'streamed')
+
+    def stream(self, *chunks):
+        name = metrics.endpoint(self.stream_url)
+        breaker._breakers.pop(name, None)
+        self.addCleanup(breaker._breakers.pop, name, None)
+
+        def iter_content(chunk_size):
+            for chunk in chunks:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+
+        response = mock.Mock(iter_content=iter_content)
+        with mock.patch.object(eia, '_send', return_value=response):
+            try:
+                result = list(eia.stream_rows(self.stream_url, {}))
+            except eia.EIAError as e:
+                result = e
+        response.close.assert_called_once()
+        return result, breaker.get(name)
+
+    def test_a_stream_that_does_not_parse_trips_the_breaker(self):
+        bodies = {
+            'truncated': [b'{"response": {"data": [{"period": 1}, {"period": '],
+            'no data': [b'{"error": "maintenance"}'],
+            'not utf-8': [b'{"response": {"data": [{"name": "\xff"}]}}'],
+            'interrupted': [b'{"response": {"data": [', requests.ConnectionError("reset")],
+        }
+        for name, chunks in bodies.items():
+            with self.subTest(name):
+                result, circuit = self.stream(*chunks)
+                self.assertIsInstance(result, eia.EIAError)
+                self.assertEqual(circuit.state, breaker.OPEN)
+
+    def test_a_whole_stream_closes_the_breaker(self):
+        rows, circuit = self.stream(b'{"response": {"data": [{"period": 1}', b', {"period": 2}]}}')
+        self.assertEqual(rows, [{'period': 1}, {'period': 2}])
+        self.assertEqual((circuit.state, circuit.failures), (breaker.CLOSED, 0))
+
+    def test_sources_fall_back_when_the_shared_fetch_is_abandoned(self):
+        with mock.patch.object(eia, 'fetch_rows', side_effect=singleflight.Abandoned("interrupted")), \
+                mock.patch.object(sources, 'last_known_good', return_value=['held']):
+            self.assertEqual(sources._fetch(eia.REGION_DATA_URL, {}, None, lambda: None), ['held'])
+
+
+@override_settings(EIA_KEY_RATE=10, EIA_KEY_BURST=1)
+class SchedulerTests(SimpleTestCase):
+    def test_interactive_requests_go_first(self):
+        s = scheduler.Scheduler(['a'])
+        s.acquire(1)  # spend the burst
+        order = []
+
+        def request(name):
+            with scheduler.priority(name):
+                s.acquire(2)
+            order.append(name)
+
+        backfill = threading.Thread(target=request, args=('backfill',))
+        backfill.start()
+        time.sleep(0.02)
+        interactive = threading.Thread(target=request, args=('interactive',))
+        interactive.start()
+        backfill.join()
+        interactive.join()
+        self.assertEqual(order, ['interactive', 'backfill'])
+
+    def test_times_out_when_no_key_is_free(self):
+        s = scheduler.Scheduler(['a'])
+        s.acquire(1)
+        with self.assertRaises(scheduler.QueueTimeout):
+            s.acquire(0.01)
+
+    def test_spreads_requests_over_keys(self):
+        s = scheduler.Scheduler(['a', 'b'])
+        self.assertEqual({s.acquire(1), s.acquire(1)}, {'a', 'b'})
+
+    def test_429_halves_the_rate_and_successes_restore_it(self):
+        s = scheduler.Scheduler(['a'])
+        for _ in range(10):
+            s.report('a', 429, retry_after=0)
+        self.assertEqual(s.buckets[0].rate, 10 / 16)
+        for _ in range(40):
+            s.report('a', 200)
+        self.assertEqual(s.buckets[0].rate, 10)
+
+
+@override_settings(CACHES=LOCMEM, EIA_SINGLEFLIGHT_WAIT=1)
+class SingleflightTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_callers_share_one_fetch(self):
+        calls, release = [], threading.Event()
+
+        def fetch():
+            calls.append(1)
+            release.wait(2)
+            return 'rows'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            singleflight.do('test:key', fetch, lambda: (False, None)))) for _ in range(5)]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, ['rows'] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_followers_see_the_leaders_error(self):
+        release = threading.Event()
+
+        def fetch():
+            release.wait(2)
+            raise eia.EIAError("upstream failed")
+
+        errors = []
+
+        def call():
+            try:
+                singleflight.do('test:error', fetch, lambda: (False, None))
+            except eia.EIAError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(errors), 3)
+
+    def test_another_workers_fetch_serves_stale(self):
+        cache.add('test:busy:flight', 1)
+        fetch = mock.Mock()
+        self.assertEqual(singleflight.do('test:busy', fetch, lambda: (False, None), stale='old'), 'old')
+        fetch.assert_not_called()
+
+    def test_cancelling_the_async_leader_leaves_followers_their_result(self):
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return 'rows'
+
+        async def read_shared():
+            return False, None
+
+        async def main():
+            leader = asyncio.create_task(singleflight.ado('test:async', fetch, read_shared))
+            await asyncio.sleep(0.01)
+            follower = asyncio.create_task(singleflight.ado('test:async', fetch, read_shared))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return await follower
+
+        self.assertEqual(asyncio.run(main()), 'rows')
+        self.assertEqual(len(calls), 1)
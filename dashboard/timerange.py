@@ -0,0 +1,100 @@
+"""
+Time ranges for the hourly charts.
+
+Pages and API endpoints take either ``range=<preset>`` (ending at the
+current hour) or ``start=``/``end=`` as a date ('2024-05-01') or hourly
+period ('2024-05-01T13'), in UTC. Without them the charts keep their
+default window of the latest 24 or 48 hours.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+# Hour-aligned UTC datetimes; ``end`` is exclusive
+TimeRange = namedtuple('TimeRange', 'start end')
+
+PRESETS = {
+    '7d': ('7 Days', timedelta(days=7)),
+    '30d': ('30 Days', timedelta(days=30)),
+    '90d': ('90 Days', timedelta(days=90)),
+    '1y': ('1 Year', timedelta(days=365)),
+    '2y': ('2 Years', timedelta(days=730)),
+    '5y': ('5 Years', timedelta(days=1826)),
+}
+
+HOUR = timedelta(hours=1)
+
+
+def _parse_bound(text, name):
+    for fmt in ('%Y-%m-%dT%H', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(text, fmt).replace(tzinfo=dt_timezone.utc)
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid {name}: {text!r}")
+
+
+def _current_hour():
+    return timezone.now().replace(minute=0, second=0, microsecond=0) + HOUR
+
+
+def from_query(query):
+    """The TimeRange asked for in ``query`` (request.GET), or None for the default window.
+
+    Raises ValueError for an unknown preset, an unparseable bound, or a
+    range that is empty or longer than CHART_MAX_RANGE_DAYS.
+    """
+    preset = query.get('range')
+    start, end = query.get('start'), query.get('end')
+    if preset:
+        if preset not in PRESETS:
+            raise ValueError(f"Unknown range: {preset!r}")
+        end = _current_hour()
+        start = end - PRESETS[preset][1]
+    elif start or end:
+        end = _parse_bound(end, 'end') if end else _current_hour()
+        start = _parse_bound(start, 'start') if start else end - PRESETS['7d'][1]
+    else:
+        return None
+
+    if start >= end:
+        raise ValueError("start must be before end")
+    if end - start > timedelta(days=settings.CHART_MAX_RANGE_DAYS):
+        raise ValueError(f"Ranges are limited to {settings.CHART_MAX_RANGE_DAYS} days")
+    return TimeRange(start, end)
+
+
+def from_request(request):
+    """Like from_query(), but an invalid range falls back to the default window (for pages)."""
+    try:
+        return from_query(request.GET)
+    except ValueError:
+        return None
+
+
+def hours(time_range):
+    return int((time_range.end - time_range.start) / HOUR)
+
+
+def eia_bounds(time_range):
+    """``start``/``end`` for a local-hourly EIA query covering the range.
+
+    EIA filters local-hourly data on local time, so the bounds are padded a
+    day each way; contains() trims the extra rows afterwards.
+    """
+    return (
+        (time_range.start - timedelta(days=1)).strftime('%Y-%m-%dT%H'),
+        (time_range.end + timedelta(days=1)).strftime('%Y-%m-%dT%H'),
+    )
+
+
+def tail(time_range, hours):
+    """The last ``hours`` hours of ``time_range``."""
+    return TimeRange(max(time_range.start, time_range.end - hours * HOUR), time_range.end)
+
+
+def contains(time_range, timestamp):
+    return time_range.start <= timestamp < time_range.end
+
@@ -1,9 +1,31 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, live, metrics, views
+
+# Under ASGI the async page views keep a worker free while EIA calls are in flight
+if settings.DASHBOARD_ASYNC_VIEWS:
+    from . import async_views as page_views
+else:
+    page_views = views
 
 urlpatterns = [
-    path('', views.index, name='index'),
-    path('state/', views.state_analysis, name='state_analysis'),
-    path('net-load/', views.net_load_analysis, name='net_load_analysis'),
-    path('congestion/', views.congestion_proxy, name='congestion_proxy'),
+    path('', page_views.index, name='index'),
+    path('state/', page_views.state_analysis, name='state_analysis'),
+    path('state/national/', page_views.national_generation, name='national_generation'),
+    path('net-load/', page_views.net_load_analysis, name='net_load_analysis'),
+    path('net-load/overview/', page_views.net_load_overview, name='net_load_overview'),
+    path('congestion/', page_views.congestion_proxy, name='congestion_proxy'),
+
+    path('api/v1/demand', api.demand, name='api_demand'),
+    path('api/v1/state-generation', api.state_generation, name='api_state_generation'),
+    path('api/v1/state-generation/national', api.national_generation, name='api_national_generation'),
+    path('api/v1/net-load', api.net_load, name='api_net_load'),
+    path('api/v1/net-load/overview', api.net_load_overview, name='api_net_load_overview'),
+    path('api/v1/congestion', api.congestion, name='api_congestion'),
+    path('api/v1/congestion/profile', api.congestion_profile, name='api_congestion_profile'),
+    path('api/v1/stats', api.stats, name='api_stats'),
+    path('api/v1/stream', live.stream, name='api_stream'),
+
+    path('metrics', metrics.metrics_view, name='metrics'),
+    path('ready/', api.ready, name='ready'),
 ]
@@ -1,413 +1,361 @@
+import logging
 import os
-import requests
-from django.shortcuts import render
-from datetime import datetime
+from django.conf import settings
 
-def get_state_generation(api_key, state_code):
-    base_url = "https://api.eia.gov/v2/electricity/electric-power-operational-data/data"
-    
-    fuel_types = {
-        'WND': 'Wind',
-        'SUN': 'Solar',
-        'NG': 'Natural Gas', 
-        'COW': 'Coal',
-        'NUC': 'Nuclear'
+from . import capacity, cube, metrics, profiles, series, sources, timerange
+from .concurrency import run_concurrently
+from .metrics import render
+from .regions import (
+    ALL_STATES, CONGESTION_REGIONS, NET_LOAD_REGIONS, REGION_TO_STATE, STATE_FUEL_TYPES,
+)
+
+logger = logging.getLogger(__name__)
+
+# The process_* functions below turn raw EIA rows into chart data. They do
+# no I/O, so the sync views here and the async views in async_views.py share
+# them and differ only in how the rows are fetched.
+
+def state_generation_chart(sorted_years, totals):
+    fuel_types = STATE_FUEL_TYPES
+    chart_data = {'years': sorted_years, 'datasets': []}
+
+    colors = {
+        'Wind': '#4bc0c0', 'Solar': '#ffcd56',
+        'Natural Gas': '#ff6384', 'Coal': '#36a2eb', 'Nuclear': '#9966ff'
     }
-    
+
+    for code, fuel in fuel_types.items():
+        data_series = totals[code]
+        chart_data['datasets'].append({
+            'label': fuel,
+            'data': data_series,
+            'borderColor': colors.get(fuel, '#ccc'),
+            'backgroundColor': colors.get(fuel, '#ccc')
+        })
+    return chart_data
+
+@metrics.timed_step
+def process_state_generation(raw_data):
+    sorted_years, totals = series.annual_totals(raw_data, 'generation', 'fueltypeid', list(STATE_FUEL_TYPES))
+    return state_generation_chart(sorted_years, totals)
+
+def cube_state_generation(api_key, state_code):
+    # A slice of the all-states cube; None (and a rebuild) if it isn't built yet
+    data = cube.current_cube(api_key)
+    if data is None:
+        return None
+    totals = cube.state_totals(state_code, data)
+    return state_generation_chart(*totals) if totals else None
+
+def get_state_generation(api_key, state_code):
     if not api_key:
         return None
 
-    params = {
-        'api_key': api_key,
-        'frequency': 'annual',
-        'data[0]': 'generation',
-        'facets[location][]': state_code,
-        'facets[sectorid][]': '99', 
-        'facets[fueltypeid][]': list(fuel_types.keys()), 
-        'sort[0][column]': 'period',
-        'sort[0][direction]': 'asc',
-    }
-    
     try:
-
-            
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()
-        payload = response.json()
-        
-        if 'response' in payload and 'data' in payload['response']:
-            raw_data = payload['response']['data']
-            
-            processed = {}  
-            
-            for entry in raw_data:
-                year = entry.get('period')
-                fuel_code = entry.get('fueltypeid')
-                try:
-                    val = float(entry.get('generation', 0) or 0)
-                except (ValueError, TypeError):
-                    val = 0
-                
-                if year not in processed:
-                    processed[year] = {k: 0 for k in fuel_types.values()}
-                
-                fuel_label = fuel_types.get(fuel_code)
-                if fuel_label:
-                    processed[year][fuel_label] += val 
-            
-            sorted_years = sorted(processed.keys())
-            chart_data = {'years': sorted_years, 'datasets': []}
-            
-            colors = {
-                'Wind': '#4bc0c0', 'Solar': '#ffcd56', 
-                'Natural Gas': '#ff6384', 'Coal': '#36a2eb', 'Nuclear': '#9966ff'
-            }
-            
-            for fuel in fuel_types.values():
-                data_series = [processed[y].get(fuel, 0) for y in sorted_years]
-                chart_data['datasets'].append({
-                    'label': fuel,
-                    'data': data_series,
-                    'borderColor': colors.get(fuel, '#ccc'),
-                    'backgroundColor': colors.get(fuel, '#ccc')
-                })
+        chart_data = cube_state_generation(api_key, state_code)
+        if chart_data is not None:
             return chart_data
+        raw_data = sources.generation_rows(api_key, state_code, list(STATE_FUEL_TYPES.keys()))
+        return process_state_generation(raw_data)
     except Exception as e:
-        print(f"State Data Error: {e}")
+        logger.error("State Data Error: %s", e)
         return None
-    return None
+
+NATIONAL_SORTS = {**cube.METRICS, **{code: f"{fuel} Share (%)" for code, fuel in STATE_FUEL_TYPES.items()}}
+
+def get_national_generation(api_key, year=None, sort='renewable_share'):
+    # Rankings are slices of the cube; a missing or old cube is rebuilt in the background
+    data = cube.current_cube(api_key)
+    if data is None:
+        return None
+    year, ranked = cube.rankings(data, year, sort)
+    return {'year': year, 'years': data['years'], 'sort': sort, 'rankings': ranked}
+
+def national_generation_context(national, sort):
+    return {
+        'national': national,
+        'sort': sort,
+        'sort_label': NATIONAL_SORTS[sort],
+        'sorts': NATIONAL_SORTS,
+        'fuels': STATE_FUEL_TYPES,
+    }
+
+def national_generation(request):
+    api_key = os.getenv('EIA_API_KEY')
+    sort = request.GET.get('sort', 'renewable_share')
+    if sort not in NATIONAL_SORTS:
+        sort = 'renewable_share'
+    national = get_national_generation(api_key, request.GET.get('year'), sort)
+    return render(request, 'dashboard/national_generation.html', national_generation_context(national, sort))
+
+@metrics.timed_step
+def process_demand(data_rto):
+    # Rows arrive newest first
+    demand_context = {'periods': [], 'labels': [], 'data': []}
+    for entry in reversed(data_rto):
+        p_str = entry.get('period', '')
+        label = p_str.split('T')[1] + ":00" if 'T' in p_str else p_str
+        demand_context['periods'].append(p_str)
+        demand_context['labels'].append(label)
+        demand_context['data'].append(entry.get('value', 0))
+    return demand_context
+
+@metrics.timed_step
+def process_demand_range(rows):
+    # Every hour of the range, thinned to the chart's point budget
+    periods, values = series.demand(rows)
+    demand_context = {'grain': 'hour', 'periods': periods, 'labels': series.range_labels(periods), 'data': values}
+    return series.downsample(demand_context, 'data', ['periods', 'labels', 'data'], settings.CHART_POINT_BUDGET)
+
+@metrics.timed_step
+def process_demand_rollups(grain, grouped):
+    # Mean hourly demand per day, week or month
+    periods, columns = series.rollup_columns(grouped, 'demand')
+    demand_context = {'grain': grain, 'periods': periods, 'labels': periods, 'data': columns['demand']}
+    return series.downsample(demand_context, 'data', ['periods', 'labels', 'data'], settings.CHART_POINT_BUDGET)
+
+def demand_context_for(api_key, respondent, time_range):
+    if time_range is None:
+        # Last 24 records of hourly demand
+        return process_demand(sources.demand_rows(api_key, respondent, 24))
+    grain, grouped = sources.rollups_between(respondent, ['demand'], time_range, settings.CHART_POINT_BUDGET)
+    if grain:
+        return process_demand_rollups(grain, grouped)
+    return process_demand_range(sources.demand_rows_between(api_key, respondent, time_range))
+
+def range_context(request, time_range, default_label):
+    # Shared by the pages with a range picker
+    return {
+        'ranges': {code: label for code, (label, _) in timerange.PRESETS.items()},
+        'selected_range': request.GET.get('range', '') if time_range else '',
+        'custom_range': time_range is not None and not request.GET.get('range'),
+        'default_range_label': default_label,
+        'time_range': time_range,
+        # The default window follows new hours over the SSE feed (ASGI only)
+        'live_updates': settings.DASHBOARD_ASYNC_VIEWS and time_range is None,
+    }
+
+def index_context(demand_context, error_msg):
+    return {
+        'periods': demand_context.get('periods', []),
+        'labels': demand_context['labels'],
+        'data': demand_context['data'],
+        'error': error_msg
+    }
 
 def index(request):
     api_key = os.getenv('EIA_API_KEY')
-    
+
     # --- 1. Real-time US Demand ---
     demand_context = {'labels': [], 'data': []}
     error_msg = None
-    
+
+    time_range = timerange.from_request(request)
     try:
-        # Fetch last 24 records of US Hourly Demand
-        base_url_rto = "https://api.eia.gov/v2/electricity/rto/region-data/data"
-        params_rto = {
-            'api_key': api_key,
-            'frequency': 'local-hourly',
-            'data[0]': 'value',
-            'facets[respondent][]': 'US48',
-            'sort[0][column]': 'period',
-            'sort[0][direction]': 'desc',
-            'length': 24
-        }
-        res_rto = requests.get(base_url_rto, params=params_rto)
-        res_rto.raise_for_status()
-        
-        json_resp = res_rto.json()
-        if 'response' in json_resp and 'data' in json_resp['response']:
-             data_rto = json_resp['response']['data']
-             data_rto.reverse()
-             for entry in data_rto:
-                p_str = entry.get('period', '')
-                label = p_str.split('T')[1] + ":00" if 'T' in p_str else p_str
-                demand_context['labels'].append(label)
-                demand_context['data'].append(entry.get('value', 0))
-        else:
-            error_msg = "API response format unexpected."
-            
+        demand_context = demand_context_for(api_key, 'US48', time_range)
     except Exception as e:
         error_msg = f"US Demand Data unavailable: {str(e)}"
-        
-    context = {
-        'labels': demand_context['labels'],
-        'data': demand_context['data'],
-        'error': error_msg
-    }
 
+    context = index_context(demand_context, error_msg)
+    context.update(range_context(request, time_range, 'Last 24 Hours'))
     return render(request, 'dashboard/index.html', context)
 
+def state_analysis_context(selected_state, state_chart_data):
+    return {
+        'state_data': state_chart_data,
+        'selected_state': selected_state,
+        'all_states': ALL_STATES,
+    }
+
 def state_analysis(request):
     api_key = os.getenv('EIA_API_KEY')
     selected_state = request.GET.get('state', 'TX')
     state_chart_data = get_state_generation(api_key, selected_state)
-    
-    all_states = [
-        'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'FL', 'GA', 
-        'HI', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MD', 
-        'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ', 
-        'NM', 'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC', 
-        'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY'
-    ]
-
-    context = {
-        'state_data': state_chart_data,
-        'selected_state': selected_state,
-        'all_states': all_states,
+    return render(request, 'dashboard/state_analysis.html', state_analysis_context(selected_state, state_chart_data))
+
+@metrics.timed_step
+def process_net_load(demand_data, fuel_data):
+    # Align demand with wind and solar on an hourly grid; hours missing from
+    # a series come back as None so the chart shows a gap
+    return series.net_load(demand_data, fuel_data)
+
+def net_load_calls(api_key, region_code, fetch=sources):
+    # 1. Gross Demand (last 48 hours for a good curve) and
+    # 2. Renewables (Wind + Solar). Fetch more fuel rows to ensure we cover
+    # the same time range for both fuels.
+    return {
+        'demand': lambda: fetch.demand_rows(api_key, region_code, 48),
+        'fuel': lambda: fetch.fuel_rows(api_key, region_code, ['WND', 'SUN'], 100),
     }
-    return render(request, 'dashboard/state_analysis.html', context)
 
-def get_net_load_data(api_key, region_code):
-    # Endpoints
-    url_demand = "https://api.eia.gov/v2/electricity/rto/region-data/data"
-    url_fuel = "https://api.eia.gov/v2/electricity/rto/fuel-type-data/data"
-    
-    if not api_key:
-        return None
+def net_load_range_calls(api_key, region_code, time_range, fetch=sources):
+    # Every hour of the range for both series
+    return {
+        'demand': lambda: fetch.demand_rows_between(api_key, region_code, time_range),
+        'fuel': lambda: fetch.fuel_rows_between(api_key, region_code, ['WND', 'SUN'], time_range),
+    }
+
+@metrics.timed_step
+def downsample_net_load(chart_data):
+    # Long ranges: date labels, and net load drives which points are kept
+    chart_data = {'grain': 'hour', **chart_data, 'labels': series.range_labels(chart_data['periods'])}
+    columns = ['periods', 'labels', 'gross_demand', 'net_load', 'solar', 'wind']
+    return series.downsample(chart_data, 'net_load', columns, settings.CHART_POINT_BUDGET)
 
-    # 1. Fetch Gross Demand
-    params_demand = {
-        'api_key': api_key,
-        'frequency': 'local-hourly',
-        'data[0]': 'value',
-        'facets[respondent][]': region_code,
-        'sort[0][column]': 'period',
-        'sort[0][direction]': 'desc',
-        'length': 48 # Last 48 hours for a good curve
+@metrics.timed_step
+def process_net_load_rollups(grain, grouped):
+    # Mean hourly values per day, week or month
+    periods, columns = series.rollup_columns(grouped, 'net_load')
+    chart_data = {
+        'grain': grain,
+        'periods': periods,
+        'labels': periods,
+        'gross_demand': columns['demand'],
+        'net_load': columns['net_load'],
+        'solar': columns['SUN'],
+        'wind': columns['WND'],
     }
-    
-    try:
-        r_demand = requests.get(url_demand, params=params_demand)
-        r_demand.raise_for_status()
-        demand_data = r_demand.json().get('response', {}).get('data', [])
-    except Exception as e:
-        print(f"Net Load Demand Error: {e}")
+    columns = ['periods', 'labels', 'gross_demand', 'net_load', 'solar', 'wind']
+    return series.downsample(chart_data, 'net_load', columns, settings.CHART_POINT_BUDGET)
+
+def net_load_from_results(results):
+    demand_data = results['demand']
+    if isinstance(demand_data, Exception):
+        logger.error("Net Load Demand Error: %s", demand_data)
         return None
 
-    # 2. Fetch Renewables (Wind + Solar)
-    params_fuel = {
-        'api_key': api_key,
-        'frequency': 'local-hourly',
-        'data[0]': 'value',
-        'facets[respondent][]': region_code,
-        'facets[fueltype][]': ['WND', 'SUN'],
-        'sort[0][column]': 'period',
-        'sort[0][direction]': 'desc',
-        'length': 100 # Fetch more to ensure we cover the same time range for both fuels
-    }
-    
-    try:
-        r_fuel = requests.get(url_fuel, params=params_fuel)
-        r_fuel.raise_for_status()
-        fuel_data = r_fuel.json().get('response', {}).get('data', [])
-    except Exception as e:
-        print(f"Net Load Fuel Error: {e}")
+    fuel_data = results['fuel']
+    if isinstance(fuel_data, Exception):
+        logger.error("Net Load Fuel Error: %s", fuel_data)
         return None
 
     # 3. Process & Align Data
-    # Map: 'YYYY-MM-DDTHH' -> {'demand': X, 'wind': Y, 'solar': Z}
-    combined = {}
-    
-    # Process Demand
-    for d in demand_data:
-        p = d.get('period')
-        if p not in combined: combined[p] = {'demand': 0, 'solar': 0, 'wind': 0}
-        combined[p]['demand'] = float(d.get('value', 0) or 0)
-        combined[p]['ts'] = d.get('period') # Keep timestamp for sorting
-
-    # Process Renewables
-    for f in fuel_data:
-        p = f.get('period')
-        ft = f.get('fueltype')
-        val = float(f.get('value', 0) or 0)
-        
-        if p in combined:
-            if ft == 'SUN': combined[p]['solar'] += val
-            if ft == 'WND': combined[p]['wind'] += val
-
-    # Validate we have complete data points (demand + at least one fuel potentially)
-    # Sort by time ascending
-    sorted_periods = sorted(combined.keys())
-    
-    labels = []
-    dataset_demand = []
-    dataset_net = []
-    dataset_solar = []
-    dataset_wind = []
-    
-    for p in sorted_periods:
-        data = combined[p]
-        # Clean label (remove date if redundant, but keep for now)
-        label = p.split('T')[1] + ":00" if 'T' in p else p
-        
-        demand = data['demand']
-        solar = data['solar']
-        wind = data['wind']
-        net_load = demand - (solar + wind)
-        
-        labels.append(label)
-        dataset_demand.append(demand)
-        dataset_net.append(net_load)
-        dataset_solar.append(solar)
-        dataset_wind.append(wind)
+    return process_net_load(demand_data, fuel_data)
 
-    return {
-        'labels': labels,
-        'gross_demand': dataset_demand,
-        'net_load': dataset_net,
-        'solar': dataset_solar,
-        'wind': dataset_wind
-    }
+def get_net_load_data(api_key, region_code, time_range=None):
+    if not api_key:
+        return None
 
-def net_load_analysis(request):
-    api_key = os.getenv('EIA_API_KEY')
-    selected_region = request.GET.get('region', 'CISO') # Default to CAISO (California)
-    
+    # Demand and renewables are independent; fetch them side by side
+    if time_range is None:
+        return net_load_from_results(run_concurrently(net_load_calls(api_key, region_code)))
+    grain, grouped = sources.rollups_between(
+        region_code, ['net_load', 'demand', 'SUN', 'WND'], time_range, settings.CHART_POINT_BUDGET,
+    )
+    if grain:
+        return process_net_load_rollups(grain, grouped)
+    chart_data = net_load_from_results(run_concurrently(net_load_range_calls(api_key, region_code, time_range)))
+    return downsample_net_load(chart_data) if chart_data else None
+
+@metrics.timed_step
+def process_net_load_overview(demand_by_region, fuel_by_region):
+    # Small multiples: one chart plus headline figures per region
+    overview = []
+    for code, name in NET_LOAD_REGIONS.items():
+        chart = net_load_from_results({'demand': demand_by_region[code], 'fuel': fuel_by_region[code]})
+        overview.append({
+            'code': code,
+            'name': name,
+            'chart': chart,
+            'summary': series.net_load_summary(chart) if chart else None,
+        })
+    return overview
+
+def get_net_load_overview(api_key):
+    if not api_key:
+        return None
+
+    # Every region's demand in one merged request and every region's wind
+    # and solar in another (for whatever the store can't answer), side by side
+    regions = list(NET_LOAD_REGIONS)
+    results = run_concurrently({
+        'demand': lambda: sources.demand_rows_many(api_key, regions, 48),
+        'fuel': lambda: sources.fuel_rows_many(api_key, regions, ['WND', 'SUN'], 100),
+    })
+    for name, result in results.items():
+        if isinstance(result, Exception):
+            logger.error("Net Load Overview Error (%s): %s", name, result)
+            return None
+    return process_net_load_overview(results['demand'], results['fuel'])
+
+def net_load_context(selected_region, chart_data):
     # Region Map
-    regions = {
-        'CISO': 'CAISO (California)',
-        'ERCO': 'ERCOT (Texas)',
-        'PJM': 'PJM (East/Mid-Atlantic)',
-        'MISO': 'MISO (Midwest)',
-        'NYIS': 'NYISO (New York)',
-        'ISNE': 'ISO-NE (New England)'
-    }
-    
-    chart_data = get_net_load_data(api_key, selected_region)
-    
-    context = {
+    regions = NET_LOAD_REGIONS
+    return {
         'chart_data': chart_data,
         'selected_region': selected_region,
         'selected_region_name': regions.get(selected_region, selected_region),
         'all_regions': regions,
     }
+
+def net_load_analysis(request):
+    api_key = os.getenv('EIA_API_KEY')
+    selected_region = request.GET.get('region', 'CISO') # Default to CAISO (California)
+    time_range = timerange.from_request(request)
+    chart_data = get_net_load_data(api_key, selected_region, time_range)
+    context = net_load_context(selected_region, chart_data)
+    context.update(range_context(request, time_range, 'Last 48 Hours'))
     return render(request, 'dashboard/net_load.html', context)
 
 
-def get_congestion_data(api_key, region_code):
-    # Mapping Region (Real-time Demand) -> Representative State (Capacity)
-    region_to_state = {
-        'CISO': 'CA', 
-        'ERCO': 'TX', 
-        'NYIS': 'NY', 
-        'ISNE': 'MA', 
-        'PJM': 'PA',  
-        'MISO': 'IL'  
-    }
-    
-    state_code = region_to_state.get(region_code, 'TX')
-    
-    if not api_key:
-        return None
+def net_load_overview(request):
+    api_key = os.getenv('EIA_API_KEY')
+    overview = get_net_load_overview(api_key)
+    return render(request, 'dashboard/net_load_overview.html', {'overview': overview})
 
-    # 1. Fetch Total Nameplate Capacity for State (Annual)
-    # 400 Error indicates bad params. Let's try simpler params.
-    # The 'nameplate-capacity-mw' might be separate from 'generation'.
-    # Actually, for 'electric-power-operational-data', the columns are specific.
-    # Let's try 5 years window.
-    cap_url = "https://api.eia.gov/v2/electricity/electric-power-operational-data/data"
-    
-    # We will try to fetch 'nameplate-capacity-mw' again but ensuring params are correct.
-    # If this fails, we will fallback to a hardcoded 'safe' recently known capacity or just 0.
-    cap_params = {
-        'api_key': api_key,
-        'frequency': 'annual',
-        'data[0]': 'nameplate-capacity-mw',
-        'facets[location][]': state_code,
-        'sort[0][column]': 'period',
-        'sort[0][direction]': 'desc',
-        'length': 500 # Fetch more to scan for valid years
-    }
-    
-    total_capacity = 0
-    try:
-        r_cap = requests.get(cap_url, params=cap_params)
-        
-        # If 400, it might be the 'data' param. Let's try a safe fallback
-        if r_cap.status_code != 200:
-             print(f"Capacity API Error {r_cap.status_code}: {r_cap.text}")
-        else:
-            cap_data = r_cap.json().get('response', {}).get('data', [])
-            
-            if cap_data:
-                # Find the most recent year with 'ALL' fuel type (Total)
-                for entry in cap_data:
-                    # Looking for total. Usually sector '99' and fuel 'ALL'
-                    if entry.get('sectorid') == '99' and entry.get('fueltypeid') == 'ALL':
-                         val = float(entry.get('nameplate-capacity-mw', 0) or 0)
-                         if val > 0:
-                             total_capacity = val
-                             break
-                
-                # If still 0, try summing up major fuels for the latest available year
-                if total_capacity == 0 and cap_data:
-                    latest_year = cap_data[0].get('period')
-                    running_sum = 0
-                    for entry in cap_data:
-                        if entry.get('period') == latest_year and entry.get('sectorid') == '99':
-                             # Sum anything that matches known major fuels if 'ALL' is missing
-                            ft = entry.get('fueltypeid')
-                            if ft in ['WND', 'SUN', 'NG', 'COW', 'NUC', 'HYC']:
-                                running_sum += float(entry.get('nameplate-capacity-mw', 0) or 0)
-                    if running_sum > 0:
-                        total_capacity = running_sum
 
-    except Exception as e:
-        print(f"Capacity Fetch Exception: {e}")
+def congestion_state(region_code):
+    # Mapping Region (Real-time Demand) -> Representative State (Capacity)
+    return REGION_TO_STATE.get(region_code, 'TX')
 
+def default_capacity(state_code):
     # Fallback if API fails hard: Approximate capacities (GW) to prevent broken page
     # These are ROUGH estimates for 2023 just to show *something*
-    if total_capacity == 0:
-        defaults = {
-            'TX': 140000, 
-            'CA': 90000,
-            'NY': 40000,
-            'MA': 15000,
-            'PA': 45000,
-            'IL': 45000
-        }
-        total_capacity = defaults.get(state_code, 10000)
-
-    # 2. Fetch Hourly Demand
-    demand_url = "https://api.eia.gov/v2/electricity/rto/region-data/data"
-    demand_params = {
-        'api_key': api_key,
-        'frequency': 'local-hourly',
-        'data[0]': 'value',
-        'facets[respondent][]': region_code,
-        'sort[0][column]': 'period',
-        'sort[0][direction]': 'desc',
-        'length': 48
+    defaults = {
+        'TX': 140000,
+        'CA': 90000,
+        'NY': 40000,
+        'MA': 15000,
+        'PA': 45000,
+        'IL': 45000
     }
+    return defaults.get(state_code, 10000)
 
+@metrics.timed_step
+def process_congestion(state_code, total_capacity, demand_data, time_range=None):
     processed_data = []
-    
-    try:
-        r_dem = requests.get(demand_url, params=demand_params)
-        r_dem.raise_for_status()
-        demand_data = r_dem.json().get('response', {}).get('data', [])
-        
-        demand_data.sort(key=lambda x: x.get('period'))
-        
-        for d in demand_data:
-            period = d.get('period')
-            hour_label = period.split('T')[1] + ":00" if 'T' in period else period
-            day_label = period.split('T')[0] if 'T' in period else ""
-            
-            demand_val = float(d.get('value', 0) or 0)
-            utilization = (demand_val / total_capacity) * 100 if total_capacity > 0 else 0
-            
-            processed_data.append({
-                'period': period,
-                'day': day_label,
-                'hour': hour_label,
-                'demand': int(demand_val),
-                'capacity': int(total_capacity),
-                'utilization': round(utilization, 1),
-                'is_high': utilization > 85 
-            })
-            
-    except Exception as e:
-        print(f"Demand Fetch Error: {e}")
-        return None
-        
+
+    periods, demand, utilization = series.utilization(demand_data, total_capacity)
+    labels = series.range_labels(periods) if time_range else series.hour_labels(periods)
+    for period, label, demand_val, util in zip(periods, labels, demand.tolist(), utilization.tolist()):
+        hour_label = period.split('T')[1] + ":00" if 'T' in period else period
+        day_label = period.split('T')[0] if 'T' in period else ""
+
+        processed_data.append({
+            'period': period,
+            'label': label,
+            'day': day_label,
+            'hour': hour_label,
+            'demand': int(demand_val),
+            'capacity': int(total_capacity),
+            'utilization': round(util, 1),
+            'is_high': util > 85
+        })
+
     # Fallback: If no hourly data (API failure or empty), generate Mock Data so the UI doesn't break
     if not processed_data:
-        print("WARNING: Generating Mock Data for Congestion Page")
+        logger.warning("Generating Mock Data for Congestion Page")
+        metrics.count('fallbacks', kind='mock_congestion')
         for i in range(24):
             hour_val = i
             period = f"2023-01-01T{hour_val:02d}"
             mock_demand = total_capacity * 0.6  # 60% utilization baseline
             if 14 <= i <= 20: mock_demand = total_capacity * 0.88 # Peak hours
-            
+
             util = (mock_demand / total_capacity) * 100
             processed_data.append({
                 'period': period,
+                'label': f"{hour_val:02d}:00",
                 'day': 'MockDay',
                 'hour': f"{hour_val:02d}:00",
                 'demand': int(mock_demand),
@@ -416,36 +364,140 @@ def get_congestion_data(api_key, region_code):
                 'is_high': util > 85
             })
 
-    return {
-        'state_name': state_code, 
+    # The heatmap shows the latest 48 hours at full resolution; on long
+    # ranges the chart keeps the budgeted points that best preserve its shape
+    heatmap_data = processed_data[-48:]
+    if time_range and len(processed_data) > settings.CHART_POINT_BUDGET:
+        keep = series.lttb(utilization, settings.CHART_POINT_BUDGET).tolist()
+        processed_data = [processed_data[i] for i in keep]
+
+    congestion_data = {
+        'state_name': state_code,
         'capacity_mw': int(total_capacity),
-        'hourly_data': processed_data
+        'hourly_data': processed_data,
+        'heatmap_data': heatmap_data,
     }
+    if time_range:
+        congestion_data['grain'] = 'hour'
+    return congestion_data
 
-def congestion_proxy(request):
-    api_key = os.getenv('EIA_API_KEY')
+@metrics.timed_step
+def congestion_rollup_points(total_capacity, grouped):
+    # One point per day, week or month, at its peak hour
+    points = []
+    for row in grouped['demand']:
+        util = row['maximum'] / total_capacity * 100 if total_capacity > 0 else 0
+        bucket = row['bucket'].isoformat()
+        points.append({
+            'period': bucket,
+            'label': bucket,
+            'day': bucket,
+            'hour': row['peak_period'][11:13] + ":00",
+            'demand': int(row['maximum']),
+            'capacity': int(total_capacity),
+            'utilization': round(util, 1),
+            'is_high': util > 85
+        })
+    if len(points) > settings.CHART_POINT_BUDGET:
+        utilization = series.to_floats([p['utilization'] for p in points])
+        points = [points[i] for i in series.lttb(utilization, settings.CHART_POINT_BUDGET).tolist()]
+    return points
+
+def congestion_capacity(api_key, region_code):
+    # Total nameplate capacity comes from the precomputed index. Until it has
+    # been built we fall back to a hardcoded 'safe' recently known capacity.
+    state_code = congestion_state(region_code)
+    entry = capacity.for_state(state_code, api_key)
+    if entry is not None:
+        return entry['total_mw']
+    metrics.count('fallbacks', kind='default_capacity')
+    return default_capacity(state_code)
+
+def congestion_from_results(region_code, total_capacity, demand_data, time_range=None):
+    try:
+        if isinstance(demand_data, Exception):
+            raise demand_data
+        return process_congestion(congestion_state(region_code), total_capacity, demand_data, time_range)
+    except Exception as e:
+        logger.error("Demand Fetch Error: %s", e)
+        return None
+
+def get_congestion_data(api_key, region_code, time_range=None):
+    if not api_key:
+        return None
+
+    total_capacity = congestion_capacity(api_key, region_code)
+    if time_range is not None:
+        grain, grouped = sources.rollups_between(region_code, ['demand'], time_range, settings.CHART_POINT_BUDGET)
+        if grain:
+            # Rollups for the chart; the heatmap still shows the last 48 hours
+            congestion_data = get_congestion_data(api_key, region_code, timerange.tail(time_range, 48))
+            if congestion_data is not None:
+                congestion_data['grain'] = grain
+                congestion_data['hourly_data'] = congestion_rollup_points(total_capacity, grouped)
+            return congestion_data
+    try:
+        if time_range is None:
+            demand_data = sources.demand_rows(api_key, region_code, 48)
+        else:
+            demand_data = sources.demand_rows_between(api_key, region_code, time_range)
+    except Exception as e:
+        demand_data = e
+    return congestion_from_results(region_code, total_capacity, demand_data, time_range)
+
+def get_congestion_profile(api_key, region_code, layout):
+    # Utilization by hour of day over all stored history: a fixed 168 or 288
+    # cells read from the running profiles, however long that history is
+    total_capacity = congestion_capacity(api_key, region_code)
+    return profiles.heatmap(region_code, layout, total_capacity)
+
+HEATMAP_MODES = {
+    'recent': 'Recent Hours',
+    'weekday': 'Hour × Weekday',
+    'month': 'Hour × Month',
+}
+
+def heatmap_mode(request):
+    mode = request.GET.get('heatmap', 'recent')
+    return mode if mode in HEATMAP_MODES else 'recent'
+
+def congestion_region(request):
     selected_region = request.GET.get('region', 'ERCO')
-    
-    regions = {
-        'CISO': 'CAISO (California)',
-        'ERCO': 'ERCOT (Texas)',
-        'NYIS': 'NYISO (New York)',
-        'PJM': 'PJM (East)',
-        'MISO': 'MISO (Central)'
-    }
-    
     # Simple logic for now: if user asks for valid region, use it
-    if selected_region not in regions:
+    if selected_region not in CONGESTION_REGIONS:
         selected_region = 'ERCO'
+    return selected_region
+
+def congestion_chart(data):
+    # The line chart's series as one columnar blob for the page to inline
+    if data is None:
+        return None
+    hourly = data['hourly_data']
+    return {
+        'labels': [h['label'] for h in hourly],
+        'demand': [h['demand'] for h in hourly],
+        'capacity_mw': data['capacity_mw'],
+    }
 
-    data = get_congestion_data(api_key, selected_region)
-    
-    context = {
+def congestion_context(selected_region, data):
+    regions = CONGESTION_REGIONS
+    return {
         'congestion_data': data,
+        'congestion_chart': congestion_chart(data),
         'selected_region': selected_region,
         'selected_region_name': regions.get(selected_region, selected_region),
         'all_regions': regions
     }
-    
-    return render(request, 'dashboard/congestion.html', context)
 
+def congestion_proxy(request):
+    api_key = os.getenv('EIA_API_KEY')
+    selected_region = congestion_region(request)
+    time_range = timerange.from_request(request)
+    data = get_congestion_data(api_key, selected_region, time_range)
+    context = congestion_context(selected_region, data)
+    context.update(range_context(request, time_range, 'Last 48 Hours'))
+    context['heatmap_mode'] = mode = heatmap_mode(request)
+    context['heatmap_modes'] = HEATMAP_MODES
+    if mode != 'recent':
+        context['profile'] = get_congestion_profile(api_key, selected_region, mode)
+    return render(request, 'dashboard/congestion.html', context)
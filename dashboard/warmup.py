@@ -0,0 +1,123 @@
+"""
+Warm-up of the default views, run before a deploy takes traffic.
+
+warm() builds the capacity index and the generation cube (which together
+back the congestion page, every state page and the national rankings) and
+then loads the default window of every demand, net-load and congestion
+page, exactly as a first visitor would. Whatever that fetches lands in the
+local store and the shared response cache. gunicorn.conf.py runs it as
+``manage.py warm_cache --boot`` before the listening socket is opened, in
+a child process: the warm-up starts threads (the fetch pool, background
+refreshes), and the master must have none when it forks the workers.
+
+Progress is kept in the shared cache under STATUS_KEY, which is per host:
+the boot warm-up, the gunicorn master and its workers share a host, while
+other instances behind the same cache have statuses of their own, so one
+instance booting never takes the rest out of rotation. The /ready/
+endpoint reports it and answers 503 while a boot warm-up is running; a
+warm-up run by hand on a live deployment leaves readiness alone. A
+'warming' status expires after WARMUP_TIMEOUT seconds, so a warm-up that
+died part-way can't hold readiness down.
+"""
+import socket
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from . import capacity, cube, metrics, scheduler, views
+from .concurrency import run_concurrently
+from .regions import CONGESTION_REGIONS, DEMAND_RESPONDENTS, NET_LOAD_REGIONS
+
+STATUS_KEY = f'warmup:status:{socket.gethostname()}'
+
+
+def status():
+    """``{'state': 'cold' | 'warming' | 'warm' | 'skipped', ...}`` for this host."""
+    return cache.get(STATUS_KEY) or {'state': 'cold'}
+
+
+def is_blocking(state):
+    """Whether ``state`` should keep /ready/ answering 503: a boot warm-up still within its time."""
+    return (state['state'] == 'warming' and state.get('boot')
+            and time.time() - state['started_at'] < settings.WARMUP_TIMEOUT)
+
+
+def _set_status(timeout=None, **fields):
+    cache.set(STATUS_KEY, fields, timeout=timeout)
+
+
+def skip(reason):
+    """Record that this boot runs without a warm-up, so readiness doesn't wait for one."""
+    _set_status(state='skipped', reason=reason)
+
+
+def page_calls(api_key):
+    """``{name: callable}`` loading the default window of every hourly page."""
+    calls = {}
+    for respondent in DEMAND_RESPONDENTS:
+        calls[f'demand:{respondent}'] = lambda r=respondent: views.demand_context_for(api_key, r, None)
+    for region in NET_LOAD_REGIONS:
+        calls[f'net_load:{region}'] = lambda r=region: views.get_net_load_data(api_key, r)
+    for region in CONGESTION_REGIONS:
+        calls[f'congestion:{region}'] = lambda r=region: views.get_congestion_data(api_key, r)
+    calls['net_load:overview'] = lambda: views.get_net_load_overview(api_key)
+    return calls
+
+
+def warm(api_key, report=print, boot=False):
+    """Warm every default view; returns ``{name: seconds or exception}``.
+
+    ``boot`` marks the warm-up a new deployment waits on before it is ready.
+    """
+    with scheduler.priority('warmup'):
+        return _warm(api_key, report, boot)
+
+
+def _warm(api_key, report, boot):
+    started, started_at = time.monotonic(), time.time()
+    _set_status(state='warming', boot=boot, started_at=started_at, timeout=settings.WARMUP_TIMEOUT)
+    results = {}
+
+    # The snapshots first: the congestion and state pages read them
+    for name, build in [('capacity_index', capacity.refresh), ('generation_cube', cube.refresh_if_changed)]:
+        t = time.monotonic()
+        try:
+            build(api_key)
+            results[name] = time.monotonic() - t
+        except Exception as e:
+            results[name] = e
+
+    def timed_call(fn):
+        def run():
+            t = time.monotonic()
+            if fn() is None:
+                raise ValueError("no data")
+            return time.monotonic() - t
+        return run
+
+    # Pages side by side; each page's own fetches run inline on its pool
+    # thread (see concurrency.py), so a small pool can't deadlock
+    calls = page_calls(api_key)
+    results.update(run_concurrently({name: timed_call(fn) for name, fn in calls.items()}))
+
+    failed = sorted(name for name, result in results.items() if isinstance(result, Exception))
+    for name, result in results.items():
+        if isinstance(result, Exception):
+            report(f"Warm-up Error ({name}): {result}")
+        else:
+            report(f"warmed {name} in {result:.2f}s")
+    _set_status(
+        state='warm', boot=boot, started_at=started_at, finished_at=time.time(),
+        seconds=round(time.monotonic() - started, 2), warmed=len(results) - len(failed), failed=failed,
+    )
+    return results
+
+
+def after_fork():
+    """Per-worker cleanup after forking from the master."""
+    # Sockets opened by the master must not be shared with the workers, and
+    # nothing the master counted should show up in each worker's metrics
+    connections.close_all()
+    metrics.reset()
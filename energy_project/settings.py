@@ -50,8 +50,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so Server-Timing and the request histogram cover the whole stack
+    'dashboard.metrics.TimingMiddleware',
+    'dashboard.freshness.StaleDataMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # WhiteNoise, but async-capable so the ASGI chain stays on the event loop
+    'dashboard.staticfiles.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -72,6 +76,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'dashboard.freshness.stale_data',
             ],
         },
     },
@@ -87,6 +92,13 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Writers (the warm-up's threads, refreshes, live pollers) take the
+            # write lock up front and wait for it, instead of failing with
+            # "database is locked" when a read-then-write transaction upgrades
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -135,4 +147,135 @@ STATICFILES_DIRS = [
 # Collected static files (served by WhiteNoise)
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
-STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
\ No newline at end of file
+STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+
+# EIA API client
+# Timeouts and the per-request budget are in seconds. The budget caps the
+# total time spent on one query, retries and backoff included.
+
+# Point EIA_BASE_URL at `manage.py eia_replay_server` to run offline, and
+# set EIA_RECORD_DIR to save every fetched payload there for it to replay.
+EIA_BASE_URL = os.getenv('EIA_BASE_URL', 'https://api.eia.gov/v2').rstrip('/')
+EIA_RECORD_DIR = os.getenv('EIA_RECORD_DIR', '')
+
+EIA_CONNECT_TIMEOUT = float(os.getenv('EIA_CONNECT_TIMEOUT', '3.05'))
+EIA_READ_TIMEOUT = float(os.getenv('EIA_READ_TIMEOUT', '10'))
+EIA_REQUEST_BUDGET = float(os.getenv('EIA_REQUEST_BUDGET', '15'))
+EIA_MAX_RETRIES = int(os.getenv('EIA_MAX_RETRIES', '2'))
+EIA_RETRY_BACKOFF = float(os.getenv('EIA_RETRY_BACKOFF', '0.5'))
+EIA_POOL_SIZE = int(os.getenv('EIA_POOL_SIZE', '10'))
+EIA_ASYNC_POOL_SIZE = int(os.getenv('EIA_ASYNC_POOL_SIZE', '100'))
+
+# Circuit breaker per EIA endpoint (dashboard/breaker.py): opens after
+# EIA_BREAKER_FAILURES consecutive failures and lets a probe through every
+# EIA_BREAKER_COOLDOWN seconds. Meanwhile the views serve the newest data
+# held; cached responses are kept EIA_LAST_KNOWN_GOOD_SECONDS past their
+# stale deadline for that.
+EIA_BREAKER_FAILURES = int(os.getenv('EIA_BREAKER_FAILURES', '5'))
+EIA_BREAKER_COOLDOWN = float(os.getenv('EIA_BREAKER_COOLDOWN', '30'))
+EIA_LAST_KNOWN_GOOD_SECONDS = int(os.getenv('EIA_LAST_KNOWN_GOOD_SECONDS', str(7 * 24 * 3600)))
+
+# Upstream rate limiting (dashboard/scheduler.py). Requests rotate across
+# EIA_API_KEY and the comma-separated EIA_API_KEYS; each key may send
+# EIA_KEY_RATE requests/second in bursts of EIA_KEY_BURST. The limits are
+# per process, so divide the key's allowance by the number of workers.
+EIA_API_KEYS = list(dict.fromkeys(
+    key.strip() for key in [os.getenv('EIA_API_KEY', ''), *os.getenv('EIA_API_KEYS', '').split(',')] if key.strip()
+))
+EIA_KEY_RATE = float(os.getenv('EIA_KEY_RATE', '1'))
+EIA_KEY_BURST = int(os.getenv('EIA_KEY_BURST', '20'))
+
+# Serve the async page views (dashboard/async_views.py). Only useful when
+# running the ASGI app, e.g. under gunicorn with uvicorn workers.
+DASHBOARD_ASYNC_VIEWS = os.getenv('DASHBOARD_ASYNC_VIEWS', 'False') == 'True'
+
+
+# Caching
+# The shared tier is file-based by default so every gunicorn worker on the
+# host sees the same entries. Set REDIS_URL (requires the redis package) to
+# share it across hosts instead.
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR', BASE_DIR / 'cache'),
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+# Fresh lifetime (seconds) of cached EIA responses, keyed by the query's
+# 'frequency'. After that an entry stays servable for STALE_FACTOR more
+# lifetimes while it is refreshed in the background.
+EIA_CACHE_TTLS = {
+    'hourly': int(os.getenv('EIA_CACHE_TTL_HOURLY', '300')),
+    'local-hourly': int(os.getenv('EIA_CACHE_TTL_HOURLY', '300')),
+    'daily': 3600,
+    'monthly': 6 * 3600,
+    'annual': int(os.getenv('EIA_CACHE_TTL_ANNUAL', str(24 * 3600))),
+}
+EIA_CACHE_STALE_FACTOR = int(os.getenv('EIA_CACHE_STALE_FACTOR', '12'))
+EIA_CACHE_FRONT_SIZE = int(os.getenv('EIA_CACHE_FRONT_SIZE', '256'))
+# How long (seconds) a worker waits for another worker's in-flight fetch of
+# the same query before fetching it itself.
+EIA_SINGLEFLIGHT_WAIT = float(os.getenv('EIA_SINGLEFLIGHT_WAIT', '5'))
+
+# Views read hourly series from the local store only while its newest hour
+# is at most this old; otherwise they fall back to the API.
+EIA_STORE_MAX_LAG_HOURS = int(os.getenv('EIA_STORE_MAX_LAG_HOURS', '3'))
+
+# Hourly charts accept ranges up to CHART_MAX_RANGE_DAYS long and are
+# downsampled on the server to about CHART_POINT_BUDGET points.
+CHART_POINT_BUDGET = int(os.getenv('CHART_POINT_BUDGET', '1000'))
+CHART_MAX_RANGE_DAYS = int(os.getenv('CHART_MAX_RANGE_DAYS', '1830'))
+
+# Server-Sent Events feed (dashboard/live.py, ASGI only). Each watched
+# series is polled every LIVE_POLL_INTERVAL seconds per worker; a client is
+# dropped once LIVE_QUEUE_SIZE events behind or after LIVE_CLIENT_TIMEOUT
+# seconds without a successful write.
+LIVE_POLL_INTERVAL = float(os.getenv('LIVE_POLL_INTERVAL', '60'))
+LIVE_QUEUE_SIZE = int(os.getenv('LIVE_QUEUE_SIZE', '16'))
+LIVE_CLIENT_TIMEOUT = float(os.getenv('LIVE_CLIENT_TIMEOUT', '120'))
+LIVE_HEARTBEAT = float(os.getenv('LIVE_HEARTBEAT', '15'))
+LIVE_MAX_CLIENTS = int(os.getenv('LIVE_MAX_CLIENTS', '1000'))
+LIVE_RETRY_MS = int(os.getenv('LIVE_RETRY_MS', '5000'))
+
+# /metrics (Prometheus text format). When METRICS_TOKEN is set, scrapers
+# must send it as 'Authorization: Bearer <token>'.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Boot warm-up (dashboard/warmup.py). gunicorn.conf.py gives it up after
+# WARMUP_TIMEOUT seconds, and /ready/ stops waiting on a 'warming' status
+# that old (e.g. left behind by a killed master).
+WARMUP_TIMEOUT = int(os.getenv('WARMUP_TIMEOUT', '600'))
+
+# Background ingestion (manage.py ingest_eia)
+EIA_INGEST_INTERVAL = int(os.getenv('EIA_INGEST_INTERVAL', '900'))
+EIA_INGEST_LOOKBACK_HOURS = int(os.getenv('EIA_INGEST_LOOKBACK_HOURS', '168'))
+
+# Worker threads per process for fetching independent series concurrently
+EIA_MAX_CONCURRENCY = int(os.getenv('EIA_MAX_CONCURRENCY', '8'))
+
+# Warnings and errors from the dashboard (upstream failures, fallbacks,
+# breaker trips, live feed evictions) go to the console; DASHBOARD_LOG_LEVEL
+# (e.g. INFO or ERROR) changes how much is shown.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'dashboard': {
+            'handlers': ['console'],
+            'level': os.getenv('DASHBOARD_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
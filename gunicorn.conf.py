@@ -0,0 +1,52 @@
+"""
+gunicorn settings: warm the caches once before the workers start.
+
+With preload_app the Django app is imported in the master, and on_starting
+runs the warm-up (see dashboard/warmup.py) before gunicorn opens its
+listening socket. The warm-up runs as ``manage.py warm_cache --boot`` in a
+child process rather than in the master: it starts threads and takes locks
+(the fetch pool, background refreshes, single-flight and breaker state),
+and forking the workers from a process in that state could leave them with
+a lock no thread will ever release. Whatever it fetches lands in the store
+and the shared cache, so no first request pays the cold upstream latency.
+Set WARMUP_ON_BOOT=False to skip it.
+"""
+import os
+import subprocess
+import sys
+
+preload_app = True
+
+
+def on_starting(server):
+    from django.conf import settings
+    from django.db import connections
+    from dashboard import warmup
+
+    api_key = os.getenv('EIA_API_KEY')
+    if os.getenv('WARMUP_ON_BOOT', 'True') != 'True':
+        warmup.skip("WARMUP_ON_BOOT is off")
+        return
+    if not api_key:
+        server.log.warning("EIA_API_KEY is not set; skipping the cache warm-up")
+        warmup.skip("EIA_API_KEY is not set")
+        return
+
+    try:
+        subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'warm_cache', '--boot'],
+            check=True, timeout=settings.WARMUP_TIMEOUT,
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        # Serve cold rather than never becoming ready
+        server.log.error(f"Warm-up Error: {e}")
+        warmup.skip(f"warm-up failed: {e}")
+    finally:
+        # Close the master's connections before forking
+        connections.close_all()
+
+
+def post_fork(server, worker):
+    from dashboard import warmup
+
+    warmup.after_fork()